@@ -1,21 +1,121 @@
 #!/usr/bin/env python3
 """
 Build script to generate the complete LLMs OS Docker project from YAML
+
+Generation is incremental: a SHA-256 of every generated file is kept in
+``<output>/.build-manifest.json`` and only files whose content changed are
+written, so unchanged files keep their mtimes (Docker layer caches and
+file watchers stay valid).  ``--only`` limits the build to some sections
+and ``--dry-run`` reports what would change without writing anything.
+
+Every generated file comes from the YAML; ``source_files`` holds the whole
+Python package and its tests.  Change the YAML rather than the output:
+``tests/test_core.py`` checks that a build reproduces the checked-in
+project byte for byte.
 """
+import argparse
+import hashlib
+import json
 import yaml
 import sys
 from pathlib import Path
 
-def create_file(path: Path, content: str):
-    """Create a file with content"""
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with open(path, 'w') as f:
-        f.write(content.strip() + '\n')
-    print(f'  ✅ {path.relative_to(path.parents[len(path.parents)-2])}')
+SECTIONS = ('docker', 'config', 'source', 'mock-api', 'monitoring', 'workflows', 'docs')
+MANIFEST = '.build-manifest.json'
+
+class Build:
+    """Writes generated files that changed and keeps track of what it did"""
+
+    def __init__(self, output_dir: Path, only=None, dry_run: bool = False):
+        self.output_dir = output_dir
+        self.only = set(only) if only else set(SECTIONS)
+        self.dry_run = dry_run
+        self.current = None
+        self.generated = set()
+        self.changes = {'added': [], 'updated': [], 'unchanged': []}
+        # relative path -> {'sha256', 'section', 'size', 'mtime_ns'}
+        self.manifest_path = output_dir / MANIFEST
+        try:
+            self.manifest = json.loads(self.manifest_path.read_text())
+        except (OSError, ValueError):
+            self.manifest = {}
+
+    def section(self, name: str, title: str) -> None:
+        """Start a section; its files are skipped unless it was selected"""
+        self.current = name
+        if name in self.only:
+            print(f'\n{title}')
+
+    def write(self, relative: str, content: str) -> None:
+        """Write a generated file if its content differs from what is on disk"""
+        if self.current not in self.only:
+            return
+        path = self.output_dir / relative
+        data = (content.strip() + '\n').encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        self.generated.add(relative)
+
+        if path.exists():
+            # Trust the manifest only while the file is untouched since we wrote it
+            recorded = self.manifest.get(relative, {})
+            stat = path.stat()
+            untouched = recorded.get('sha256') == digest and \
+                (recorded.get('size'), recorded.get('mtime_ns')) == (stat.st_size, stat.st_mtime_ns)
+            if untouched or hashlib.sha256(path.read_bytes()).hexdigest() == digest:
+                self._record(relative, path, digest)
+                self.changes['unchanged'].append(relative)
+                return
+            status = 'updated'
+        else:
+            status = 'added'
 
-def main():
-    yaml_file = Path('llms-os-docker-project-enhanced.yaml')
-    output_dir = Path('llms-os-project')
+        if not self.dry_run:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(data)
+            self._record(relative, path, digest)
+        self.changes[status].append(relative)
+        print(f'  ✅ {relative} ({status})')
+
+    def _record(self, relative: str, path: Path, digest: str) -> None:
+        stat = path.stat()
+        self.manifest[relative] = {
+            'sha256': digest, 'section': self.current,
+            'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns
+        }
+
+    def finish(self) -> None:
+        """Save the manifest and print a summary of the changes"""
+        stale = sorted(
+            path for path, entry in self.manifest.items()
+            if path not in self.generated and entry.get('section') in self.only
+        )
+        if not self.dry_run:
+            for path in stale:
+                del self.manifest[path]
+            self.manifest_path.write_text(json.dumps(self.manifest, indent=2, sort_keys=True) + '\n')
+
+        added, updated = len(self.changes['added']), len(self.changes['updated'])
+        verb = 'would change' if self.dry_run else 'changed'
+        print(f"\n🧮 {added + updated} file(s) {verb}: {added} added, {updated} updated, "
+              f"{len(self.changes['unchanged'])} unchanged")
+        for path in stale:
+            print(f'  ⚠️  {path} is no longer generated')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate the LLMs OS Docker project from YAML')
+    parser.add_argument('--config', default='llms-os-docker-project-enhanced.yaml',
+                        help='Project definition (default: %(default)s)')
+    parser.add_argument('--output', default='llms-os-project',
+                        help='Output directory (default: %(default)s)')
+    parser.add_argument('--only', nargs='+', choices=SECTIONS, metavar='SECTION',
+                        help=f"Generate only these sections: {', '.join(SECTIONS)}")
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Report what would change without writing files')
+    args = parser.parse_args(argv)
+    
+    yaml_file = Path(args.config)
+    output_dir = Path(args.output)
+    build = Build(output_dir, only=args.only, dry_run=args.dry_run)
     
     print(f'🚀 Building LLMs OS Docker Project...\n')
     
@@ -35,320 +135,83 @@ def main():
         'output',
         'logs'
     ]
-    for d in dirs:
-        (output_dir / d).mkdir(parents=True, exist_ok=True)
-    print('  ✅ Directories created\n')
+    if not args.dry_run:
+        for d in dirs:
+            (output_dir / d).mkdir(parents=True, exist_ok=True)
+    print('  ✅ Directories created')
     
     # Create Docker files
-    print('🐳 Creating Docker configurations...')
+    build.section('docker', '🐳 Creating Docker configurations...')
     docker_config = config.get('docker', {})
-    create_file(output_dir / 'llms-os/Dockerfile', docker_config.get('dockerfile_main', ''))
-    create_file(output_dir / 'llms-os/Dockerfile.dev', docker_config.get('dockerfile_dev', ''))
-    create_file(output_dir / 'mock-api/Dockerfile', docker_config.get('dockerfile_mock_api', ''))
+    build.write('llms-os/Dockerfile', docker_config.get('dockerfile_main', ''))
+    build.write('llms-os/Dockerfile.dev', docker_config.get('dockerfile_dev', ''))
+    build.write('mock-api/Dockerfile', docker_config.get('dockerfile_mock_api', ''))
     
     # Create docker-compose files
     compose_config = config.get('docker_compose', {})
-    create_file(output_dir / 'docker-compose.yml', compose_config.get('main', ''))
-    create_file(output_dir / 'docker-compose.dev.yml', compose_config.get('dev', ''))
-    create_file(output_dir / 'docker-compose.monitoring.yml', compose_config.get('monitoring', ''))
-    print()
+    build.write('docker-compose.yml', compose_config.get('main', ''))
+    build.write('docker-compose.dev.yml', compose_config.get('dev', ''))
+    build.write('docker-compose.monitoring.yml', compose_config.get('monitoring', ''))
     
     # Create config files
-    print('⚙️  Creating configuration files...')
+    build.section('config', '⚙️  Creating configuration files...')
     config_files = config.get('config_files', {})
-    create_file(output_dir / 'Makefile', config_files.get('makefile', ''))
-    create_file(output_dir / 'llms-os/requirements.txt', config_files.get('requirements', ''))
-    create_file(output_dir / 'llms-os/requirements.dev.txt', config_files.get('requirements_dev', ''))
-    create_file(output_dir / '.env.example', config_files.get('env_example', ''))
-    create_file(output_dir / '.dockerignore', config_files.get('dockerignore', ''))
-    print()
+    build.write('Makefile', config_files.get('makefile', ''))
+    build.write('llms-os/requirements.txt', config_files.get('requirements', ''))
+    build.write('llms-os/requirements.dev.txt', config_files.get('requirements_dev', ''))
+    build.write('.env.example', config_files.get('env_example', ''))
+    build.write('.dockerignore', config_files.get('dockerignore', ''))
     
     # Create source files
-    print('📝 Creating source code files...')
+    build.section('source', '📝 Creating source code files...')
     source_files = config.get('source_files', {})
     
     # Main LLMs_OS files
-    create_file(output_dir / 'llms-os/src/LLMs_OS/__init__.py', source_files.get('llms_os_init', ''))
-    
-    # Registry
-    registry_code = '''"""Action registry for LLMs_OS"""
-
-_ACTIONS = {}
-
-def register(name):
-    """Decorator to register an action"""
-    def decorator(func):
-        _ACTIONS[name] = func
-        return func
-    return decorator
-
-def get_action(name):
-    """Get an action by name"""
-    if name not in _ACTIONS:
-        raise KeyError(f"Action not found: {name}")
-    return _ACTIONS[name]
-
-def list_actions():
-    """List all registered actions"""
-    return list(_ACTIONS.keys())
-'''
-    create_file(output_dir / 'llms-os/src/LLMs_OS/registry.py', registry_code)
-    
-    # Core
-    core_code = '''"""Core workflow execution engine"""
-import yaml
-import os
-from pathlib import Path
-from .registry import get_action
-
-def execute_yaml(file_path: str) -> None:
-    """Execute a workflow from a YAML file"""
-    # Load workflow
-    with open(file_path, 'r') as f:
-        workflow = yaml.safe_load(f)
-    
-    # Import actions to ensure they're registered
-    import LLMs_OS.actions
-    
-    # Get tasks
-    tasks = workflow.get('tasks', [])
-    context = {}
-    
-    # Execute each task
-    for task in tasks:
-        action_name = task.get('action')
-        if not action_name:
-            continue
-        
-        try:
-            action = get_action(action_name)
-            result = action(task, context)
-            
-            # Save result if requested
-            if 'save_as' in task and result:
-                context[task['save_as']] = result
-        except Exception as e:
-            print(f"❌ Error in action '{action_name}': {e}")
-            raise
-'''
-    create_file(output_dir / 'llms-os/src/LLMs_OS/core.py', core_code)
-    
-    create_file(output_dir / 'llms-os/src/LLMs_OS/async_core.py', source_files.get('async_core', ''))
-    
-    # CLI
-    cli_code = '''"""Command-line interface for LLMs_OS"""
-import sys
-import argparse
-from pathlib import Path
-from .core import execute_yaml
-
-def main():
-    """Main CLI entry point"""
-    parser = argparse.ArgumentParser(description='LLMs_OS - Workflow automation with LLMs')
-    parser.add_argument('workflow', nargs='?', help='Path to workflow YAML file')
-    parser.add_argument('--version', action='store_true', help='Show version')
-    
-    args = parser.parse_args()
-    
-    if args.version:
-        print('LLMs_OS v1.0.0')
-        return 0
-    
-    if not args.workflow:
-        parser.print_help()
-        return 1
-    
-    workflow_path = Path(args.workflow)
-    if not workflow_path.exists():
-        print(f"❌ Workflow file not found: {workflow_path}")
-        return 1
-    
-    try:
-        execute_yaml(str(workflow_path))
-        return 0
-    except Exception as e:
-        print(f"❌ Workflow execution failed: {e}")
-        return 1
-
-if __name__ == '__main__':
-    sys.exit(main())
-'''
-    create_file(output_dir / 'llms-os/src/LLMs_OS/cli.py', cli_code)
-    
-    create_file(output_dir / 'llms-os/src/LLMs_OS/exceptions.py', source_files.get('exceptions', ''))
-    create_file(output_dir / 'llms-os/src/LLMs_OS/validators.py', source_files.get('validators', ''))
-    create_file(output_dir / 'llms-os/src/LLMs_OS/monitoring.py', source_files.get('monitoring', ''))
-    create_file(output_dir / 'llms-os/src/LLMs_OS/plugins.py', source_files.get('plugins', ''))
-    
-    # Actions init
-    actions_init_code = '''"""Action modules"""
-from . import print_message
-from . import chat_completion
-from . import http_request
-from . import file_operations
-
-__all__ = ['print_message', 'chat_completion', 'http_request', 'file_operations']
-'''
-    create_file(output_dir / 'llms-os/src/LLMs_OS/actions/__init__.py', actions_init_code)
-    
-    # Print message action
-    print_action_code = '''"""Print message action"""
-import re
-from ..registry import register
-
-COLORS = {
-    'success': '\\033[92m',
-    'error': '\\033[91m',
-    'warning': '\\033[93m',
-    'info': '\\033[94m',
-    'debug': '\\033[90m',
-    'reset': '\\033[0m'
-}
-
-@register('print_message')
-def print_message(task, context):
-    """Print a formatted message"""
-    message = task.get('message', '')
-    style = task.get('style', 'info')
-    
-    # Replace templates like {{ var }} or {{ var.attr }}
-    def replace_var(match):
-        var_path = match.group(1).strip()
-        
-        # Handle default values: {{ var | default('value') }}
-        if '|' in var_path:
-            var_part, default_part = var_path.split('|', 1)
-            var_path = var_part.strip()
-            # Extract default value from default('value')
-            default_match = re.search(r"default\\(['\\\"](.+?)['\\\"]\\)", default_part)
-            default_val = default_match.group(1) if default_match else ''
-        else:
-            default_val = ''
-        
-        # Navigate path (e.g., health_check.status_code)
-        parts = var_path.split('.')
-        value = context
-        for part in parts:
-            if isinstance(value, dict):
-                value = value.get(part)
-                if value is None:
-                    return default_val if default_val else match.group(0)
-            else:
-                return default_val if default_val else match.group(0)
-        
-        return str(value) if value is not None else default_val
-    
-    message = re.sub(r'\\{\\{\\s*(.+?)\\s*\\}\\}', replace_var, message)
-    
-    color = COLORS.get(style, COLORS['info'])
-    print(f"{color}{message}{COLORS['reset']}")
-    return None
-'''
-    create_file(output_dir / 'llms-os/src/LLMs_OS/actions/print_message.py', print_action_code)
-    
-    # Chat completion action
-    chat_action_code = '''"""Chat completion action"""
-import os
-import requests
-from ..registry import register
-
-@register('chat_completion')
-def chat_completion(task, context):
-    """Call LLM API for chat completion"""
-    api_url = os.getenv('OPENROUTER_API_URL', 'https://openrouter.ai/api/v1')
-    api_key = os.getenv('OPENROUTER_API_KEY', '')
-    
-    model = task.get('model', 'openai/gpt-3.5-turbo')
-    messages = task.get('messages', [])
-    
-    url = f"{api_url}/chat/completions"
-    headers = {
-        'Authorization': f'Bearer {api_key}',
-        'Content-Type': 'application/json'
-    }
-    
-    payload = {
-        'model': model,
-        'messages': messages
-    }
-    
-    try:
-        response = requests.post(url, json=payload, headers=headers, timeout=60)
-        response.raise_for_status()
-        result = response.json()
-        
-        content = result.get('choices', [{}])[0].get('message', {}).get('content', '')
-        return {'content': content, 'full_response': result}
-    except Exception as e:
-        print(f"⚠️  Chat completion failed: {e}")
-        return None
-'''
-    create_file(output_dir / 'llms-os/src/LLMs_OS/actions/chat_completion.py', chat_action_code)
-    
-    # HTTP request action
-    http_action_code = '''"""HTTP request action"""
-import requests
-from ..registry import register
-
-@register('http_request')
-def http_request(task, context):
-    """Make an HTTP request"""
-    url = task.get('url', '')
-    method = task.get('method', 'GET').upper()
-    headers = task.get('headers', {})
-    data = task.get('data')
-    
-    try:
-        response = requests.request(method, url, headers=headers, json=data, timeout=30)
-        return {
-            'status_code': response.status_code,
-            'content': response.text,
-            'json': response.json() if response.headers.get('content-type', '').startswith('application/json') else None
-        }
-    except Exception as e:
-        print(f"⚠️  HTTP request failed: {e}")
-        return None
-'''
-    create_file(output_dir / 'llms-os/src/LLMs_OS/actions/http_request.py', http_action_code)
-    
-    # File operations action
-    file_action_code = '''"""File operations actions"""
-from pathlib import Path
-from ..registry import register
-
-@register('file_read')
-def file_read(task, context):
-    """Read file content"""
-    path = task.get('path', '')
-    try:
-        with open(path, 'r') as f:
-            content = f.read()
-        return {'content': content}
-    except Exception as e:
-        print(f"⚠️  File read failed: {e}")
-        return None
-
-@register('file_write')
-def file_write(task, context):
-    """Write content to file"""
-    path = task.get('path', '')
-    content = task.get('content', '')
-    
-    try:
-        Path(path).parent.mkdir(parents=True, exist_ok=True)
-        with open(path, 'w') as f:
-            f.write(content)
-        return {'path': path}
-    except Exception as e:
-        print(f"⚠️  File write failed: {e}")
-        return None
-'''
-    create_file(output_dir / 'llms-os/src/LLMs_OS/actions/file_operations.py', file_action_code)
+    build.write('llms-os/src/LLMs_OS/__init__.py', source_files.get('llms_os_init', ''))
+    build.write('llms-os/src/LLMs_OS/registry.py', source_files.get('registry', ''))
+    build.write('llms-os/src/LLMs_OS/core.py', source_files.get('core', ''))
+    build.write('llms-os/src/LLMs_OS/async_core.py', source_files.get('async_core', ''))
+    build.write('llms-os/src/LLMs_OS/cli.py', source_files.get('cli', ''))
+    build.write('llms-os/src/LLMs_OS/exceptions.py', source_files.get('exceptions', ''))
+    build.write('llms-os/src/LLMs_OS/validators.py', source_files.get('validators', ''))
+    build.write('llms-os/src/LLMs_OS/loader.py', source_files.get('loader', ''))
+    build.write('llms-os/src/LLMs_OS/templates.py', source_files.get('templates', ''))
+    build.write('llms-os/src/LLMs_OS/conditions.py', source_files.get('conditions', ''))
+    build.write('llms-os/src/LLMs_OS/graph.py', source_files.get('graph', ''))
+    build.write('llms-os/src/LLMs_OS/context.py', source_files.get('context', ''))
+    build.write('llms-os/src/LLMs_OS/pruning.py', source_files.get('pruning', ''))
+    build.write('llms-os/src/LLMs_OS/incremental.py', source_files.get('incremental', ''))
+    build.write('llms-os/src/LLMs_OS/deadlines.py', source_files.get('deadlines', ''))
+    build.write('llms-os/src/LLMs_OS/streams.py', source_files.get('streams', ''))
+    build.write('llms-os/src/LLMs_OS/bulkheads.py', source_files.get('bulkheads', ''))
+    build.write('llms-os/src/LLMs_OS/loop_monitor.py', source_files.get('loop_monitor', ''))
+    build.write('llms-os/src/LLMs_OS/profiling.py', source_files.get('profiling', ''))
+    build.write('llms-os/src/LLMs_OS/output.py', source_files.get('output', ''))
+    build.write('llms-os/src/LLMs_OS/codec.py', source_files.get('codec', ''))
+    build.write('llms-os/src/LLMs_OS/transport.py', source_files.get('transport', ''))
+    build.write('llms-os/src/LLMs_OS/compression.py', source_files.get('compression', ''))
+    build.write('llms-os/src/LLMs_OS/cassette.py', source_files.get('cassette', ''))
+    build.write('llms-os/src/LLMs_OS/resilience.py', source_files.get('resilience', ''))
+    build.write('llms-os/src/LLMs_OS/providers.py', source_files.get('providers', ''))
+    build.write('llms-os/src/LLMs_OS/prewarm.py', source_files.get('prewarm', ''))
+    build.write('llms-os/src/LLMs_OS/embedding.py', source_files.get('embedding', ''))
+    build.write('llms-os/src/LLMs_OS/vectors.py', source_files.get('vectors', ''))
+    build.write('llms-os/src/LLMs_OS/semantic_cache.py', source_files.get('semantic_cache', ''))
+    build.write('llms-os/src/LLMs_OS/monitoring.py', source_files.get('monitoring', ''))
+    build.write('llms-os/src/LLMs_OS/plugins.py', source_files.get('plugins', ''))
+    
+    # Actions
+    build.write('llms-os/src/LLMs_OS/actions/__init__.py', source_files.get('actions_init', ''))
+    build.write('llms-os/src/LLMs_OS/actions/print_message.py', source_files.get('print_message_action', ''))
+    build.write('llms-os/src/LLMs_OS/actions/chat_completion.py', source_files.get('chat_completion_action', ''))
+    build.write('llms-os/src/LLMs_OS/actions/embeddings.py', source_files.get('embeddings_action', ''))
+    build.write('llms-os/src/LLMs_OS/actions/http_request.py', source_files.get('http_request_action', ''))
+    build.write('llms-os/src/LLMs_OS/actions/file_operations.py', source_files.get('file_operations_action', ''))
     
     # Tests
-    create_file(output_dir / 'llms-os/src/tests/__init__.py', '')
-    create_file(output_dir / 'llms-os/src/tests/test_core.py', source_files.get('test_core', ''))
-    create_file(output_dir / 'llms-os/src/tests/test_actions.py', source_files.get('test_actions', ''))
+    build.write('llms-os/src/tests/__init__.py', '')
+    build.write('llms-os/src/tests/test_core.py', source_files.get('test_core', ''))
+    build.write('llms-os/src/tests/test_actions.py', source_files.get('test_actions', ''))
     
     # pyproject.toml for modern Python packaging
     pyproject_content = '''[build-system]
@@ -367,35 +230,32 @@ llms-os = "LLMs_OS.cli:main"
 [tool.setuptools]
 packages = ["LLMs_OS", "LLMs_OS.actions"]
 '''
-    create_file(output_dir / 'llms-os/src/pyproject.toml', pyproject_content)
-    print()
+    build.write('llms-os/src/pyproject.toml', pyproject_content)
     
     # Create mock API
-    print('🔌 Creating Mock API...')
+    build.section('mock-api', '🔌 Creating Mock API...')
     mock_api_app = source_files.get('mock_api_app', '')
-    create_file(output_dir / 'mock-api/app.py', mock_api_app)
-    print()
+    build.write('mock-api/app.py', mock_api_app)
     
     # Create monitoring configs
-    print('📊 Creating monitoring configurations...')
+    build.section('monitoring', '📊 Creating monitoring configurations...')
     monitoring_config = config.get('monitoring_config', {})
-    create_file(output_dir / 'monitoring/prometheus.yml', monitoring_config.get('prometheus', ''))
-    create_file(output_dir / 'monitoring/grafana/dashboards/llms-os.json', monitoring_config.get('grafana_dashboard', '{}'))
-    print()
+    build.write('monitoring/prometheus.yml', monitoring_config.get('prometheus', ''))
+    build.write('monitoring/grafana/dashboards/llms-os.json', monitoring_config.get('grafana_dashboard', '{}'))
     
     # Create workflows
-    print('🔄 Creating test workflows...')
+    build.section('workflows', '🔄 Creating test workflows...')
     workflows = config.get('test_workflows', {})
-    create_file(output_dir / 'workflows/test_basic.yaml', workflows.get('test_basic', ''))
-    create_file(output_dir / 'workflows/test_advanced.yaml', workflows.get('test_advanced', ''))
-    print()
+    build.write('workflows/test_basic.yaml', workflows.get('test_basic', ''))
+    build.write('workflows/test_advanced.yaml', workflows.get('test_advanced', ''))
     
     # Create README
-    print('📖 Creating documentation...')
-    create_file(output_dir / 'README.md', config.get('readme', {}).get('content', '# LLMs OS Docker Project'))
-    print()
+    build.section('docs', '📖 Creating documentation...')
+    build.write('README.md', config.get('readme', {}).get('content', '# LLMs OS Docker Project'))
+    
+    build.finish()
     
-    print('✅ Project build complete!')
+    print('\n✅ Project build complete!')
     print(f'\n📦 Project created at: {output_dir.absolute()}')
     print('\n🚀 Quick start:')
     print(f'  cd {output_dir}')
@@ -3,5 +3,6 @@ from . import print_message
 from . import chat_completion
 from . import http_request
 from . import file_operations
+from . import embeddings
 
-__all__ = ['print_message', 'chat_completion', 'http_request', 'file_operations']
+__all__ = ['print_message', 'chat_completion', 'http_request', 'file_operations', 'embeddings']
@@ -1,35 +1,109 @@
 """Chat completion action"""
-import os
-import requests
+from .. import codec, output
+from ..compression import COMPRESS_SCHEMA, iter_lines
+from ..deadlines import check, remaining
+from ..exceptions import ENGINE_ERRORS
+from ..providers import endpoint_urls, get_pool
 from ..registry import register
+from ..resilience import HEDGE_SCHEMA, RETRY_SCHEMA, send_with_policy
+from ..semantic_cache import SEMANTIC_CACHE_SCHEMA, SemanticCache
 
-@register('chat_completion')
+SCHEMA = {
+    'type': 'object',
+    'required': ['messages'],
+    'properties': {
+        'model': {'type': 'string'},
+        'messages': {
+            'type': 'array',
+            'minItems': 1,
+            'items': {
+                'type': 'object',
+                'required': ['role', 'content'],
+                'properties': {
+                    'role': {'enum': ['system', 'user', 'assistant', 'tool']},
+                    'content': {'type': 'string'}
+                }
+            }
+        },
+        'retry': RETRY_SCHEMA,
+        'hedge': HEDGE_SCHEMA,
+        'semantic_cache': SEMANTIC_CACHE_SCHEMA,
+        'compress': COMPRESS_SCHEMA
+    }
+}
+
+DEFAULT_MODEL = 'openai/gpt-3.5-turbo'
+
+def _stream_tokens(task, context):
+    """Stream the completion as server-sent content deltas"""
+    pool = get_pool()
+    model = task.get('model', DEFAULT_MODEL)
+    payload = codec.dumps({
+        'model': model,
+        'messages': task.get('messages', []),
+        'stream': True
+    })
+    
+    def send():
+        return pool.post(model, '/chat/completions', payload, remaining(60), stream=True,
+                         compress=task.get('compress'))
+    
+    with send_with_policy(task, f"providers://{model}", send) as response:
+        response.raise_for_status()
+        response.encoding = 'utf-8'  # server-sent events are always UTF-8
+        for line in iter_lines(response):
+            if not line.startswith('data:'):
+                continue
+            data = line[5:].strip()
+            if data == '[DONE]':
+                break
+            for choice in codec.loads(data).get('choices', []):
+                content = choice.get('delta', {}).get('content')
+                if content:
+                    yield content
+
+def _is_pure(task):
+    """A semantic cache writes to its vector store, so only tasks without one are pure"""
+    return not task.get('semantic_cache')
+
+@register('chat_completion', schema=SCHEMA, pure=_is_pure, stream=_stream_tokens, bulkhead='llm',
+          hosts=lambda task: endpoint_urls(task.get('model', DEFAULT_MODEL)), reads=())
 def chat_completion(task, context):
     """Call LLM API for chat completion"""
-    api_url = os.getenv('OPENROUTER_API_URL', 'https://openrouter.ai/api/v1')
-    api_key = os.getenv('OPENROUTER_API_KEY', '')
+    pool = get_pool()
     
-    model = task.get('model', 'openai/gpt-3.5-turbo')
+    model = task.get('model', DEFAULT_MODEL)
     messages = task.get('messages', [])
     
-    url = f"{api_url}/chat/completions"
-    headers = {
-        'Authorization': f'Bearer {api_key}',
-        'Content-Type': 'application/json'
-    }
-    
-    payload = {
+    payload = codec.dumps({
         'model': model,
         'messages': messages
-    }
+    })
+    
+    cache = SemanticCache.from_task(task)
+    vector = None
+    if cache is not None:
+        vector, cached = cache.lookup(model, messages, task)
+        if cached is not None:
+            return cached
+    
+    def send():
+        return pool.post(model, '/chat/completions', payload, remaining(60),
+                         compress=task.get('compress'))
     
     try:
-        response = requests.post(url, json=payload, headers=headers, timeout=60)
+        response = send_with_policy(task, f"providers://{model}", send)
         response.raise_for_status()
-        result = response.json()
+        result = codec.loads(response.content)
         
         content = result.get('choices', [{}])[0].get('message', {}).get('content', '')
-        return {'content': content, 'full_response': result}
+        completion = {'content': content, 'full_response': result}
+        if vector is not None:
+            cache.add(model, messages, vector, content)
+        return completion
+    except ENGINE_ERRORS:
+        raise
     except Exception as e:
-        print(f"⚠️  Chat completion failed: {e}")
+        check()  # an I/O timeout at the deadline is a deadline error
+        output.warning(f"Chat completion failed: {e}", action='chat_completion')
         return None
@@ -0,0 +1,53 @@
+"""Embeddings action"""
+from .. import output
+from ..deadlines import check
+from ..embedding import DEFAULT_BATCH_SIZE, DEFAULT_MODEL, embed
+from ..exceptions import ENGINE_ERRORS
+from ..providers import endpoint_urls
+from ..registry import register
+from ..resilience import HEDGE_SCHEMA, RETRY_SCHEMA
+from ..vectors import open_store
+
+SCHEMA = {
+    'type': 'object',
+    'required': ['input'],
+    'properties': {
+        'model': {'type': 'string'},
+        'input': {
+            'anyOf': [
+                {'type': 'string'},
+                {'type': 'array', 'minItems': 1, 'items': {'type': 'string'}}
+            ]
+        },
+        'batch_size': {'type': 'integer', 'minimum': 1},
+        'store': {'type': 'string', 'minLength': 1},
+        'retry': RETRY_SCHEMA,
+        'hedge': HEDGE_SCHEMA
+    }
+}
+
+@register('embeddings', schema=SCHEMA, pure=lambda task: not task.get('store'), bulkhead='llm',
+          hosts=lambda task: endpoint_urls(task.get('model', DEFAULT_MODEL)), reads=())
+def embeddings(task, context):
+    """Embed one or many texts; optionally add them to a vector store"""
+    inputs = task['input']
+    texts = [inputs] if isinstance(inputs, str) else list(inputs)
+    model = task.get('model', DEFAULT_MODEL)
+
+    try:
+        vectors = embed(texts, model, task, task.get('batch_size', DEFAULT_BATCH_SIZE))
+        if task.get('store'):
+            store = open_store(task['store'], len(vectors[0]))
+            store.add(vectors, [{'text': text} for text in texts])
+        return {
+            'model': model,
+            'count': len(vectors),
+            'dimensions': len(vectors[0]),
+            'embeddings': vectors
+        }
+    except ENGINE_ERRORS:
+        raise
+    except Exception as e:
+        check()  # an I/O timeout at the deadline is a deadline error
+        output.warning(f"Embeddings failed: {e}", action='embeddings')
+        return None
@@ -1,8 +1,64 @@
 """File operations actions"""
+import os
 from pathlib import Path
+from .. import output
+from ..exceptions import ENGINE_ERRORS
 from ..registry import register
 
-@register('file_read')
+READ_SCHEMA = {
+    'type': 'object',
+    'required': ['path'],
+    'properties': {
+        'path': {'type': 'string', 'minLength': 1}
+    }
+}
+
+WRITE_SCHEMA = {
+    'type': 'object',
+    'required': ['path'],
+    'properties': {
+        'path': {'type': 'string', 'minLength': 1},
+        'content': {'type': 'string'}
+    }
+}
+
+def _file_state(task):
+    """Size and mtime of the file, so edits to it invalidate cached reads"""
+    try:
+        stat = os.stat(task.get('path', ''))
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+def _read_lines(task, context):
+    """Stream a file line by line"""
+    with open(task.get('path', ''), 'r') as f:
+        yield from f
+
+def _write_chunks(task, context, chunks):
+    """Write a stream to a file, replacing it only once the stream is complete"""
+    path = task.get('path', '')
+    try:
+        target = Path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        partial = target.with_name(target.name + '.part')
+        try:
+            with open(partial, 'w') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+            os.replace(partial, target)
+        except BaseException:
+            partial.unlink(missing_ok=True)
+            raise
+        return {'path': path}
+    except ENGINE_ERRORS:
+        raise
+    except Exception as e:
+        output.warning(f"File write failed: {e}", action='file_write')
+        return None
+
+@register('file_read', schema=READ_SCHEMA, pure=True, cache_key=_file_state, stream=_read_lines,
+          bulkhead='files', reads=())
 def file_read(task, context):
     """Read file content"""
     path = task.get('path', '')
@@ -10,11 +66,13 @@ def file_read(task, context):
         with open(path, 'r') as f:
             content = f.read()
         return {'content': content}
+    except ENGINE_ERRORS:
+        raise
     except Exception as e:
-        print(f"⚠️  File read failed: {e}")
+        output.warning(f"File read failed: {e}", action='file_read')
         return None
 
-@register('file_write')
+@register('file_write', schema=WRITE_SCHEMA, sink=_write_chunks, bulkhead='files', reads=())
 def file_write(task, context):
     """Write content to file"""
     path = task.get('path', '')
@@ -25,6 +83,8 @@ def file_write(task, context):
         with open(path, 'w') as f:
             f.write(content)
         return {'path': path}
+    except ENGINE_ERRORS:
+        raise
     except Exception as e:
-        print(f"⚠️  File write failed: {e}")
+        output.warning(f"File write failed: {e}", action='file_write')
         return None
@@ -1,22 +1,231 @@
 """HTTP request action"""
-import requests
+import hashlib
+import os
+from pathlib import Path
+from .. import codec, output, transport
+from ..compression import COMPRESS_SCHEMA, iter_decoded, iter_lines
+from ..deadlines import check, remaining
+from ..exceptions import ENGINE_ERRORS
 from ..registry import register
+from ..resilience import HEDGE_SCHEMA, RETRY_SCHEMA, send_with_policy
+from ..templates import project
 
-@register('http_request')
+CHUNK_SIZE = 64 * 1024
+
+SCHEMA = {
+    'type': 'object',
+    'required': ['url'],
+    'properties': {
+        'url': {'type': 'string', 'minLength': 1},
+        'method': {
+            'type': 'string',
+            'pattern': '(?i)^(GET|POST|PUT|PATCH|DELETE|HEAD|OPTIONS)$'
+        },
+        'headers': {
+            'type': 'object',
+            'additionalProperties': {'type': 'string'}
+        },
+        'stream_to': {'type': 'string', 'minLength': 1},
+        'max_bytes': {'type': 'integer', 'minimum': 1},
+        'checksum': {'enum': sorted(hashlib.algorithms_guaranteed)},
+        'chunk_size': {'type': 'integer', 'minimum': 1},
+        'compress': COMPRESS_SCHEMA,
+        'retry': RETRY_SCHEMA,
+        'hedge': HEDGE_SCHEMA
+    }
+}
+
+class ResponseTooLarge(Exception):
+    """Raised when a body exceeds the task's max_bytes"""
+
+class LazyResponse(dict):
+    """HTTP result holding the raw body; text and JSON decode on first access
+
+    ``content`` is decoded from ``body`` on every access (no second copy is
+    kept); ``json`` is parsed once and cached.
+    """
+
+    LAZY_KEYS = ('content', 'json')
+
+    def __init__(self, status_code, headers, body: bytes, encoding=None, **extra):
+        super().__init__(status_code=status_code, headers=headers, body=body, **extra)
+        self.encoding = encoding or 'utf-8'
+
+    def __missing__(self, key):
+        if key == 'content':
+            return dict.__getitem__(self, 'body').decode(self.encoding, errors='replace')
+        if key == 'json':
+            value = self._decode_json()
+            dict.__setitem__(self, 'json', value)
+            return value
+        raise KeyError(key)
+
+    def _decode_json(self):
+        content_type = dict.__getitem__(self, 'headers').get('content-type', '')
+        if not content_type.startswith('application/json'):
+            return None
+        try:
+            return codec.loads(dict.__getitem__(self, 'body'))
+        except ValueError:
+            return None
+
+    def __contains__(self, key):
+        return key in self.LAZY_KEYS or dict.__contains__(self, key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def project_paths(self, paths):
+        """Trim for context storage without decoding the body
+
+        ``content`` and ``json`` stay lazy: if either is used the raw body
+        is kept, otherwise it is dropped.
+        """
+        heads = {path[0] for path in paths}
+        if heads & set(self.LAZY_KEYS):
+            heads |= {'body', 'headers'}
+            kept = {key: dict.__getitem__(self, key) for key in dict.keys(self) if key in heads}
+            trimmed = LazyResponse.__new__(LazyResponse)
+            dict.__init__(trimmed, kept)
+            trimmed.encoding = self.encoding
+            return trimmed
+        return project(dict(self), paths)
+
+def _read_body(response, task, sink=None):
+    """Consume a streamed response in chunks, enforcing max_bytes
+
+    Compressed responses are decoded chunk by chunk; max_bytes applies to
+    the decoded size.
+    Chunks are written to ``sink`` when given, otherwise collected and
+    returned.  Returns (body_or_None, size, hexdigest_or_None).
+    """
+    max_bytes = task.get('max_bytes')
+    algorithm = task.get('checksum')
+    digest = hashlib.new(algorithm) if algorithm else None
+    chunks = []
+    size = 0
+
+    for chunk in iter_decoded(response, task.get('chunk_size', CHUNK_SIZE)):
+        check()
+        size += len(chunk)
+        if max_bytes and size > max_bytes:
+            raise ResponseTooLarge(f"Response exceeds max_bytes ({max_bytes})")
+        if digest is not None:
+            digest.update(chunk)
+        if sink is not None:
+            sink.write(chunk)
+        else:
+            chunks.append(chunk)
+
+    body = None if sink is not None else b''.join(chunks)
+    return body, size, digest.hexdigest() if digest is not None else None
+
+def _download(response, task):
+    """Stream a response body straight to task['stream_to']"""
+    path = Path(task['stream_to'])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(path.name + '.part')
+    try:
+        with open(partial, 'wb') as f:
+            _, size, checksum = _read_body(response, task, sink=f)
+        os.replace(partial, path)
+    except BaseException:
+        partial.unlink(missing_ok=True)
+        raise
+
+    result = {
+        'status_code': response.status_code,
+        'headers': {k.lower(): v for k, v in response.headers.items()},
+        'path': str(path),
+        'bytes': size
+    }
+    if checksum is not None:
+        result['checksum'] = checksum
+    return result
+
+def _method(task):
+    """The request method; uploads from a stream default to POST"""
+    return task.get('method', 'POST' if task.get('stream_from') else 'GET').upper()
+
+def _is_read_only(task):
+    """GET/HEAD requests without a download target have no side effects"""
+    return _method(task) in ('GET', 'HEAD', 'OPTIONS') and not task.get('stream_to')
+
+def _result(response, task):
+    """Build the task result from a streamed response"""
+    if task.get('stream_to'):
+        return _download(response, task)
+
+    body, _, checksum = _read_body(response, task)
+    extra = {'checksum': checksum} if checksum is not None else {}
+    return LazyResponse(
+        response.status_code,
+        {k.lower(): v for k, v in response.headers.items()},
+        body,
+        encoding=response.encoding,
+        **extra
+    )
+
+def _stream_lines(task, context):
+    """Stream the response body line by line"""
+    url = task.get('url', '')
+    headers = task.get('headers', {})
+
+    def send():
+        return transport.request(_method(task), url, headers=headers,
+                                 timeout=remaining(30), stream=True)
+
+    with send_with_policy(task, url, send) as response:
+        response.raise_for_status()
+        yield from iter_lines(response, task.get('chunk_size', CHUNK_SIZE))
+
+def _upload_chunks(task, context, chunks):
+    """Send a stream as a chunked request body
+
+    The body can only be sent once, so retry/hedge policies do not apply.
+    """
+    url = task.get('url', '')
+    body = (chunk.encode('utf-8') if isinstance(chunk, str) else chunk for chunk in chunks)
+    try:
+        with transport.request(_method(task), url, headers=task.get('headers', {}), data=body,
+                               timeout=remaining(30), stream=True,
+                               compress=task.get('compress')) as response:
+            return _result(response, task)
+    except ENGINE_ERRORS:
+        raise
+    except Exception as e:
+        check()  # an I/O timeout at the deadline is a deadline error
+        output.warning(f"HTTP request failed: {e}", action='http_request')
+        return None
+
+@register('http_request', schema=SCHEMA, pure=_is_read_only, stream=_stream_lines,
+          sink=_upload_chunks, bulkhead='http', hosts=lambda task: [task.get('url')], reads=())
 def http_request(task, context):
     """Make an HTTP request"""
     url = task.get('url', '')
-    method = task.get('method', 'GET').upper()
+    method = _method(task)
     headers = task.get('headers', {})
     data = task.get('data')
+
+    body = None
+    if data is not None:
+        body = codec.dumps(data)
+        headers = {'Content-Type': 'application/json', **headers}
     
     try:
-        response = requests.request(method, url, headers=headers, json=data, timeout=30)
-        return {
-            'status_code': response.status_code,
-            'content': response.text,
-            'json': response.json() if response.headers.get('content-type', '').startswith('application/json') else None
-        }
+        def send():
+            return transport.request(method, url, headers=headers, data=body,
+                                    timeout=remaining(30), stream=True,
+                                    compress=task.get('compress'))
+        
+        with send_with_policy(task, url, send) as response:
+            return _result(response, task)
+    except ENGINE_ERRORS:
+        raise
     except Exception as e:
-        print(f"⚠️  HTTP request failed: {e}")
+        check()  # an I/O timeout at the deadline is a deadline error
+        output.warning(f"HTTP request failed: {e}", action='http_request')
         return None
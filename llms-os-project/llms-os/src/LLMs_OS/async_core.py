@@ -1,81 +1,547 @@
 """Asynchronous execution engine for LLMs_OS"""
 import asyncio
+import sys
 import aiohttp
-import yaml
-from typing import Dict, Any, List
-from concurrent.futures import ThreadPoolExecutor
-from .exceptions import WorkflowExecutionError
+from typing import AbstractSet, Dict, Any, Iterator, List, Optional
+from . import output, prewarm, semantic_cache
+from .bulkheads import Bulkheads
+from .conditions import should_run
+from .context import DEFAULT_WINDOW, ContextPlan
+from .deadlines import Deadline, current_deadline
+from .exceptions import DeadlineExceededError, WorkflowExecutionError
+from .graph import TaskGraph
+from .loader import is_streamed, load_workflow, open_workflow_stream, validated_tasks
+from .incremental import IncrementalCache
+from .loop_monitor import LoopMonitor, run_offloaded
+from .providers import use_providers
+from .pruning import prunable, record_skip
 from .validators import WorkflowValidator
 from .monitoring import MetricsCollector
+from .profiling import get_profiler, task_label, traced, traced_coroutine
 from .registry import get_action
+from .streams import DEFAULT_BUFFER, Channel, consume, produce
+
+READ_BATCH = 32
+_END = object()
+
+def _take(iterator: Iterator, count: int) -> List:
+    """Pull up to ``count`` items from an iterator (runs in a worker thread)"""
+    items = []
+    for item in iterator:
+        items.append(item)
+        if len(items) >= count:
+            break
+    return items
 
 class AsyncExecutor:
     """Execute workflows asynchronously"""
     
-    def __init__(self, max_workers: int = 10):
-        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+    def __init__(self, max_workers: int = 10, timeout: float = None, fail_fast: bool = True,
+                 memo: IncrementalCache = None, loop_monitor: LoopMonitor = None,
+                 bulkheads: Bulkheads = None):
+        self.bulkheads = bulkheads or Bulkheads(default_size=max_workers)
+        self.executor = self.bulkheads.default.executor
         self.session = None
+        self.timeout = timeout
+        self.fail_fast = fail_fast
+        self.deadline = None
+        self.memo = memo
+        self.loop_monitor = loop_monitor
+        self.channels: Dict[str, Channel] = {}
     
     async def __aenter__(self):
         self.session = aiohttp.ClientSession()
+        self.deadline = Deadline(self.timeout)
+        if self.loop_monitor is not None:
+            self.loop_monitor.start()
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is not None:
+            # Stop in-flight work cooperatively and drop anything still queued
+            self.deadline.cancel()
+        if self.loop_monitor is not None:
+            await self.loop_monitor.stop()
         await self.session.close()
-        self.executor.shutdown(wait=True)
+        self.bulkheads.shutdown(wait=exc_type is None, cancel_futures=exc_type is not None)
+    
+    def _stream_call(self, task: Dict[str, Any], context: Dict[str, Any]):
+        """The blocking call that runs one end of a task stream
+        
+        Must be called on the loop before the consumer starts: the producer
+        opens the channel that its consumer then claims.
+        """
+        name = task.get('save_as')
+        if task.get('stream'):
+            channel = Channel(task.get('stream_buffer', DEFAULT_BUFFER))
+            self.channels[name] = channel
+            return lambda: produce(task, context, channel)
+        
+        channel = self.channels.pop(task['stream_from'], None)
+        if channel is None:
+            raise WorkflowExecutionError(f"Stream '{task['stream_from']}' has no running producer")
+        
+        def run():
+            try:
+                return consume(task, context, channel)
+            finally:
+                channel.close()
+        return run
     
     async def execute_task(self, task: Dict[str, Any], context: Dict[str, Any]) -> Dict[str, Any]:
-        """Execute a single task asynchronously"""
+        """Execute a single task asynchronously
+        
+        The task runs under a child of the workflow deadline, bounded by the
+        task's own ``timeout`` (seconds).  On timeout or cancellation the
+        deadline is cancelled so worker threads stop at their next check.
+        Actions run on their bulkhead's workers (see
+        :mod:`LLMs_OS.bulkheads`).  Both ends of a task stream run in worker
+        threads and are never memoised; the consumer gets a thread outside
+        its bulkhead.  A task whose ``when:`` condition is false returns an
+        empty result without running.
+        """
         action = task.get('action')
         action_func = get_action(action)
         
         if not action_func:
             raise WorkflowExecutionError(f"Action not found: {action}")
         
-        # Check if action is async
-        if asyncio.iscoroutinefunction(action_func):
-            result = await action_func(task, context, session=self.session)
-        else:
-            # Run sync function in thread pool
-            result = await asyncio.get_event_loop().run_in_executor(
-                self.executor, action_func, task, context
-            )
+        if not should_run(task, context):
+            record_skip(task, 'condition')
+            return {}
+        
+        streaming = bool(task.get('stream') or task.get('stream_from'))
+        
+        fingerprint = None
+        if self.memo is not None:
+            fingerprint, cached = self.memo.lookup(task)
+            if cached is not None:
+                self.memo.record(task, cached)
+                return cached
+        
+        if self.deadline is None:
+            self.deadline = Deadline(self.timeout)
+        deadline = self.deadline.child(task.get('timeout'))
+        deadline.check()
+        if streaming:
+            action_func = self._stream_call(task, context)
+        token = current_deadline.set(deadline)
+        profiler = get_profiler()
+        try:
+            monitor = self.loop_monitor
+            bulkhead = self.bulkheads.for_action(action)
+            if task.get('stream_from'):
+                pending = bulkhead.run_dedicated(traced(action_func, task_label(task)))
+            elif streaming:
+                pending = bulkhead.run(traced(action_func, task_label(task)))
+            elif asyncio.iscoroutinefunction(action_func):
+                if monitor is not None and monitor.should_offload(action):
+                    # This action keeps blocking the loop; give it its own
+                    pending = bulkhead.run(traced(run_offloaded, task_label(task)),
+                                           action_func, task, context)
+                else:
+                    pending = action_func(task, context, session=self.session)
+                    if profiler is not None:
+                        pending = traced_coroutine(pending, task_label(task))
+                    if monitor is not None:
+                        pending = monitor.track(pending, action, task_label(task))
+                    pending = bulkhead.limit(pending)
+            else:
+                # Run sync function on the bulkhead's threads, carrying the deadline along
+                pending = bulkhead.run(traced(action_func, task_label(task)), task, context)
+            result = await asyncio.wait_for(pending, deadline.time_left())
+        except asyncio.TimeoutError:
+            deadline.cancel()
+            raise DeadlineExceededError(
+                f"Task '{action}' exceeded its deadline"
+            ) from None
+        except asyncio.CancelledError:
+            deadline.cancel()
+            raise
+        finally:
+            current_deadline.reset(token)
         
+        if self.memo is not None:
+            self.memo.store_result(fingerprint, result)
+            self.memo.record(task, result)
         return result or {}
     
-    async def execute_parallel_tasks(self, tasks: List[Dict], context: Dict) -> Dict:
-        """Execute multiple tasks in parallel"""
+    async def _run_guarded(self, task: Dict[str, Any], context: Dict[str, Any],
+                           unused: bool = False) -> Dict[str, Any]:
+        """Run a task, swallowing its error if it has continue_on_error set
+        
+        An ``unused`` task (see :mod:`LLMs_OS.pruning`) finishes at once
+        with an empty result.
+        """
+        if unused:
+            record_skip(task, 'unused')
+            return {}
+        try:
+            return await self.execute_task(task, context)
+        except Exception as e:
+            if not task.get('continue_on_error'):
+                raise
+            output.warning(f"Task '{task.get('action')}' failed (continuing): {e}",
+                           action=task.get('action'))
+            return {}
+    
+    async def _run_batch(self, batch: List, context: Dict, plan: ContextPlan,
+                         unused: AbstractSet[int] = frozenset()) -> None:
+        """Run a batch of (index, task) pairs concurrently and save results
+        
+        With fail_fast, the first failure cancels the remaining siblings;
+        otherwise the batch runs to completion.  Either way the first error
+        is re-raised once the batch has settled.
+        """
+        if not batch:
+            return
+        
+        futures = {
+            asyncio.ensure_future(self._run_guarded(task, context, index in unused)): (index, task)
+            for index, task in batch
+        }
+        pending = set(futures)
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    if future.cancelled():
+                        continue
+                    if future.exception() is not None:
+                        if error is None:
+                            error = future.exception()
+                            if self.fail_fast:
+                                for other in pending:
+                                    other.cancel()
+                        continue
+                    index, task = futures[future]
+                    plan.save(index, task, future.result(), context)
+        finally:
+            for future in pending:
+                future.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        
+        for index, _ in batch:
+            plan.release(index, context)
+        if error is not None:
+            raise error
+    
+    async def execute_parallel_tasks(self, tasks: List[Dict], context: Dict,
+                                     plan: ContextPlan = None,
+                                     unused: AbstractSet[int] = frozenset()) -> Dict:
+        """Execute multiple tasks in parallel
+        
+        A streaming task is held back and started alongside its consumer.
+        Tasks whose indices are in ``unused`` are skipped.
+        """
+        if plan is None:
+            plan = ContextPlan(tasks)
         tasks_to_run = []
+        held = {}
         
-        for task in tasks:
+        for index, task in enumerate(tasks):
+            if task.get('stream'):
+                held[task['save_as']] = (index, task)
+                continue
+            source = task.get('stream_from')
+            producer = [held.pop(source)] if source in held else []
+            
             if task.get('parallel', False):
-                tasks_to_run.append(self.execute_task(task, context))
+                tasks_to_run.extend(producer + [(index, task)])
+            elif producer:
+                await self._run_batch(tasks_to_run, context, plan, unused)
+                tasks_to_run = []
+                await self._run_batch(producer + [(index, task)], context, plan, unused)
             else:
                 # Execute sequential task and wait
-                if tasks_to_run:
-                    results = await asyncio.gather(*tasks_to_run, return_exceptions=True)
-                    tasks_to_run = []
+                await self._run_batch(tasks_to_run, context, plan, unused)
+                tasks_to_run = []
                 
-                result = await self.execute_task(task, context)
-                context.update(result)
+                result = await self._run_guarded(task, context, index in unused)
+                plan.save(index, task, result, context)
+                plan.release(index, context)
         
         # Execute remaining parallel tasks
-        if tasks_to_run:
-            results = await asyncio.gather(*tasks_to_run, return_exceptions=True)
+        await self._run_batch(tasks_to_run, context, plan, unused)
         
         return context
+    
+    async def execute_graph(self, tasks: List[Dict], context: Dict,
+                            plan: ContextPlan = None,
+                            unused: AbstractSet[int] = frozenset()) -> Dict:
+        """Execute tasks as soon as the tasks they depend on have finished
+        
+        Dependencies are inferred from template references (see
+        :mod:`LLMs_OS.graph`), so independent tasks overlap without being
+        marked ``parallel``.  Failure handling follows ``fail_fast`` as for
+        parallel batches; without it, tasks downstream of a failure are
+        skipped while unrelated branches finish.
+        
+        A streaming task is held once ready and started together with its
+        consumer when the consumer is waiting on nothing else.  Tasks whose
+        indices are in ``unused`` finish at once without running.
+        """
+        if plan is None:
+            plan = ContextPlan(tasks)
+        graph = TaskGraph(tasks)
+        waiting = [set(deps) for deps in graph.dependencies]
+        ready = graph.roots()
+        running = {}
+        error = None
+        consumers = {}
+        for index, task in enumerate(tasks):
+            source = task.get('stream_from')
+            if source:
+                producer = next(d for d in graph.dependencies[index]
+                                if tasks[d].get('stream') and tasks[d].get('save_as') == source)
+                consumers[producer] = index
+        held = set()
+        
+        def launch(index):
+            future = asyncio.ensure_future(self._run_guarded(tasks[index], context, index in unused))
+            running[future] = index
+        
+        try:
+            while ready or running or held:
+                for index in ready:
+                    if index in consumers:
+                        held.add(index)
+                    else:
+                        launch(index)
+                ready = []
+                for index in list(held):
+                    consumer = consumers[index]
+                    if waiting[consumer] == {index}:
+                        held.discard(index)
+                        waiting[consumer].clear()
+                        graph.dependents[index].discard(consumer)
+                        launch(index)
+                        launch(consumer)
+                if not running:
+                    break  # only producers whose consumers were skipped
+                
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    index = running.pop(future)
+                    if future.cancelled():
+                        continue
+                    if future.exception() is not None:
+                        if error is None:
+                            error = future.exception()
+                            if self.fail_fast:
+                                for other in running:
+                                    other.cancel()
+                        continue
+                    
+                    plan.save(index, tasks[index], future.result(), context)
+                    plan.release(index, context)
+                    if error is not None and self.fail_fast:
+                        continue
+                    for dependent in graph.dependents[index]:
+                        waiting[dependent].discard(index)
+                        if not waiting[dependent]:
+                            ready.append(dependent)
+        finally:
+            for future in running:
+                future.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+        
+        if error is not None:
+            raise error
+        return context
+    
+    async def execute_stream(self, tasks: Iterator[Dict], context: Dict,
+                             plan: ContextPlan, window: int = DEFAULT_WINDOW) -> Dict:
+        """Execute tasks from a (lazy) iterator with bounded look-ahead
+        
+        A background reader pulls tasks from ``tasks`` in the thread pool
+        while earlier tasks run.  At most ``window`` tasks are held at once
+        (queued, waiting on dependencies or running), so memory stays
+        proportional to the window rather than to the workflow size.
+        Dependencies are inferred incrementally as in :meth:`execute_graph`.
+        """
+        queue = asyncio.Queue(maxsize=window)
+        worker = None  # the _take call in flight, joined before returning
+        
+        async def read():
+            nonlocal worker
+            try:
+                while True:
+                    worker = self.executor.submit(_take, tasks, READ_BATCH)
+                    batch = await asyncio.wrap_future(worker)
+                    for task in batch:
+                        await queue.put(task)
+                    if len(batch) < READ_BATCH:
+                        break
+            except Exception:
+                await queue.put(_END)  # the error is raised once running tasks settle
+                raise
+            # Not in a finally: once cancelled, nobody drains a full queue
+            await queue.put(_END)
+        
+        reader = asyncio.ensure_future(read())
+        graph = TaskGraph(record=False)
+        pending: Dict[int, Dict] = {}      # index -> task, not yet finished
+        waiting: Dict[int, set] = {}       # index -> unfinished dependencies
+        dependents: Dict[int, set] = {}
+        running = {}
+        ready = []
+        next_index = 0
+        incoming = None
+        exhausted = False
+        error = None
+        
+        try:
+            while True:
+                for index in ready:
+                    future = asyncio.ensure_future(self._run_guarded(pending[index], context))
+                    running[future] = index
+                ready = []
+                
+                accepting = error is None or not self.fail_fast
+                if incoming is None and not exhausted and accepting and len(pending) < window:
+                    incoming = asyncio.ensure_future(queue.get())
+                waitables = set(running)
+                if incoming is not None:
+                    waitables.add(incoming)
+                if not waitables:
+                    break
+                
+                done, _ = await asyncio.wait(waitables, return_when=asyncio.FIRST_COMPLETED)
+                if incoming in done:
+                    task, incoming = incoming.result(), None
+                    if task is _END:
+                        exhausted = True
+                    else:
+                        if task.get('stream') or task.get('stream_from'):
+                            raise WorkflowExecutionError(
+                                "Task streams (stream/stream_from) are not supported in streamed runs"
+                            )
+                        index, next_index = next_index, next_index + 1
+                        deps = {d for d in graph.add(task) if d in pending}
+                        plan.admit(index, task, context)
+                        pending[index] = task
+                        waiting[index] = deps
+                        for dep in deps:
+                            dependents.setdefault(dep, set()).add(index)
+                        if not deps:
+                            ready.append(index)
+                
+                for future in done:
+                    if future not in running:
+                        continue
+                    index = running.pop(future)
+                    task = pending.pop(index)
+                    graph.discard(index)
+                    if future.cancelled() or future.exception() is not None:
+                        plan.release(index, context)
+                        if not future.cancelled() and error is None:
+                            error = future.exception()
+                            if self.fail_fast:
+                                for other in running:
+                                    other.cancel()
+                        continue
+                    
+                    plan.save(index, task, future.result(), context)
+                    plan.release(index, context)
+                    for dependent in dependents.pop(index, ()):
+                        waiting[dependent].discard(index)
+                        if not waiting[dependent] and (error is None or not self.fail_fast):
+                            ready.append(dependent)
+                    del waiting[index]
+        finally:
+            for future in running:
+                future.cancel()
+            if incoming is not None:
+                incoming.cancel()
+            reader.cancel()
+            await asyncio.gather(reader, *running, return_exceptions=True)
+            if worker is not None:
+                # A running _take cannot be cancelled; let it finish before
+                # the caller closes the file it is reading from
+                await asyncio.gather(asyncio.wrap_future(worker), return_exceptions=True)
+        
+        if error is not None:
+            raise error
+        # Surface errors raised while reading/validating the stream
+        if reader.done() and not reader.cancelled() and reader.exception() is not None:
+            raise reader.exception()
+        return context
+
+def run_async(coro, use_uvloop: bool = False):
+    """Run a coroutine to completion, on uvloop when asked and installed"""
+    if use_uvloop:
+        try:
+            import uvloop
+        except ImportError:
+            output.warning("uvloop is not installed; using the default event loop")
+        else:
+            if sys.version_info >= (3, 11):
+                with asyncio.Runner(loop_factory=uvloop.new_event_loop) as runner:
+                    return runner.run(coro)
+            previous = asyncio.get_event_loop_policy()
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+            try:
+                return asyncio.run(coro)
+            finally:
+                asyncio.set_event_loop_policy(previous)  # later loops are not uvloop's
+    return asyncio.run(coro)
 
-async def execute_yaml_async(file_path: str) -> None:
-    """Execute workflow from YAML file asynchronously"""
-    with open(file_path, 'r', encoding='utf-8') as f:
-        workflow = yaml.safe_load(f)
+async def execute_yaml_async(file_path: str, incremental: bool = None,
+                             stream: bool = None) -> None:
+    """Execute workflow from YAML file asynchronously
+    
+    ``incremental`` overrides the workflow's ``incremental:`` setting.
+    ``stream`` starts running tasks while the rest of the file is still
+    being read (default: only for ``.jsonl`` workflows).
+    """
+    # Import actions to ensure they're registered
+    import LLMs_OS.actions
     
-    # Validate workflow
-    WorkflowValidator.validate(workflow)
+    if is_streamed(file_path, stream):
+        with open_workflow_stream(file_path) as source:
+            WorkflowValidator.validate_settings(source.header)
+            plan = ContextPlan.from_workflow(source.header, streaming=True)
+            await _execute(source.header, validated_tasks(source), plan, file_path, incremental)
+        return
     
-    # Execute with metrics tracking
-    with MetricsCollector.track_workflow():
-        async with AsyncExecutor() as executor:
-            context = {}
-            tasks = workflow.get('tasks', [])
-            await executor.execute_parallel_tasks(tasks, context)
+    workflow = load_workflow(file_path)
+    plan = ContextPlan.from_workflow(workflow)
+    await _execute(workflow, None, plan, file_path, incremental)
+
+async def _execute(workflow: Dict[str, Any], stream: Optional[Iterator[Dict]], plan: ContextPlan,
+                   file_path: str, incremental: bool = None) -> None:
+    """Run a loaded workflow, or a stream of tasks when ``stream`` is given"""
+    with use_providers(workflow.get('providers')), output.use_output(workflow.get('output')), \
+            semantic_cache.use_workflow(file_path):
+        tasks = workflow.get('tasks', [])
+        unused = set() if stream is not None else prunable(workflow, tasks)
+        prewarm.start(workflow, skip=unused)
+    
+        # Execute with metrics tracking
+        with MetricsCollector.track_workflow():
+            memo = IncrementalCache.from_workflow(workflow, file_path, incremental)
+            if memo is not None:
+                plan.on_evict = memo.forget
+            async with AsyncExecutor(timeout=workflow.get('timeout'),
+                                     fail_fast=workflow.get('fail_fast', True),
+                                     memo=memo,
+                                     loop_monitor=LoopMonitor.from_workflow(workflow),
+                                     bulkheads=Bulkheads.from_workflow(workflow)) as executor:
+                if unused:
+                    output.info(f"Skipping {len(unused)} task(s) whose results are never used", icon='✂️  ')
+                with plan.new_context() as context:
+                    if stream is not None:
+                        await executor.execute_stream(
+                            stream, context, plan, window=workflow.get('window', DEFAULT_WINDOW)
+                        )
+                    elif workflow.get('schedule', 'auto') == 'auto':
+                        await executor.execute_graph(tasks, context, plan, unused)
+                    else:
+                        await executor.execute_parallel_tasks(tasks, context, plan, unused)
+        
+            if memo is not None and memo.hits:
+                output.info(f"Reused {memo.hits} cached task result(s)", icon='♻️  ')
@@ -0,0 +1,149 @@
+"""Bulkhead worker pools for the async engine
+
+Each class of action runs on its own bounded pool, so a burst of slow file
+reads or a hung HTTP endpoint only exhausts its own workers and other
+actions keep their throughput.  Sync actions get a thread pool per
+bulkhead; coroutine actions are limited by a semaphore of the same size.
+
+Actions declare their bulkhead with ``@register(..., bulkhead='http')``;
+actions without one share the ``default`` pool.  Workflow-level sizes::
+
+    bulkheads:
+      llm: 8          # chat_completion, embeddings
+      http: 4         # http_request
+      files: 2        # file_read, file_write
+      default: 10     # everything else
+      file_read: 1    # naming an action gives it a pool of its own
+
+Unlisted pools have 10 workers.  A stream producer holds a worker of its
+pool until the stream ends.  Its consumer runs on a thread of its own
+outside the pool, so the consumer never waits behind the producers it
+drains, and streams sharing a pool cannot deadlock.
+
+Per-pool metrics: ``llms_os_bulkhead_utilisation`` (busy / size) and
+``llms_os_bulkhead_queue_wait_seconds`` (time spent waiting for a worker).
+"""
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+from .monitoring import bulkhead_queue_wait, bulkhead_utilisation
+from .registry import get_bulkhead
+
+DEFAULT_POOL = 'default'
+DEFAULT_SIZE = 10
+
+BULKHEADS_SCHEMA = {
+    'type': 'object',
+    'additionalProperties': {'type': 'integer', 'minimum': 1}
+}
+
+class Bulkhead:
+    """A bounded pool of workers for one class of actions"""
+
+    def __init__(self, name: str, size: int = DEFAULT_SIZE):
+        self.name = name
+        self.size = size
+        self.executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix=f'bulkhead-{name}')
+        self.busy = 0
+        self._lock = threading.Lock()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _enter(self, waited: float) -> None:
+        bulkhead_queue_wait.labels(pool=self.name).observe(waited)
+        with self._lock:
+            self.busy += 1
+            bulkhead_utilisation.labels(pool=self.name).set(self.busy / self.size)
+
+    def _exit(self) -> None:
+        with self._lock:
+            self.busy -= 1
+            bulkhead_utilisation.labels(pool=self.name).set(self.busy / self.size)
+
+    def run(self, func, *args) -> asyncio.Future:
+        """Run a blocking call on this pool's threads (from the event loop)"""
+        submitted = time.perf_counter()
+
+        def call():
+            self._enter(time.perf_counter() - submitted)
+            try:
+                return func(*args)
+            finally:
+                self._exit()
+
+        return asyncio.get_running_loop().run_in_executor(
+            self.executor, contextvars.copy_context().run, call
+        )
+
+    def run_dedicated(self, func, *args) -> asyncio.Future:
+        """Run a blocking call on a new thread outside the pool (from the event loop)"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        context = contextvars.copy_context()
+
+        def settle(method, value):
+            if not future.done():
+                method(value)
+
+        def call():
+            try:
+                result = context.run(func, *args)
+            except BaseException as e:
+                outcome = (future.set_exception, e)
+            else:
+                outcome = (future.set_result, result)
+            try:
+                loop.call_soon_threadsafe(settle, *outcome)
+            except RuntimeError:  # the loop has already closed
+                pass
+
+        threading.Thread(target=call, name=f'bulkhead-{self.name}-stream', daemon=True).start()
+        return future
+
+    async def limit(self, coro) -> Any:
+        """Await a coroutine while holding one of this pool's slots"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.size)
+        submitted = time.perf_counter()
+        async with self._semaphore:
+            self._enter(time.perf_counter() - submitted)
+            try:
+                return await coro
+            finally:
+                self._exit()
+
+class Bulkheads:
+    """The bulkhead pools of one executor, created on first use"""
+
+    def __init__(self, sizes: Dict[str, int] = None, default_size: int = DEFAULT_SIZE):
+        self.sizes = dict(sizes or {})
+        self.default_size = default_size
+        self.pools: Dict[str, Bulkhead] = {}
+
+    @classmethod
+    def from_workflow(cls, workflow: Dict[str, Any], default_size: int = DEFAULT_SIZE) -> 'Bulkheads':
+        return cls(workflow.get('bulkheads'), default_size)
+
+    def pool_name(self, action: str) -> str:
+        if action in self.sizes:
+            return action
+        return get_bulkhead(action) or DEFAULT_POOL
+
+    def get(self, name: str) -> Bulkhead:
+        pool = self.pools.get(name)
+        if pool is None:
+            pool = self.pools[name] = Bulkhead(name, self.sizes.get(name, self.default_size))
+        return pool
+
+    def for_action(self, action: str) -> Bulkhead:
+        return self.get(self.pool_name(action))
+
+    @property
+    def default(self) -> Bulkhead:
+        return self.get(DEFAULT_POOL)
+
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False) -> None:
+        for pool in self.pools.values():
+            pool.executor.shutdown(wait=wait, cancel_futures=cancel_futures)
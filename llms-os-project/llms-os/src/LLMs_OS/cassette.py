@@ -0,0 +1,228 @@
+"""Record and replay HTTP traffic
+
+``llms-os flow.yaml --record run.cassette`` sends requests normally and
+captures every request/response pair, including how long each one took,
+in a gzip-compressed JSON-lines cassette.
+``llms-os flow.yaml --replay run.cassette`` serves the recorded responses
+locally and never touches the network, which makes perf comparisons
+repeatable and isolates engine overhead:
+
+* ``--replay-latency original`` (default) waits as long as the recording did
+* ``--replay-latency zero`` answers immediately
+* ``--replay-latency 0.5`` scales the recorded timings
+
+Requests are matched on method, URL and a digest of the body.  If no entry
+has the exact URL, one with the same path on another host is used, so
+provider-pool failover does not break a replay.  Repeated identical
+requests are served in recorded order, and the last one is reused after
+that.  Connection errors and timeouts are recorded and replayed as well.
+Recording reads each body fully before handing the response back.
+"""
+import base64
+import gzip
+import hashlib
+import io
+import threading
+import time
+from collections import defaultdict, deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Tuple, Union
+from urllib.parse import urlsplit
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from . import codec, deadlines
+from .exceptions import CassetteMissError
+
+FORMAT_VERSION = 1
+
+# Headers describing the wire encoding; recorded bodies are already decoded
+_TRANSPORT_HEADERS = frozenset({'content-encoding', 'content-length', 'transfer-encoding'})
+
+_ERRORS = {
+    'ConnectTimeout': requests.ConnectTimeout,
+    'ReadTimeout': requests.ReadTimeout,
+    'Timeout': requests.Timeout,
+    'ConnectionError': requests.ConnectionError,
+}
+
+_active: Optional['Cassette'] = None
+
+def _request_body(kwargs: Dict[str, Any]) -> bytes:
+    if kwargs.get('json') is not None:
+        return codec.dumps(kwargs['json'], sort_keys=True)
+    data = kwargs.get('data')
+    if data is None:
+        return b''
+    if isinstance(data, str):
+        return data.encode('utf-8')
+    if isinstance(data, (bytes, bytearray)):
+        return bytes(data)
+    return codec.dumps(data, sort_keys=True, default=str)
+
+def _body_digest(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()[:16]
+
+def _match_keys(method: str, url: str, digest: str) -> Tuple[Tuple, Tuple]:
+    """(exact key, host-independent key) for a request"""
+    parts = urlsplit(url)
+    path = parts.path + (f"?{parts.query}" if parts.query else '')
+    method = method.upper()
+    return (method, url, digest), (method, path, digest)
+
+def _encode_body(body: bytes) -> Dict[str, str]:
+    try:
+        return {'text': body.decode('utf-8')}
+    except UnicodeDecodeError:
+        return {'b64': base64.b64encode(body).decode('ascii')}
+
+def _decode_body(entry: Dict[str, Any]) -> bytes:
+    if 'b64' in entry:
+        return base64.b64decode(entry['b64'])
+    return entry.get('text', '').encode('utf-8')
+
+def _build_response(entry: Dict[str, Any], url: str) -> requests.Response:
+    """A requests.Response whose body streams from the recorded bytes"""
+    response = requests.Response()
+    response.status_code = entry['status']
+    response.reason = entry.get('reason', '')
+    response.headers = CaseInsensitiveDict(entry.get('headers', {}))
+    response.encoding = get_encoding_from_headers(response.headers)
+    response.url = url
+    response.elapsed = timedelta(seconds=entry.get('elapsed', 0))
+    response.raw = io.BytesIO(_decode_body(entry))
+    return response
+
+class Cassette:
+    """Recorded HTTP exchanges, in record or replay mode"""
+
+    MODES = ('record', 'replay')
+
+    def __init__(self, path: str, mode: str = 'replay', latency: Union[str, float] = 'original'):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.scale = self._latency_scale(latency)
+        self.entries: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._exact: Dict[Tuple, deque] = defaultdict(deque)
+        self._by_path: Dict[Tuple, deque] = defaultdict(deque)
+        self._served = set()
+        if mode == 'replay':
+            self._load()
+
+    @staticmethod
+    def _latency_scale(latency: Union[str, float]) -> float:
+        if latency == 'original':
+            return 1.0
+        if latency == 'zero':
+            return 0.0
+        try:
+            scale = float(latency)
+        except (TypeError, ValueError):
+            scale = -1
+        if scale < 0:
+            raise ValueError(f"Replay latency must be 'original', 'zero' or a factor >= 0: {latency}")
+        return scale
+
+    def _load(self) -> None:
+        with gzip.open(self.path, 'rb') as f:
+            header = codec.loads(f.readline())
+            if header.get('version') != FORMAT_VERSION:
+                raise ValueError(f"Unsupported cassette version in {self.path}: {header.get('version')}")
+            for line in f:
+                entry = codec.loads(line)
+                self.entries.append(entry)
+                exact, by_path = _match_keys(entry['method'], entry['url'], entry['body_digest'])
+                self._exact[exact].append(entry)
+                self._by_path[by_path].append(entry)
+
+    def save(self) -> None:
+        """Write recorded entries (record mode only)"""
+        if self.mode != 'record':
+            return
+        with self._lock:
+            entries = list(self.entries)
+        with gzip.open(self.path, 'wb') as f:
+            f.write(codec.dumps({'version': FORMAT_VERSION, 'recorded_at': time.time()}) + b'\n')
+            for entry in entries:
+                f.write(codec.dumps(entry) + b'\n')
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        if isinstance(kwargs.get('data'), Iterator):
+            # Streamed uploads are buffered so they can be matched on content
+            kwargs['data'] = b''.join(kwargs['data'])
+        body = _request_body(kwargs)
+        if self.mode == 'record':
+            return self._record(method, url, body, kwargs)
+        return self._replay(method, url, body)
+
+    def _record(self, method: str, url: str, body: bytes, kwargs: Dict[str, Any]) -> requests.Response:
+        entry = {'method': method.upper(), 'url': url, 'body_digest': _body_digest(body)}
+        start = time.monotonic()
+        try:
+            response = requests.request(method, url, **kwargs)
+            content = response.content
+        except requests.RequestException as e:
+            entry.update(error=type(e).__name__, message=str(e),
+                         elapsed=round(time.monotonic() - start, 6))
+            self._append(entry)
+            raise
+
+        entry.update(
+            status=response.status_code,
+            reason=response.reason,
+            headers={k: v for k, v in response.headers.items() if k.lower() not in _TRANSPORT_HEADERS},
+            elapsed=round(time.monotonic() - start, 6),
+            **_encode_body(content)
+        )
+        self._append(entry)
+        return response
+
+    def _append(self, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self.entries.append(entry)
+
+    def _take(self, method: str, url: str, body: bytes) -> Dict[str, Any]:
+        keys = _match_keys(method, url, _body_digest(body))
+        with self._lock:
+            for index, key in zip((self._exact, self._by_path), keys):
+                queue = index.get(key)
+                if not queue:
+                    continue
+                # Skip entries already served through the other index
+                while len(queue) > 1 and id(queue[0]) in self._served:
+                    queue.popleft()
+                entry = queue[0]
+                if len(queue) > 1:
+                    queue.popleft()
+                    self._served.add(id(entry))
+                return entry
+        raise CassetteMissError(f"No recorded response for {method.upper()} {url} in {self.path}")
+
+    def _replay(self, method: str, url: str, body: bytes) -> requests.Response:
+        entry = self._take(method, url, body)
+        if self.scale:
+            deadlines.sleep(entry.get('elapsed', 0) * self.scale)
+        if 'error' in entry:
+            raise _ERRORS.get(entry['error'], requests.ConnectionError)(entry.get('message', ''))
+        return _build_response(entry, url)
+
+def get_cassette() -> Optional[Cassette]:
+    """The cassette HTTP traffic is currently routed through, if any"""
+    return _active
+
+@contextmanager
+def use_cassette(path: str, mode: str = 'replay', latency: Union[str, float] = 'original'):
+    """Record or replay all action HTTP traffic inside the block"""
+    global _active
+    cassette = Cassette(path, mode, latency)
+    previous, _active = _active, cassette
+    try:
+        yield cassette
+    finally:
+        _active = previous
+        cassette.save()
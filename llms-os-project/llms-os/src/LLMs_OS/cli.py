@@ -1,14 +1,46 @@
 """Command-line interface for LLMs_OS"""
 import sys
 import argparse
+from contextlib import nullcontext
 from pathlib import Path
-from .core import execute_yaml
+from . import output
+from .cassette import use_cassette
+from .core import dry_run, execute_yaml
+from .async_core import execute_yaml_async, run_async
+from .profiling import Profiler
 
 def main():
     """Main CLI entry point"""
     parser = argparse.ArgumentParser(description='LLMs_OS - Workflow automation with LLMs')
     parser.add_argument('workflow', nargs='?', help='Path to workflow YAML file')
     parser.add_argument('--version', action='store_true', help='Show version')
+    engine = parser.add_mutually_exclusive_group()
+    engine.add_argument('--async', dest='use_async', action='store_true', default=True,
+                        help='Run on the async engine, which schedules tasks by their '
+                             'data dependencies (default)')
+    engine.add_argument('--sync', dest='use_async', action='store_false',
+                        help='Run tasks one at a time, in file order')
+    parser.add_argument('--uvloop', action='store_true',
+                        help='Run the async engine on uvloop if it is installed')
+    parser.add_argument('--incremental', action='store_true', default=None,
+                        help='Reuse stored results of tasks whose inputs are unchanged')
+    traffic = parser.add_mutually_exclusive_group()
+    traffic.add_argument('--record', metavar='CASSETTE',
+                         help='Record HTTP traffic (with timings) to a cassette file')
+    traffic.add_argument('--replay', metavar='CASSETTE',
+                         help='Serve HTTP traffic from a cassette instead of the network')
+    parser.add_argument('--replay-latency', default='original', metavar='original|zero|FACTOR',
+                        help='Replay with the recorded latency, none, or scaled by FACTOR')
+    parser.add_argument('--profile', nargs='?', const='llms_os_profile', metavar='PREFIX',
+                        help='Sample the run and write PREFIX.txt and PREFIX.folded (flamegraph)')
+    parser.add_argument('--profile-interval', type=float, default=5.0, metavar='MS',
+                        help='Sampling interval for --profile in milliseconds (default: 5)')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Show which tasks would run or be skipped, without running any')
+    parser.add_argument('--output-format', choices=['text', 'json'],
+                        help='Write messages as text or as JSON lines (overrides the workflow)')
+    parser.add_argument('--log-level', choices=list(output.LEVELS),
+                        help='Drop messages below this level (overrides the workflow)')
     
     args = parser.parse_args()
     
@@ -20,17 +52,47 @@ def main():
         parser.print_help()
         return 1
     
+    output.set_overrides(format=args.output_format, level=args.log_level)
     workflow_path = Path(args.workflow)
     if not workflow_path.exists():
-        print(f"❌ Workflow file not found: {workflow_path}")
+        output.error(f"Workflow file not found: {workflow_path}")
+        output.flush()
         return 1
     
+    if args.dry_run:
+        try:
+            dry_run(str(workflow_path))
+            return 0
+        except Exception as e:
+            output.error(f"Dry run failed: {e}")
+            output.flush()
+            return 1
+    
+    if args.record:
+        traffic = use_cassette(args.record, 'record')
+    elif args.replay:
+        traffic = use_cassette(args.replay, 'replay', args.replay_latency)
+    else:
+        traffic = nullcontext()
+    
+    profiler = Profiler(args.profile_interval / 1000).start() if args.profile else None
     try:
-        execute_yaml(str(workflow_path))
+        with traffic:
+            if args.use_async:
+                run_async(execute_yaml_async(str(workflow_path), incremental=args.incremental),
+                          use_uvloop=args.uvloop)
+            else:
+                execute_yaml(str(workflow_path), incremental=args.incremental)
         return 0
     except Exception as e:
-        print(f"❌ Workflow execution failed: {e}")
+        output.error(f"Workflow execution failed: {e}")
         return 1
+    finally:
+        if profiler is not None:
+            profiler.stop()
+            report, folded = profiler.write(args.profile)
+            output.info(f"Profile written to {report} and {folded}", icon='📈 ')
+        output.flush()
 
 if __name__ == '__main__':
     sys.exit(main())
@@ -0,0 +1,55 @@
+"""JSON codec used for request bodies, responses and workflow files
+
+Uses ``orjson`` when it is installed and falls back to the standard library
+otherwise.  Set ``LLMS_OS_JSON=json`` to force the stdlib codec, or call
+:func:`set_codec` to plug in another implementation.
+
+:func:`dumps` always returns compact UTF-8 ``bytes``.  Values the fast
+codec cannot encode (integers wider than 64 bits, non-string keys) are
+retried with the stdlib so behaviour never depends on what is installed.
+"""
+import json
+import os
+from typing import Any, Callable, Optional, Union
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+def _std_loads(data: Union[bytes, str]) -> Any:
+    return json.loads(data)
+
+def _std_dumps(value: Any, sort_keys: bool = False, default: Optional[Callable] = None) -> bytes:
+    return json.dumps(value, sort_keys=sort_keys, default=default, ensure_ascii=False,
+                      separators=(',', ':')).encode('utf-8')
+
+def _orjson_dumps(value: Any, sort_keys: bool = False, default: Optional[Callable] = None) -> bytes:
+    try:
+        return orjson.dumps(value, default=default,
+                            option=orjson.OPT_SORT_KEYS if sort_keys else 0)
+    except TypeError:
+        return _std_dumps(value, sort_keys, default)
+
+if orjson is not None and os.getenv('LLMS_OS_JSON', 'auto') != 'json':
+    BACKEND = 'orjson'
+    _loads, _dumps = orjson.loads, _orjson_dumps
+else:
+    BACKEND = 'json'
+    _loads, _dumps = _std_loads, _std_dumps
+
+def loads(data: Union[bytes, bytearray, str]) -> Any:
+    """Decode JSON from bytes or text (raises ValueError on bad input)"""
+    return _loads(data)
+
+def dumps(value: Any, sort_keys: bool = False, default: Optional[Callable] = None) -> bytes:
+    """Encode a value as compact UTF-8 JSON"""
+    return _dumps(value, sort_keys, default)
+
+def set_codec(name: str, loads_func: Callable, dumps_func: Callable) -> None:
+    """Install a custom codec
+
+    ``dumps_func(value, sort_keys, default)`` must return ``bytes``.
+    """
+    global BACKEND, _loads, _dumps
+    BACKEND, _loads, _dumps = name, loads_func, dumps_func
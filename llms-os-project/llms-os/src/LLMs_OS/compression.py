@@ -0,0 +1,161 @@
+"""HTTP body compression
+
+Request bodies are compressed when a task opts in::
+
+    - action: chat_completion
+      messages: [...]
+      compress: gzip        # gzip, deflate, br, zstd; true means gzip
+
+``br`` needs the ``brotli`` package and ``zstd`` the ``zstandard`` package;
+the validator rejects them when it is missing.
+Bodies under ``MIN_SIZE`` bytes are sent as they are.  Streamed uploads are
+compressed chunk by chunk.
+
+Responses are always negotiated: requests advertises every encoding
+urllib3 can decode here (gzip and deflate, plus br/zstd when installed),
+and streamed bodies are decompressed incrementally as they are read.
+
+Body sizes before and after compression are counted in
+``llms_os_http_body_bytes_total`` and ``llms_os_http_wire_bytes_total``.
+"""
+import codecs
+import zlib
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+from .monitoring import http_body_bytes, http_wire_bytes
+
+try:
+    import brotli
+except ImportError:  # br is only offered when installed
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # zstd is only offered when installed
+    zstandard = None
+
+MIN_SIZE = 1024
+CHUNK_SIZE = 64 * 1024
+
+COMPRESS_SCHEMA = {
+    'anyOf': [
+        {'type': 'boolean'},
+        {'enum': ['gzip', 'deflate', 'br', 'zstd']}
+    ]
+}
+
+class _Brotli:
+    """brotli.Compressor with the zlib compressobj interface"""
+
+    def __init__(self):
+        self._compressor = brotli.Compressor()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.finish()
+
+def available() -> Tuple[str, ...]:
+    """Encodings that request bodies can be compressed with"""
+    names = ('gzip', 'deflate')
+    if brotli is not None:
+        names += ('br',)
+    if zstandard is not None:
+        names += ('zstd',)
+    return names
+
+def compression_error(setting: Any) -> Optional[str]:
+    """Why a ``compress`` setting cannot be used here (or None if it can)"""
+    encoding = 'gzip' if setting is True else setting
+    if encoding in ('br', 'zstd') and encoding not in available():
+        package = 'brotli' if encoding == 'br' else 'zstandard'
+        return f"compression '{encoding}' is not available (pip install {package})"
+    return None
+
+def encoding_for(setting: Any) -> Optional[str]:
+    """The Content-Encoding for a task's ``compress`` setting (or None)"""
+    if not setting:
+        return None
+    encoding = 'gzip' if setting is True else setting
+    if encoding not in available():
+        raise ValueError(f"Compression '{encoding}' is not available (install its package)")
+    return encoding
+
+def compressor(encoding: str):
+    """A new incremental compressor for an encoding"""
+    if encoding == 'gzip':
+        return zlib.compressobj(wbits=zlib.MAX_WBITS | 16)  # mtime 0: reproducible
+    if encoding == 'deflate':
+        return zlib.compressobj()
+    if encoding == 'br':
+        return _Brotli()
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor().compressobj()
+    raise ValueError(f"Unknown compression '{encoding}'")
+
+def compress_body(body: bytes, encoding: Optional[str]) -> Tuple[bytes, Dict[str, str]]:
+    """Compress a request body; returns (body, extra headers)"""
+    if encoding is None or len(body) < MIN_SIZE:
+        record_sent('identity', len(body), len(body))
+        return body, {}
+    engine = compressor(encoding)
+    wire = engine.compress(body) + engine.flush()
+    record_sent(encoding, len(body), len(wire))
+    return wire, {'Content-Encoding': encoding}
+
+def compress_stream(chunks: Iterable[bytes], encoding: Optional[str]) -> Iterator[bytes]:
+    """Compress a streamed request body chunk by chunk"""
+    engine = compressor(encoding) if encoding else None
+    size = wire = 0
+    try:
+        for chunk in chunks:
+            size += len(chunk)
+            if engine is not None:
+                chunk = engine.compress(chunk)
+                if not chunk:
+                    continue
+            wire += len(chunk)
+            yield chunk
+        if engine is not None:
+            tail = engine.flush()
+            wire += len(tail)
+            yield tail
+    finally:
+        record_sent(encoding or 'identity', size, wire)
+
+def record_sent(encoding: str, size: int, wire: int) -> None:
+    http_body_bytes.labels(direction='sent', encoding=encoding).inc(size)
+    http_wire_bytes.labels(direction='sent', encoding=encoding).inc(wire)
+
+def record_received(response, size: int) -> None:
+    """Count a response body of ``size`` decoded bytes"""
+    encoding = response.headers.get('content-encoding', 'identity').lower()
+    tell = getattr(response.raw, 'tell', None)
+    wire = tell() if tell is not None else size
+    http_body_bytes.labels(direction='received', encoding=encoding).inc(size)
+    http_wire_bytes.labels(direction='received', encoding=encoding).inc(wire)
+
+def iter_decoded(response, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Yield a streamed response body, decompressed chunk by chunk"""
+    size = 0
+    try:
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            size += len(chunk)
+            yield chunk
+    finally:
+        record_received(response, size)
+
+def iter_lines(response, chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    """Yield a streamed text response line by line, keeping line endings"""
+    decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+    pending = ''
+    for chunk in iter_decoded(response, chunk_size):
+        pending += decoder.decode(chunk)
+        if '\n' not in pending:
+            continue
+        *lines, pending = pending.split('\n')
+        for line in lines:
+            yield line + '\n'
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
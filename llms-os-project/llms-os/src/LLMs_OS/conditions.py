@@ -0,0 +1,95 @@
+"""Conditional tasks
+
+A task with ``when:`` runs only if its condition holds at the moment the
+task is about to start, after the tasks it reads from have finished::
+
+    - action: chat_completion
+      when: "{{ page.status_code }} == 200"
+      messages: [...]
+
+A condition is one template expression, optionally preceded by ``not`` and
+optionally compared (``==``, ``!=``, ``<``, ``<=``, ``>``, ``>=``) with a
+YAML literal such as ``200``, ``'ok'`` or ``true``.  A bare expression holds
+when its value is truthy; a missing value is false.  The expression may end
+with ``| default(...)``, whose argument is a YAML literal used when the
+value is missing (``{{ retries | default(3) }} > 2``); any other filter is
+rejected.  A task whose condition is false is skipped and saves nothing.
+
+Conditions are compiled once and read the context through the same
+compiled paths as templates, so their references are data dependencies
+for scheduling and keep the values they read alive in the context.
+"""
+import operator
+import re
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+import yaml
+from .templates import parse_expression, resolve_path
+
+CONDITION_RE = re.compile(
+    r'^\s*(not\s+)?\{\{\s*(.+?)\s*\}\}\s*(?:(==|!=|<=|>=|<|>)\s*(.+?))?\s*$'
+)
+
+DEFAULT_FILTER_RE = re.compile(r'^default\((.*)\)$')
+
+OPERATORS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge
+}
+
+def _literal(text: str, literal: str) -> Any:
+    try:
+        return yaml.safe_load(literal)
+    except yaml.YAMLError:
+        raise ValueError(f"Invalid condition {text!r}: cannot parse {literal!r}") from None
+
+@lru_cache(maxsize=1024)
+def compile_condition(text: str) -> Tuple[bool, Tuple[str, ...], Any, Optional[str], Any]:
+    """Parse a condition into (negated, path, default, operator, literal)"""
+    match = CONDITION_RE.match(text)
+    if match is None:
+        raise ValueError(f"Invalid condition {text!r}: expected '{{{{ path }}}}' with an optional comparison")
+    negated, expr, op, literal = match.groups()
+    expr, *filters = [part.strip() for part in expr.split('|')]
+    default = None
+    for name in filters:
+        filter_match = DEFAULT_FILTER_RE.match(name)
+        if filter_match is None:
+            raise ValueError(f"Invalid condition {text!r}: unsupported filter {name!r} "
+                             f"(only default(...) is allowed)")
+        default = _literal(text, filter_match.group(1))
+    path, _ = parse_expression(expr)
+    expected = _literal(text, literal) if op else None
+    return bool(negated), path, default, op, expected
+
+def condition_error(text: str) -> Optional[str]:
+    """Why a condition cannot be compiled (or None if it can)"""
+    try:
+        compile_condition(text)
+    except ValueError as e:
+        return str(e)
+    return None
+
+def evaluate(text: str, context: Dict[str, Any]) -> bool:
+    """Whether a condition holds in ``context``"""
+    negated, path, default, op, expected = compile_condition(text)
+    value = resolve_path(context, path)
+    if value is None:
+        value = default
+    if op is None:
+        holds = bool(value)
+    else:
+        try:
+            holds = bool(OPERATORS[op](value, expected))
+        except TypeError:  # e.g. None < 3
+            holds = False
+    return holds != negated
+
+def should_run(task: Dict[str, Any], context: Dict[str, Any]) -> bool:
+    """Whether a task's ``when:`` condition (if any) holds"""
+    when = task.get('when')
+    return when is None or evaluate(when, context)
@@ -0,0 +1,327 @@
+"""Memory-bounded workflow context
+
+Results saved with ``save_as`` live in a :class:`WorkflowContext`.  A
+:class:`ContextPlan` built from the task list works out, before anything
+runs, which results are still referenced by later tasks so dead entries can
+be dropped, trims results down to the fields templates actually use, and
+spills large values to disk.
+
+Workflow-level settings::
+
+    context:
+      evict: true              # drop results once nothing references them
+      spill_threshold: 1048576 # bytes; larger values are written to disk
+      spill_dir: /tmp/llms-os  # defaults to a private temp directory
+
+Tasks may use ``select: content`` (or a list of paths such as
+``[content, full_response.usage]``) to keep only those fields of a result.
+The result keeps its shape, so templates still read ``{{ name.content }}``.
+``keep: true`` pins a result for the whole run.  ``keep`` also exempts the
+task from pruning (see :mod:`LLMs_OS.pruning`): a result that must outlive
+its visible readers must also be produced.
+
+Streamed runs cannot see later tasks, so the analysis happens as tasks are
+read (:meth:`ContextPlan.admit`).  A result stays available while it is
+among the last ``window`` results read (default 64), and after that until
+the readers seen so far have finished.  A later task that references an
+older result finds it missing.  Pin such results with ``keep: true``, or
+keep everything with ``evict: false``.
+
+Only template references are visible to the analysis.  Actions that read
+``context`` directly declare it with ``@register(..., reads=...)``; an
+action that declares nothing (e.g. a custom plugin) is assumed to read
+every earlier result, which stays in the context, untrimmed, until that
+task has finished.
+"""
+import os
+import pickle
+import shutil
+import tempfile
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+from .registry import direct_reads
+from .templates import find_paths, project
+
+DEFAULT_SPILL_THRESHOLD = 1024 * 1024
+DEFAULT_WINDOW = 64  # tasks a streamed run holds at once
+
+def approx_size(value: Any) -> int:
+    """Cheap estimate of the in-memory payload size of a result"""
+    if isinstance(value, (str, bytes, bytearray)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(len(str(k)) + approx_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(approx_size(v) for v in value)
+    return 8
+
+class _Spilled:
+    """Placeholder for a value that has been written to disk"""
+    __slots__ = ('path', 'size')
+
+    def __init__(self, path: str, size: int):
+        self.path = path
+        self.size = size
+
+    def load(self) -> Any:
+        with open(self.path, 'rb') as f:
+            return pickle.load(f)
+
+    def discard(self) -> None:
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+class WorkflowContext(dict):
+    """dict of saved results that transparently spills large values to disk"""
+
+    def __init__(self, *args, spill_threshold: Optional[int] = DEFAULT_SPILL_THRESHOLD,
+                 spill_dir: Optional[str] = None, **kwargs):
+        super().__init__()
+        self.spill_threshold = spill_threshold
+        self._spill_root = spill_dir
+        self._spill_dir = None
+        self._counter = 0
+        self.update(*args, **kwargs)
+
+    def _spill(self, value: Any, size: int) -> _Spilled:
+        if self._spill_dir is None:
+            if self._spill_root:
+                os.makedirs(self._spill_root, exist_ok=True)
+            self._spill_dir = tempfile.mkdtemp(prefix='llms_os_ctx_', dir=self._spill_root)
+        self._counter += 1
+        path = os.path.join(self._spill_dir, f"{self._counter}.pkl")
+        with open(path, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        return _Spilled(path, size)
+
+    def __setitem__(self, key, value):
+        old = dict.get(self, key)
+        if isinstance(old, _Spilled):
+            old.discard()
+        if self.spill_threshold:
+            size = approx_size(value)
+            if size > self.spill_threshold:
+                value = self._spill(value, size)
+        dict.__setitem__(self, key, value)
+
+    def __getitem__(self, key):
+        value = dict.__getitem__(self, key)
+        return value.load() if isinstance(value, _Spilled) else value
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def __delitem__(self, key):
+        value = dict.pop(self, key)
+        if isinstance(value, _Spilled):
+            value.discard()
+
+    def pop(self, key, *default):
+        if key not in self:
+            if default:
+                return default[0]
+            raise KeyError(key)
+        value = self[key]
+        del self[key]
+        return value
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def values(self):
+        return [self[key] for key in self]
+
+    def items(self):
+        return [(key, self[key]) for key in self]
+
+    def is_spilled(self, key) -> bool:
+        """Whether a key's value currently lives on disk"""
+        return isinstance(dict.get(self, key), _Spilled)
+
+    def close(self) -> None:
+        """Remove any spill files"""
+        if self._spill_dir is not None:
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+            self._spill_dir = None
+        dict.clear(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+class ContextPlan:
+    """Liveness analysis for saved results of a task list"""
+
+    def __init__(self, tasks: List[Dict[str, Any]], evict: bool = True,
+                 spill_threshold: Optional[int] = DEFAULT_SPILL_THRESHOLD,
+                 spill_dir: Optional[str] = None, window: Optional[int] = None):
+        self.evict = evict
+        self.spill_threshold = spill_threshold
+        self.spill_dir = spill_dir
+        # reader task index -> defining task indices it still has to read
+        self.read_by: Dict[int, List[int]] = {}
+        # defining task index -> readers that have not finished yet
+        self.outstanding: Dict[int, int] = {}
+        # save_as name -> index of the task whose result is currently stored
+        self.bindings: Dict[str, int] = {}
+        # defining task index -> its save_as name
+        self.defined_names: Dict[int, str] = {}
+        # task index -> paths (relative to the result) worth keeping
+        self.projections: Dict[int, List[Tuple[str, ...]]] = {}
+        # Streamed runs: results kept for ``window`` tasks, analysed on arrival
+        self.window = window
+        self.current: Dict[str, int] = {}
+        self._arrivals: Deque[int] = deque()
+        self._expired: Set[int] = set()
+        # Called with the name of each evicted result (e.g. to forget digests)
+        self.on_evict: Optional[Callable[[str], None]] = None
+        if evict and window is None:
+            self._analyse(tasks)
+
+    @classmethod
+    def from_workflow(cls, workflow: Dict[str, Any], streaming: bool = False) -> 'ContextPlan':
+        """Build a plan using the workflow's ``context:`` settings
+
+        Streamed runs cannot see future readers; their plan tracks liveness
+        as tasks arrive, within the workflow's ``window``.
+        """
+        settings = workflow.get('context') or {}
+        return cls(
+            [] if streaming else workflow.get('tasks', []),
+            evict=settings.get('evict', True),
+            spill_threshold=settings.get('spill_threshold', DEFAULT_SPILL_THRESHOLD),
+            spill_dir=settings.get('spill_dir'),
+            window=workflow.get('window', DEFAULT_WINDOW) if streaming else None
+        )
+
+    def new_context(self) -> WorkflowContext:
+        """Create an empty context configured for this plan"""
+        return WorkflowContext(spill_threshold=self.spill_threshold, spill_dir=self.spill_dir)
+
+    def _analyse(self, tasks: List[Dict[str, Any]]) -> None:
+        # Single pass: attribute each reference to the definition in scope
+        current: Dict[str, int] = {}
+        used_paths: Dict[int, List[Tuple[str, ...]]] = {}
+        readers: Dict[int, set] = {}
+
+        for index, task in enumerate(tasks):
+            paths = find_paths(task)
+            reads = direct_reads(task)
+            # Direct reads keep whole results; undeclared actions may read any
+            paths |= {(name,) for name in (current if reads is None else reads)}
+            for path in paths:
+                definition = current.get(path[0])
+                if definition is not None:
+                    readers[definition].add(index)
+                    used_paths[definition].append(path[1:])
+
+            name = task.get('save_as')
+            if name and not task.get('keep'):
+                current[name] = index
+                readers[index] = set()
+                used_paths[index] = []
+            elif name:
+                current.pop(name, None)
+
+        for definition, reader_set in readers.items():
+            # A result nobody reads is released as soon as it is produced
+            reader_set = reader_set or {definition}
+            self.defined_names[definition] = tasks[definition]['save_as']
+            self.outstanding[definition] = len(reader_set)
+            for reader in reader_set:
+                self.read_by.setdefault(reader, []).append(definition)
+            task = tasks[definition]
+            if used_paths[definition] and 'select' not in task:
+                self.projections[definition] = used_paths[definition]
+
+    def admit(self, index: int, task: Dict[str, Any], context: Dict[str, Any]) -> None:
+        """Track a task of a streamed run as it is read (no-op otherwise)
+
+        Call before the task runs, in task order.  Results that have fallen
+        out of the window are dropped here if nothing still reads them.
+        """
+        if self.window is None or not self.evict:
+            return
+        names = {path[0] for path in find_paths(task)}
+        reads = direct_reads(task)
+        names |= set(self.current) if reads is None else set(reads)
+        definitions = [self.current[name] for name in names if name in self.current]
+
+        name = task.get('save_as')
+        if name and not task.get('keep'):
+            # The producer counts as a reader so its result outlives its start
+            self.current[name] = index
+            self.defined_names[index] = name
+            self.outstanding[index] = 0
+            self._arrivals.append(index)
+            definitions.append(index)
+        elif name:
+            self.current.pop(name, None)
+        for definition in definitions:
+            self.outstanding[definition] += 1
+        if definitions:
+            self.read_by[index] = definitions
+
+        while len(self._arrivals) > self.window:
+            definition = self._arrivals.popleft()
+            if definition not in self.outstanding:
+                continue
+            if self.outstanding[definition]:
+                self._expired.add(definition)
+            else:
+                self._evict(definition, context)
+
+    def _evict(self, definition: int, context: Dict[str, Any]) -> None:
+        del self.outstanding[definition]
+        self._expired.discard(definition)
+        name = self.defined_names.pop(definition)
+        if self.current.get(name) == definition:
+            del self.current[name]
+        if self.bindings.get(name) == definition:
+            context.pop(name, None)
+            del self.bindings[name]
+            if self.on_evict is not None:
+                self.on_evict(name)
+
+    def save(self, index: int, task: Dict[str, Any], result: Any, context: Dict[str, Any]) -> None:
+        """Store a task result under its save_as name, trimmed to what is used"""
+        name = task.get('save_as')
+        if not name or not result:
+            return
+
+        select = task.get('select')
+        if select is not None:
+            paths = [select] if isinstance(select, str) else select
+            result = project(result, [tuple(path.split('.')) for path in paths])
+        elif index in self.projections:
+            result = project(result, self.projections[index])
+
+        context[name] = result
+        self.bindings[name] = index
+
+    def release(self, index: int, context: Dict[str, Any]) -> None:
+        """Note that task ``index`` finished; drop results with no readers left
+
+        Reference counts make this safe when tasks finish out of order.  In
+        streamed runs a result is only dropped once it is out of the window.
+        """
+        for definition in self.read_by.pop(index, ()):
+            if definition not in self.outstanding:
+                continue
+            self.outstanding[definition] -= 1
+            if self.outstanding[definition]:
+                continue
+            if self.window is None or definition in self._expired:
+                self._evict(definition, context)
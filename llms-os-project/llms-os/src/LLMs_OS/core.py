@@ -1,35 +1,128 @@
 """Core workflow execution engine"""
-import yaml
-import os
-from pathlib import Path
-from .registry import get_action
+from typing import Any, Dict, Iterable
+from . import output, prewarm, semantic_cache
+from .conditions import should_run
+from .context import ContextPlan
+from .deadlines import Deadline, current_deadline
+from .incremental import IncrementalCache
+from .profiling import span, task_label
+from .loader import is_streamed, load_workflow, open_workflow_stream, validated_tasks
+from .providers import use_providers
+from .pruning import prunable, record_skip, report, unused_tasks
+from .registry import get_action, get_stream
+from .streams import ChunkCounter, consume
+from .validators import WorkflowValidator
 
-def execute_yaml(file_path: str) -> None:
-    """Execute a workflow from a YAML file"""
-    # Load workflow
-    with open(file_path, 'r') as f:
-        workflow = yaml.safe_load(f)
+def execute_yaml(file_path: str, incremental: bool = None, stream: bool = None) -> None:
+    """Execute a workflow from a YAML file
     
+    ``incremental`` overrides the workflow's ``incremental:`` setting.
+    ``stream`` reads and runs tasks one at a time instead of loading the
+    whole file first (default: only for ``.jsonl`` workflows).
+    """
     # Import actions to ensure they're registered
     import LLMs_OS.actions
     
-    # Get tasks
-    tasks = workflow.get('tasks', [])
-    context = {}
+    if is_streamed(file_path, stream):
+        with open_workflow_stream(file_path) as source:
+            WorkflowValidator.validate_settings(source.header)
+            plan = ContextPlan.from_workflow(source.header, streaming=True)
+            _run_tasks(source.header, validated_tasks(source), plan, file_path, incremental)
+        return
     
-    # Execute each task
-    for task in tasks:
-        action_name = task.get('action')
-        if not action_name:
-            continue
-        
-        try:
-            action = get_action(action_name)
-            result = action(task, context)
+    # Load and validate the whole workflow before running anything
+    workflow = load_workflow(file_path)
+    plan = ContextPlan.from_workflow(workflow)
+    _run_tasks(workflow, workflow.get('tasks', []), plan, file_path, incremental)
+
+def dry_run(file_path: str, stream: bool = None) -> None:
+    """Report which tasks a run would execute or skip, without running any"""
+    import LLMs_OS.actions
+    
+    streamed = is_streamed(file_path, stream)
+    if streamed:
+        with open_workflow_stream(file_path) as source:
+            WorkflowValidator.validate_settings(source.header)
+            workflow, tasks = source.header, list(validated_tasks(source))
+    else:
+        workflow = load_workflow(file_path)
+        tasks = workflow.get('tasks', [])
+    
+    with output.use_output(workflow.get('output')):
+        output.info(f"Dry run of {file_path}", icon='🔍 ')
+        unused = set() if streamed else unused_tasks(tasks)
+        for line in report(tasks, unused, workflow.get('prune') is True):
+            output.info(line)
+
+def _run_tasks(workflow: Dict[str, Any], tasks: Iterable[Dict[str, Any]], plan: ContextPlan,
+               file_path: str, incremental: bool = None) -> None:
+    """Run tasks in order; ``tasks`` may be a lazy iterator
+
+    A streaming task is held back until its consumer runs, then pulled
+    chunk by chunk from inside the consumer.  Unused pure tasks (see
+    :mod:`LLMs_OS.pruning`) and tasks whose ``when:`` condition is false are
+    skipped.
+    """
+    with use_providers(workflow.get('providers')), output.use_output(workflow.get('output')), \
+            semantic_cache.use_workflow(file_path):
+        unused = prunable(workflow, tasks)
+        prewarm.start(workflow, skip=unused)
+        workflow_deadline = Deadline(workflow.get('timeout'))
+        memo = IncrementalCache.from_workflow(workflow, file_path, incremental)
+        if memo is not None:
+            plan.on_evict = memo.forget
+        if unused:
+            output.info(f"Skipping {len(unused)} task(s) whose results are never used", icon='✂️  ')
+    
+        # Execute each task
+        with plan.new_context() as context:
+            held = {}
+            for index, task in enumerate(tasks):
+                action_name = task.get('action')
+                if not action_name:
+                    continue
+                plan.admit(index, task, context)
+                if task.get('stream'):
+                    held[task['save_as']] = (index, task)
+                    continue
+                producer = held.pop(task.get('stream_from'), None)
+                if index in unused or not should_run(task, context):
+                    record_skip(task, 'unused' if index in unused else 'condition')
+                    plan.release(index, context)
+                    continue
             
-            # Save result if requested
-            if 'save_as' in task and result:
-                context[task['save_as']] = result
-        except Exception as e:
-            print(f"❌ Error in action '{action_name}': {e}")
-            raise
+                # Actions size their timeouts from the task/workflow deadline
+                token = current_deadline.set(workflow_deadline.child(task.get('timeout')))
+                try:
+                    workflow_deadline.check()
+                    action = get_action(action_name)
+                    with span(task_label(task)):
+                        if producer is not None:
+                            source_index, source = producer
+                            chunks = ChunkCounter(get_stream(source['action'])(source, context))
+                            result = consume(task, context, chunks)
+                            if chunks.error is not None:
+                                raise chunks.error
+                        elif memo is not None:
+                            result = memo.run(task, lambda: action(task, context))
+                        else:
+                            result = action(task, context)
+                
+                    # Save result if requested, then drop results nobody reads again
+                    if producer is not None:
+                        plan.save(source_index, source, chunks.summary(), context)
+                        plan.release(source_index, context)
+                    plan.save(index, task, result, context)
+                    plan.release(index, context)
+                except Exception as e:
+                    if task.get('continue_on_error'):
+                        output.warning(f"Task '{action_name}' failed (continuing): {e}", action=action_name)
+                        plan.release(index, context)
+                        continue
+                    output.error(f"Error in action '{action_name}': {e}", action=action_name)
+                    raise
+                finally:
+                    current_deadline.reset(token)
+    
+        if memo is not None and memo.hits:
+            output.info(f"Reused {memo.hits} cached task result(s)", icon='♻️  ')
@@ -0,0 +1,112 @@
+"""Workflow and task deadlines with cooperative cancellation
+
+The engines install a :class:`Deadline` for every task in a context
+variable.  Actions size their I/O timeouts with :func:`remaining` instead of
+hard-coded values, and long-running loops call :func:`check` so a task
+stops promptly once it has been cancelled or has run out of time - even
+when it is executing in a worker thread.
+"""
+import contextvars
+import threading
+import time
+import weakref
+from typing import Optional
+from .exceptions import DeadlineExceededError
+
+class Deadline:
+    """Absolute expiry time plus a cancellation flag, inherited by children"""
+
+    def __init__(self, timeout: Optional[float] = None, parent: Optional['Deadline'] = None):
+        self.parent = parent
+        self.expires_at = time.monotonic() + timeout if timeout else None
+        if parent is not None and parent.expires_at is not None:
+            if self.expires_at is None or parent.expires_at < self.expires_at:
+                self.expires_at = parent.expires_at
+        self._cancelled = threading.Event()
+        self._children = weakref.WeakSet()
+        self._callbacks = []
+        if parent is not None:
+            parent._children.add(self)
+            if parent.cancelled:
+                self._cancelled.set()
+
+    def child(self, timeout: Optional[float] = None) -> 'Deadline':
+        """A deadline no later than this one, cancelled along with it"""
+        return Deadline(timeout, parent=self)
+
+    def cancel(self) -> None:
+        """Cancel this deadline and every child derived from it"""
+        self._cancelled.set()
+        for callback in list(self._callbacks):
+            callback()
+        for child in list(self._children):
+            child.cancel()
+
+    def add_callback(self, callback) -> None:
+        """Call ``callback()`` (from the cancelling thread) on cancellation"""
+        self._callbacks.append(callback)
+        if self.cancelled:
+            callback()
+
+    def remove_callback(self, callback) -> None:
+        try:
+            self._callbacks.remove(callback)
+        except ValueError:
+            pass
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def time_left(self) -> Optional[float]:
+        """Seconds until expiry (may be negative), None if unbounded"""
+        if self.expires_at is None:
+            return None
+        return self.expires_at - time.monotonic()
+
+    def check(self) -> None:
+        """Raise DeadlineExceededError if cancelled or expired"""
+        if self.cancelled:
+            raise DeadlineExceededError("Task was cancelled")
+        left = self.time_left()
+        if left is not None and left <= 0:
+            raise DeadlineExceededError("Deadline exceeded")
+
+    def remaining(self, default: Optional[float] = None) -> Optional[float]:
+        """Timeout to use for the next blocking call: min(default, time left)"""
+        self.check()
+        left = self.time_left()
+        if left is None:
+            return default
+        return left if default is None else min(default, left)
+
+    def sleep(self, seconds: float) -> None:
+        """Sleep, waking early (and raising) on cancellation or expiry"""
+        left = self.time_left()
+        if left is not None:
+            seconds = min(seconds, max(left, 0))
+        self._cancelled.wait(seconds)
+        self.check()
+
+current_deadline: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar(
+    'llms_os_deadline', default=None
+)
+
+def remaining(default: Optional[float] = None) -> Optional[float]:
+    """Timeout for the current task's next blocking call"""
+    deadline = current_deadline.get()
+    return default if deadline is None else deadline.remaining(default)
+
+def check() -> None:
+    """Raise if the current task has been cancelled or timed out"""
+    deadline = current_deadline.get()
+    if deadline is not None:
+        deadline.check()
+
+def sleep(seconds: float) -> None:
+    """Deadline-aware replacement for time.sleep inside actions"""
+    deadline = current_deadline.get()
+    if deadline is None:
+        time.sleep(seconds)
+    else:
+        deadline.sleep(seconds)
@@ -0,0 +1,36 @@
+"""Embedding requests through the provider pool
+
+Shared by the ``embeddings`` action and the semantic cache.
+"""
+from typing import Any, Dict, List
+from . import codec
+from .deadlines import check, remaining
+from .providers import get_pool
+from .resilience import send_with_policy
+
+DEFAULT_MODEL = 'openai/text-embedding-3-small'
+DEFAULT_BATCH_SIZE = 64
+
+def embed(texts: List[str], model: str = DEFAULT_MODEL, task: Dict[str, Any] = None,
+          batch_size: int = DEFAULT_BATCH_SIZE) -> List[List[float]]:
+    """Embed texts, sending up to ``batch_size`` inputs per request
+
+    ``task`` supplies the retry/hedge policy.  Raises on HTTP errors.
+    """
+    pool = get_pool()
+    task = task or {}
+    vectors: List[List[float]] = []
+    for start in range(0, len(texts), batch_size):
+        check()
+        batch = texts[start:start + batch_size]
+        payload = codec.dumps({'model': model, 'input': batch})
+        response = send_with_policy(
+            task, f"providers://{model}",
+            lambda: pool.post(model, '/embeddings', payload, remaining(60))
+        )
+        response.raise_for_status()
+        data = sorted(codec.loads(response.content)['data'], key=lambda item: item['index'])
+        if len(data) != len(batch):
+            raise ValueError(f"Expected {len(batch)} embeddings, got {len(data)}")
+        vectors.extend(item['embedding'] for item in data)
+    return vectors
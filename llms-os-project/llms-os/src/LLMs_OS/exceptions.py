@@ -12,9 +12,15 @@ class WorkflowExecutionError(LLMsOSError):
     """Raised when workflow execution fails"""
     pass
 
+class DeadlineExceededError(WorkflowExecutionError):
+    """Raised when a task or workflow runs past its deadline or is cancelled"""
+    pass
+
 class ValidationError(LLMsOSError):
     """Raised when input validation fails"""
-    pass
+    def __init__(self, message, errors=None):
+        super().__init__(message)
+        self.errors = errors or [message]
 
 class APIError(LLMsOSError):
     """Raised when API calls fail"""
@@ -22,3 +28,20 @@ class APIError(LLMsOSError):
         super().__init__(message)
         self.status_code = status_code
         self.response = response
+
+class CassetteMissError(LLMsOSError):
+    """Raised when a replayed run makes a request the cassette has no record of"""
+    pass
+
+class StreamError(LLMsOSError):
+    """Raised to a stream consumer when its producer failed"""
+    pass
+
+class StreamClosed(LLMsOSError):
+    """Raised to a stream producer whose consumer has stopped reading"""
+    pass
+
+# Errors raised to stop a task on the engine's behalf (or, for a cassette
+# miss, because a replay cannot go on).  Actions must let them propagate
+# instead of reporting them as their own failure.
+ENGINE_ERRORS = (DeadlineExceededError, StreamError, StreamClosed, CassetteMissError)
@@ -0,0 +1,138 @@
+"""Task dependency graph inferred from template data flow
+
+A task depends on:
+
+* the task that most recently produced each ``save_as`` name its
+  ``{{ ... }}`` templates reference (read-after-write);
+* for its own ``save_as``, the previous producer of that name and every task
+  that read it since (write-after-write / write-after-read);
+* the most recent *ordered* task before it.
+
+Ordered tasks are actions with side effects (prints, file writes, non-GET
+requests), tasks marked ``parallel: false``, and anything whose purity is
+unknown.  They act as barriers: an ordered task waits for every task before
+it, so the observable order of side effects is preserved.  An impure task
+marked ``parallel: true`` gives up that guarantee and only waits on its data.
+
+A ``stream: true`` task is placed just before the task that consumes it
+(``stream_from``), which depends on it; the engine starts the two together.
+"""
+from typing import Any, Dict, List, Set
+from .registry import is_pure
+from .streams import execution_order
+from .templates import find_references
+
+def is_ordered(task: Dict[str, Any]) -> bool:
+    """Whether a task must keep its position relative to earlier tasks"""
+    parallel = task.get('parallel')
+    if parallel is not None:
+        return not parallel
+    return not is_pure(task)
+
+class TaskGraph:
+    """Dependencies between the tasks of a workflow (by index)
+
+    Tasks can also be fed one at a time with :meth:`add` (streamed runs);
+    with ``record=False`` the per-task edge lists are not kept and
+    :meth:`discard` forgets finished tasks, so memory stays proportional
+    to the tasks still in flight.
+    """
+
+    def __init__(self, tasks: List[Dict[str, Any]] = (), record: bool = True):
+        self.record = record
+        self.dependencies: List[Set[int]] = []
+        self.dependents: List[Set[int]] = []
+        self.order: List[int] = []  # indices in a valid execution order
+        self._count = 0
+        self._producer: Dict[str, int] = {}
+        self._readers: Dict[str, Set[int]] = {}
+        self._refs: Dict[int, Set[str]] = {}
+        self._produces: Dict[int, str] = {}
+        self._barrier = None
+        self._since_barrier: Set[int] = set()
+        order = execution_order(tasks)
+        for index in order:
+            self.add(tasks[index])
+        if order != sorted(order):
+            self._renumber(order)
+
+    def _renumber(self, order: List[int]) -> None:
+        """Map edges from execution positions back to task indices"""
+        dependencies: List[Set[int]] = [set() for _ in order]
+        for position, deps in enumerate(self.dependencies):
+            dependencies[order[position]] = {order[d] for d in deps}
+        self.dependencies = dependencies
+        self.order = order
+        self.dependents = [set() for _ in order]
+        for index, deps in enumerate(dependencies):
+            for dep in deps:
+                self.dependents[dep].add(index)
+
+    def add(self, task: Dict[str, Any]) -> Set[int]:
+        """Append a task and return the indices it depends on"""
+        index = self._count
+        self._count += 1
+
+        deps: Set[int] = set()
+        refs = find_references(task)
+        for name in refs:
+            if name in self._producer:
+                deps.add(self._producer[name])
+
+        name = task.get('save_as')
+        if name:
+            if name in self._producer:
+                deps.add(self._producer[name])
+            deps |= self._readers.get(name, set())
+        source = task.get('stream_from')
+        if source in self._producer:
+            deps.add(self._producer[source])
+
+        if is_ordered(task):
+            deps |= self._since_barrier
+            if self._barrier is not None:
+                deps.add(self._barrier)
+            self._barrier = index
+            self._since_barrier = set()
+        else:
+            if self._barrier is not None:
+                deps.add(self._barrier)
+            self._since_barrier.add(index)
+
+        deps.discard(index)
+        if self.record:
+            self.order.append(index)
+            self.dependencies.append(deps)
+            self.dependents.append(set())
+            for dep in deps:
+                self.dependents[dep].add(index)
+
+        for ref in refs:
+            self._readers.setdefault(ref, set()).add(index)
+        if name:
+            self._producer[name] = index
+            self._readers[name] = set()
+            self._produces[index] = name
+        self._refs[index] = refs
+        return deps
+
+    def discard(self, index: int) -> None:
+        """Forget a finished task so later tasks no longer wait on it"""
+        for ref in self._refs.pop(index, ()):
+            readers = self._readers.get(ref)
+            if readers is not None:
+                readers.discard(index)
+                if not readers and ref not in self._producer:
+                    del self._readers[ref]
+        self._since_barrier.discard(index)
+        if self._barrier == index:
+            self._barrier = None
+        name = self._produces.pop(index, None)
+        if name is not None and self._producer.get(name) == index:
+            del self._producer[name]
+            if not self._readers.get(name):
+                self._readers.pop(name, None)
+
+    def roots(self) -> List[int]:
+        """Tasks with no dependencies"""
+        return [i for i, deps in enumerate(self.dependencies) if not deps]
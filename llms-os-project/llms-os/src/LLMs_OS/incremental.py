@@ -0,0 +1,166 @@
+"""Make-style incremental re-execution
+
+Each memoisable task gets a fingerprint built from its own definition, any
+action-specific cache key (e.g. the mtime of a file being read) and the
+digests of the upstream results it reads (through templates, or directly
+as declared with ``@register(..., reads=...)``).  Results are
+stored under that fingerprint; on a rerun, tasks whose fingerprint is
+unchanged reuse the stored result, so only edited tasks and the tasks
+downstream of a changed result execute again.
+
+Enable per workflow::
+
+    incremental: true             # or {dir: path/to/cache, ttl: 3600}
+
+or with ``llms-os --incremental``.  Pure local actions (``file_read``) are
+memoised by default.  Actions that talk to the network (those registered
+with ``hosts=``: ``http_request``, ``chat_completion``, ...) can return
+something different on every call, so they are memoised only with
+``cache: true``.  ``cache: false`` forces any task to run.  ``ttl`` expires
+stored results after that many seconds.
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+from . import codec
+from .monitoring import task_cache
+from .registry import direct_reads, get_cache_key, get_hosts, is_pure
+from .templates import find_references
+
+DEFAULT_CACHE_DIR = '.llms_os_cache'
+
+# Task fields that control scheduling or storage but not the result itself
+NON_SEMANTIC_FIELDS = frozenset({
+    'parallel', 'save_as', 'keep', 'select', 'timeout', 'retry', 'hedge',
+    'continue_on_error', 'cache', 'batch_size', 'compress', 'when'
+})
+
+_MISS = object()
+
+def _canonical(value: Any) -> bytes:
+    return codec.dumps(value, sort_keys=True, default=repr)
+
+def digest(value: Any) -> str:
+    """Content digest of a task result"""
+    return hashlib.sha256(_canonical(value)).hexdigest()
+
+class ResultStore:
+    """Results on disk, one pickle per fingerprint, optionally expiring"""
+
+    def __init__(self, root: str, ttl: Optional[float] = None):
+        self.root = Path(root)
+        self.ttl = ttl
+
+    def _path(self, fingerprint: str) -> Path:
+        return self.root / fingerprint[:2] / f"{fingerprint}.pkl"
+
+    def get(self, fingerprint: str) -> Any:
+        try:
+            with open(self._path(fingerprint), 'rb') as f:
+                if self.ttl is not None and time.time() - os.fstat(f.fileno()).st_mtime > self.ttl:
+                    return _MISS
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return _MISS
+
+    def put(self, fingerprint: str, result: Any) -> None:
+        path = self._path(fingerprint)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+class IncrementalCache:
+    """Fingerprints tasks and serves memoised results"""
+
+    def __init__(self, store: ResultStore):
+        self.store = store
+        # save_as name -> digest of the result currently bound to it
+        self.digests: Dict[str, str] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_workflow(cls, workflow: Dict[str, Any], file_path: str,
+                      enabled: Optional[bool] = None) -> Optional['IncrementalCache']:
+        """Build a cache from the workflow's ``incremental:`` setting
+
+        ``enabled`` (e.g. from the CLI) overrides the workflow when given.
+        """
+        setting = workflow.get('incremental')
+        if enabled is False or (enabled is None and not setting):
+            return None
+        options = setting if isinstance(setting, dict) else {}
+        root = options.get('dir')
+        if root is None:
+            root = Path(file_path).resolve().parent / DEFAULT_CACHE_DIR
+        return cls(ResultStore(root, options.get('ttl')))
+
+    def should_cache(self, task: Dict[str, Any]) -> bool:
+        if task.get('stream') or task.get('stream_from'):
+            return False  # results are summaries of data that flowed past
+        cache = task.get('cache')
+        if cache is None:
+            return is_pure(task) and get_hosts(task.get('action')) is None
+        return bool(cache)
+
+    def fingerprint(self, task: Dict[str, Any]) -> str:
+        """Fingerprint of a task's inputs, including upstream results"""
+        definition = {k: v for k, v in task.items() if k not in NON_SEMANTIC_FIELDS}
+        names = find_references(definition)
+        reads = direct_reads(task)
+        names |= set(self.digests) if reads is None else reads
+        upstream = {name: self.digests.get(name) for name in sorted(names)}
+        cache_key = get_cache_key(task.get('action'))
+        extra = cache_key(task) if cache_key else None
+        return hashlib.sha256(_canonical([definition, upstream, extra])).hexdigest()
+
+    def lookup(self, task: Dict[str, Any]) -> Tuple[Optional[str], Any]:
+        """Return (fingerprint, cached result or None); fingerprint is None
+        for tasks that are not memoised
+        """
+        if not self.should_cache(task):
+            return None, None
+        fingerprint = self.fingerprint(task)
+        result = self.store.get(fingerprint)
+        action = task.get('action')
+        if result is _MISS:
+            self.misses += 1
+            task_cache.labels(action=action, outcome='miss').inc()
+            return fingerprint, None
+        self.hits += 1
+        task_cache.labels(action=action, outcome='hit').inc()
+        return fingerprint, result
+
+    def store_result(self, fingerprint: Optional[str], result: Any) -> None:
+        # Failed actions return None; never memoise a failure
+        if fingerprint is not None and result:
+            self.store.put(fingerprint, result)
+
+    def record(self, task: Dict[str, Any], result: Any) -> None:
+        """Remember the digest of a saved result for downstream fingerprints"""
+        name = task.get('save_as')
+        if name and result:
+            self.digests[name] = digest(result)
+
+    def forget(self, name: str) -> None:
+        """Drop the digest of a result that has left the context"""
+        self.digests.pop(name, None)
+
+    def run(self, task: Dict[str, Any], execute) -> Any:
+        """Return the memoised result of a task, calling ``execute()`` on a miss"""
+        fingerprint, result = self.lookup(task)
+        if result is None:
+            result = execute()
+            self.store_result(fingerprint, result)
+        self.record(task, result)
+        return result
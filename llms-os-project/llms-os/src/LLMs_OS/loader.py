@@ -0,0 +1,126 @@
+"""Incremental workflow loading
+
+:func:`open_workflow_stream` reads a workflow without materialising its task
+list. YAML files are parsed from the event stream one task at a time.
+``.jsonl`` files hold one JSON task per line; an optional first line
+without an ``action`` key carries the workflow settings.
+
+Only the settings that appear *before* ``tasks:`` are available to a
+streamed run, so put ``timeout``, ``context``, ``providers`` etc. first.
+"""
+import os
+from typing import Any, Dict, Iterator
+import yaml
+from yaml.events import MappingEndEvent, MappingStartEvent, SequenceEndEvent, SequenceStartEvent
+from . import codec
+from .exceptions import ValidationError
+from .validators import WorkflowValidator
+
+class WorkflowStream:
+    """Workflow settings plus a lazily parsed task iterator"""
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self._file = open(file_path, 'r', encoding='utf-8')
+        self.header: Dict[str, Any] = {}
+        if file_path.endswith('.jsonl'):
+            self._tasks = self._read_jsonl()
+        else:
+            self._tasks = self._read_yaml()
+        # Prime the generator so the header is populated up to 'tasks:'
+        try:
+            self._first = next(self._tasks, None)
+        except BaseException:
+            self._file.close()
+            raise
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        if self._first is not None:
+            first, self._first = self._first, None
+            yield first
+        yield from self._tasks
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _read_jsonl(self):
+        for lineno, line in enumerate(self._file, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = codec.loads(line)
+            except ValueError as e:
+                raise ValidationError(f"{self.file_path}:{lineno}: invalid JSON: {e}")
+            if lineno == 1 and isinstance(item, dict) and 'action' not in item:
+                self.header.update(item)
+                continue
+            yield item
+
+    def _read_yaml(self):
+        loader = yaml.SafeLoader(self._file)
+        try:
+            loader.get_event()  # StreamStart
+            if not loader.check_event(yaml.DocumentStartEvent):
+                return
+            loader.get_event()
+            if not loader.check_event(MappingStartEvent):
+                raise ValidationError("Workflow must be a mapping with a 'tasks' field")
+            loader.get_event()
+
+            while not loader.check_event(MappingEndEvent):
+                key = self._construct(loader)
+                if key == 'tasks' and loader.check_event(SequenceStartEvent):
+                    loader.get_event()
+                    while not loader.check_event(SequenceEndEvent):
+                        yield self._construct(loader)
+                    loader.get_event()
+                    self.header.setdefault('tasks', [])
+                else:
+                    self.header[key] = self._construct(loader)
+        finally:
+            loader.dispose()
+
+    @staticmethod
+    def _construct(loader) -> Any:
+        node = loader.compose_node(None, None)
+        value = loader.construct_object(node, deep=True)
+        # Don't let the constructor's memo keep every task alive
+        loader.constructed_objects = {}
+        loader.recursive_objects = {}
+        return value
+
+def load_workflow(file_path: str) -> Dict[str, Any]:
+    """Load and validate a whole workflow file
+
+    The file's path, mtime and size (taken before reading, so an edit
+    during the load is never cached) key the validation cache, so loading
+    an unchanged file again skips schema validation.
+    """
+    stat = os.stat(file_path)
+    with open(file_path, 'r', encoding='utf-8') as f:
+        workflow = yaml.safe_load(f)
+    WorkflowValidator.validate(
+        workflow, source=(os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size)
+    )
+    return workflow
+
+def open_workflow_stream(file_path: str) -> WorkflowStream:
+    """Open a workflow for streamed execution"""
+    return WorkflowStream(file_path)
+
+def validated_tasks(tasks) -> Iterator[Dict[str, Any]]:
+    """Validate streamed tasks one by one as they are read"""
+    for idx, task in enumerate(tasks):
+        WorkflowValidator.validate_task(idx, task)
+        yield task
+
+def is_streamed(file_path: str, stream=None) -> bool:
+    """Whether a file should be executed in streaming mode"""
+    return stream if stream is not None else file_path.endswith('.jsonl')
@@ -0,0 +1,140 @@
+"""Event-loop lag monitoring for the async engine
+
+A coroutine action that does blocking work (``requests.get``,
+``time.sleep``, heavy parsing) freezes the event loop and every concurrent
+task with it.  :class:`LoopMonitor` catches this in two ways:
+
+* a probe coroutine measures how late the loop wakes it up and exports the
+  delay as ``llms_os_event_loop_lag_seconds``;
+* every resumption of a coroutine action is timed, so a step that holds the
+  loop longer than ``threshold`` is attributed to the task that ran it
+  (``llms_os_event_loop_stalls_total``).
+
+An action that stalls the loop ``offload_after`` times is run in the thread
+pool, on its own event loop, for the rest of the workflow.
+
+Workflow-level settings::
+
+    loop_monitor:
+      interval: 0.05      # probe period, seconds
+      threshold: 0.1      # a step longer than this is a stall
+      offload_after: 3    # stalls before an action is offloaded; 0 = never
+
+``loop_monitor: false`` turns monitoring off.
+"""
+import asyncio
+import time
+from collections import Counter
+from typing import Any, Dict, Optional, Set
+import aiohttp
+from . import output
+from .monitoring import event_loop_lag, event_loop_stalls
+
+LOOP_MONITOR_SCHEMA = {
+    'anyOf': [
+        {'type': 'boolean'},
+        {
+            'type': 'object',
+            'properties': {
+                'interval': {'type': 'number', 'exclusiveMinimum': 0},
+                'threshold': {'type': 'number', 'exclusiveMinimum': 0},
+                'offload_after': {'type': 'integer', 'minimum': 0}
+            },
+            'additionalProperties': False
+        }
+    ]
+}
+
+class LoopMonitor:
+    """Measures event-loop lag and tracks actions that block the loop"""
+
+    def __init__(self, interval: float = 0.05, threshold: float = 0.1, offload_after: int = 3):
+        self.interval = interval
+        self.threshold = threshold
+        self.offload_after = offload_after
+        self.stalls: Counter = Counter()
+        self.offloaded: Set[str] = set()
+        self.max_lag = 0.0
+        self._probe = None
+
+    @classmethod
+    def from_workflow(cls, workflow: Dict[str, Any]) -> Optional['LoopMonitor']:
+        """Build a monitor from the workflow's ``loop_monitor:`` setting"""
+        setting = workflow.get('loop_monitor', True)
+        if setting is False:
+            return None
+        return cls(**setting) if isinstance(setting, dict) else cls()
+
+    def start(self) -> None:
+        """Start the lag probe on the running loop"""
+        if self._probe is None:
+            self._probe = asyncio.ensure_future(self._measure())
+
+    async def stop(self) -> None:
+        if self._probe is not None:
+            self._probe.cancel()
+            await asyncio.gather(self._probe, return_exceptions=True)
+            self._probe = None
+
+    async def _measure(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - start - self.interval)
+            event_loop_lag.observe(lag)
+            self.max_lag = max(self.max_lag, lag)
+
+    def should_offload(self, action: str) -> bool:
+        """Whether a coroutine action should run in the thread pool"""
+        return action in self.offloaded
+
+    def track(self, coro, action: str, label: str):
+        """Wrap a coroutine so each of its steps on the loop is timed"""
+        return _TrackedCoroutine(coro, self, action, label)
+
+    def record_step(self, action: str, label: str, seconds: float) -> None:
+        if seconds < self.threshold:
+            return
+        event_loop_stalls.labels(action=action).inc()
+        self.stalls[action] += 1
+        output.emit('warning', f"{label} blocked the event loop for {seconds:.3f}s", '🐢 ')
+        if self.offload_after and self.stalls[action] >= self.offload_after \
+                and action not in self.offloaded:
+            self.offloaded.add(action)
+            output.emit('warning', f"Running '{action}' in the thread pool from now on", '🐢 ')
+
+class _TrackedCoroutine:
+    """Awaitable that drives a coroutine and times every synchronous step"""
+
+    def __init__(self, coro, monitor: LoopMonitor, action: str, label: str):
+        self.coro = coro
+        self.monitor = monitor
+        self.action = action
+        self.label = label
+
+    def __await__(self):
+        coro = self.coro
+        send, error = None, None
+        while True:
+            start = time.perf_counter()
+            try:
+                if error is not None:
+                    yielded = coro.throw(error)
+                else:
+                    yielded = coro.send(send)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                self.monitor.record_step(self.action, self.label, time.perf_counter() - start)
+            try:
+                send, error = (yield yielded), None
+            except BaseException as e:
+                send, error = None, e
+
+def run_offloaded(action_func, task: Dict[str, Any], context: Dict[str, Any]) -> Any:
+    """Run a coroutine action on a private event loop (in a worker thread)"""
+    async def main():
+        async with aiohttp.ClientSession() as session:
+            return await action_func(task, context, session=session)
+    return asyncio.run(main())
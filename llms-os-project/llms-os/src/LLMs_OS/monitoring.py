@@ -9,6 +9,23 @@ task_counter = Counter('llms_os_tasks_total', 'Total tasks executed', ['action',
 task_duration = Histogram('llms_os_task_duration_seconds', 'Task execution time', ['action'])
 active_workflows = Gauge('llms_os_active_workflows', 'Currently running workflows')
 api_calls = Counter('llms_os_api_calls_total', 'API calls made', ['endpoint', 'status'])
+request_retries = Counter('llms_os_request_retries_total', 'Requests retried', ['endpoint', 'reason'])
+endpoint_latency = Gauge('llms_os_endpoint_latency_seconds', 'Smoothed latency per provider endpoint', ['endpoint'])
+endpoint_outstanding = Gauge('llms_os_endpoint_outstanding_requests', 'In-flight requests per provider endpoint', ['endpoint'])
+endpoint_circuit_open = Gauge('llms_os_endpoint_circuit_open', 'Whether a provider endpoint is ejected', ['endpoint'])
+tasks_skipped = Counter('llms_os_tasks_skipped_total', 'Tasks not run (unused result or false condition)', ['action', 'reason'])
+task_cache = Counter('llms_os_task_cache_total', 'Incremental cache lookups', ['action', 'outcome'])
+event_loop_lag = Histogram('llms_os_event_loop_lag_seconds', 'Delay of the event loop behind schedule',
+                           buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5))
+event_loop_stalls = Counter('llms_os_event_loop_stalls_total', 'Coroutine steps that blocked the event loop', ['action'])
+semantic_cache_lookups = Counter('llms_os_semantic_cache_total', 'Semantic cache lookups for chat completions', ['outcome'])
+http_body_bytes = Counter('llms_os_http_body_bytes_total', 'HTTP body bytes before compression', ['direction', 'encoding'])
+http_wire_bytes = Counter('llms_os_http_wire_bytes_total', 'HTTP body bytes as transferred', ['direction', 'encoding'])
+bulkhead_utilisation = Gauge('llms_os_bulkhead_utilisation', 'Fraction of a bulkhead pool\'s workers in use', ['pool'])
+bulkhead_queue_wait = Histogram('llms_os_bulkhead_queue_wait_seconds', 'Time tasks waited for a bulkhead worker', ['pool'],
+                                buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30))
+connection_prewarm = Counter('llms_os_connection_prewarm_total', 'Connections opened before first use', ['host', 'outcome'])
+hedged_requests = Counter('llms_os_hedged_requests_total', 'Hedged requests by winning attempt', ['endpoint', 'winner'])
 
 class MetricsCollector:
     """Collect and expose metrics"""
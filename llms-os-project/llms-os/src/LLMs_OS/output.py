@@ -0,0 +1,214 @@
+"""Buffered output for messages, warnings and errors
+
+``print_message`` and the warnings printed by actions and engines go
+through this module instead of ``print``.  Records below the configured
+level are dropped before anything is formatted.  The rest are queued, and
+a background thread formats and writes them in batches with one flush per
+batch.  A large fan-out therefore never waits on the terminal or a pipe,
+and each record is written whole, so output from parallel tasks never
+interleaves mid-line.
+
+Workflow-level settings::
+
+    output:
+      format: text      # text (default) or json: one object per line
+      level: info       # debug, info, success, warning or error
+      color: auto       # auto (only on a TTY), always or never
+      buffer: 10000     # queued records; emitters wait while it is full
+
+Without a ``level``, engine and action diagnostics below ``info`` are
+dropped but every ``print_message`` is written, whatever its ``style``;
+setting a level filters both.  ``NO_COLOR`` in the environment turns
+colour off.  The CLI's ``--output-format`` and ``--log-level`` take
+precedence over the workflow.
+
+Each run writes through its own sink, selected by a context variable, so
+runs in different threads or event loops keep their own level and format.
+Output outside a run goes to a process-wide default sink.
+"""
+import atexit
+import contextvars
+import os
+import queue
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+from . import codec
+
+LEVELS = {'debug': 10, 'info': 20, 'success': 25, 'warning': 30, 'error': 40}
+DEFAULT_LEVEL = 'info'
+
+COLORS = {
+    'success': '\033[92m',
+    'error': '\033[91m',
+    'warning': '\033[93m',
+    'info': '\033[94m',
+    'debug': '\033[90m',
+    'reset': '\033[0m'
+}
+
+DEFAULT_BUFFER = 10000
+BATCH_SIZE = 512
+
+OUTPUT_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'format': {'enum': ['text', 'json']},
+        'level': {'enum': list(LEVELS)},
+        'color': {'enum': ['auto', 'always', 'never']},
+        'buffer': {'type': 'integer', 'minimum': 1}
+    },
+    'additionalProperties': False
+}
+
+_STOP = object()
+
+class OutputSink:
+    """Queue of output records drained by a background writer thread"""
+
+    def __init__(self, format: str = 'text', level: Optional[str] = None, color: str = 'auto',
+                 buffer: int = DEFAULT_BUFFER):
+        self.format = format
+        self.level = level  # None: not set by the workflow or the CLI
+        self.threshold = LEVELS[level or DEFAULT_LEVEL]
+        self.color = color
+        self._queue: queue.Queue = queue.Queue(buffer)
+        self._writer: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def enabled(self, level: str, printed: bool = False) -> bool:
+        """Whether a record at ``level`` would be written
+
+        ``printed`` records (from ``print_message``) are only filtered
+        once a level has been set.
+        """
+        if printed and self.level is None:
+            return True
+        return LEVELS.get(level, LEVELS['info']) >= self.threshold
+
+    def emit(self, level: str, message: str, icon: str = '', printed: bool = False,
+             **fields: Any) -> None:
+        """Queue a record; returns without waiting for it to be written"""
+        if not self.enabled(level, printed):
+            return
+        if self._writer is None:
+            self._start()
+        self._queue.put((time.time(), level, message, icon, fields))
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run, name='llms-os-output', daemon=True)
+                self._writer.start()
+
+    def _use_color(self, stream) -> bool:
+        if self.color != 'auto':
+            return self.color == 'always'
+        if os.environ.get('NO_COLOR'):
+            return False
+        isatty = getattr(stream, 'isatty', None)
+        return bool(isatty and isatty())
+
+    def _format(self, record, color: bool) -> str:
+        timestamp, level, message, icon, fields = record
+        if self.format == 'json':
+            entry = {'time': round(timestamp, 6), 'level': level, 'message': message, **fields}
+            return codec.dumps(entry, default=str).decode('utf-8') + '\n'
+        if color:
+            return f"{COLORS.get(level, COLORS['info'])}{icon}{message}{COLORS['reset']}\n"
+        return f"{icon}{message}\n"
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            try:
+                while len(batch) < BATCH_SIZE:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            records = [record for record in batch if record is not _STOP]
+            try:
+                if records:
+                    stream = sys.stdout
+                    color = self._use_color(stream)
+                    stream.write(''.join(self._format(record, color) for record in records))
+                    stream.flush()
+            except Exception:
+                pass  # a closed or broken stdout must not take the writer down
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if len(records) < len(batch):
+                return
+
+    def flush(self) -> None:
+        """Wait until every queued record has been written"""
+        if self._writer is not None and self._writer.is_alive():
+            self._queue.join()
+
+    def close(self) -> None:
+        """Write what is queued and stop the writer"""
+        if self._writer is not None and self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join()
+        self._writer = None
+
+_default_sink = OutputSink()  # used outside workflow runs
+_overrides: Dict[str, Any] = {}
+
+current_sink: contextvars.ContextVar[Optional[OutputSink]] = contextvars.ContextVar(
+    'llms_os_output', default=None
+)
+
+def _new_sink(settings: Optional[Dict[str, Any]]) -> OutputSink:
+    return OutputSink(**{**(settings or {}), **_overrides})
+
+def configure(settings: Optional[Dict[str, Any]] = None) -> OutputSink:
+    """Replace the default sink using ``output`` settings plus CLI overrides"""
+    global _default_sink
+    _default_sink.close()
+    _default_sink = _new_sink(settings)
+    return _default_sink
+
+@contextmanager
+def use_output(settings: Optional[Dict[str, Any]]) -> Iterator[OutputSink]:
+    """Give the current run its own sink; its records are written on exit"""
+    sink = _new_sink(settings)
+    token = current_sink.set(sink)
+    try:
+        yield sink
+    finally:
+        current_sink.reset(token)
+        sink.close()
+
+def set_overrides(**options: Any) -> None:
+    """Settings (from the CLI) that take precedence over the workflow's"""
+    _overrides.update({k: v for k, v in options.items() if v is not None})
+    configure()
+
+def get_sink() -> OutputSink:
+    """The current run's sink, else the default one"""
+    sink = current_sink.get()
+    return sink if sink is not None else _default_sink
+
+def enabled(level: str, printed: bool = False) -> bool:
+    return get_sink().enabled(level, printed)
+
+def emit(level: str, message: str, icon: str = '', printed: bool = False, **fields: Any) -> None:
+    get_sink().emit(level, message, icon, printed, **fields)
+
+def info(message: str, icon: str = '', **fields: Any) -> None:
+    get_sink().emit('info', message, icon, **fields)
+
+def warning(message: str, **fields: Any) -> None:
+    get_sink().emit('warning', message, '⚠️  ', **fields)
+
+def error(message: str, **fields: Any) -> None:
+    get_sink().emit('error', message, '❌ ', **fields)
+
+def flush() -> None:
+    get_sink().flush()
+
+atexit.register(lambda: _default_sink.close())
@@ -4,6 +4,7 @@ import inspect
 from abc import ABC, abstractmethod
 from pathlib import Path
 from typing import Dict, Any, List
+from . import output
 
 class PluginInterface(ABC):
     """Base interface for all plugins"""
@@ -65,7 +66,7 @@ class PluginManager:
                         discovered.append(plugin_instance.name)
                         
             except Exception as e:
-                print(f"Failed to load plugin {module_name}: {e}")
+                output.warning(f"Failed to load plugin {module_name}: {e}")
         
         return discovered
     
@@ -0,0 +1,109 @@
+"""Connection pre-warming from the loaded workflow
+
+Before the first task runs, the engines collect the hosts the workflow
+will talk to.  Actions report them through ``@register(..., hosts=func)``,
+where ``func(task)`` returns URLs.  ``http_request`` reports its ``url``
+and the LLM actions report their provider endpoints.  Background threads
+then send ``HEAD /`` to each host through the shared transport session,
+which covers DNS resolution, the TCP handshake and the TLS handshake.
+The connections then wait in the session's pool, so the first request
+to each host skips that setup.
+
+Up to ``MAX_PER_HOST`` connections are opened per host (one per task that
+uses it).  URLs containing templates are skipped, and so are tasks
+pruned as unused (see :mod:`LLMs_OS.pruning`) and runs that replay or
+record a cassette.  ``prewarm: false`` turns it off.  Warming is best
+effort: failures are only counted in ``llms_os_connection_prewarm_total``.
+"""
+import threading
+from collections import Counter
+from typing import AbstractSet, Any, Dict, List, Optional
+from urllib.parse import urlsplit
+from . import cassette
+from .monitoring import connection_prewarm
+from .registry import get_hosts
+from .transport import get_session
+
+MAX_PER_HOST = 4
+MAX_CONNECTIONS = 16
+CONNECT_TIMEOUT = 10
+
+def origin(url: Any) -> Optional[str]:
+    """``scheme://host[:port]`` of a URL, or None if it cannot be known yet"""
+    if not isinstance(url, str) or '{{' in url:
+        return None
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        return None
+    return f"{parts.scheme}://{parts.netloc.rpartition('@')[2]}"
+
+def workflow_origins(tasks: List[Dict[str, Any]], skip: AbstractSet[int] = frozenset()) -> Counter:
+    """How many tasks (other than those in ``skip``) will connect to each origin"""
+    counts: Counter = Counter()
+    for index, task in enumerate(tasks):
+        if index in skip or not isinstance(task, dict):
+            continue
+        hosts = get_hosts(task.get('action'))
+        if hosts is None:
+            continue
+        try:
+            urls = hosts(task)
+        except Exception:
+            continue
+        for found in {origin(url) for url in urls} - {None}:
+            counts[found] += 1
+    return counts
+
+def open_connection(target: str, timeout: float = CONNECT_TIMEOUT,
+                    together: Optional[threading.Barrier] = None) -> None:
+    """Send ``HEAD /`` to ``target`` so its connection stays in the pool
+
+    Any status will do: the request is only there to open the connection.
+    Threads warming the same host pass a shared barrier so each holds its
+    response (and so its connection) until all have one; otherwise they
+    would take turns reusing the same connection.
+    """
+    try:
+        response = get_session().head(target + '/', timeout=timeout, stream=True,
+                                      allow_redirects=False)
+    except BaseException:
+        if together is not None:
+            together.abort()
+        raise
+    try:
+        if together is not None:
+            try:
+                together.wait(timeout)
+            except threading.BrokenBarrierError:
+                pass
+    finally:
+        response.content  # reading the (empty) body returns the connection to the pool
+        response.close()
+
+def _warm(target: str, together: threading.Barrier) -> None:
+    try:
+        open_connection(target, together=together)
+    except Exception:
+        connection_prewarm.labels(host=target, outcome='failed').inc()
+    else:
+        connection_prewarm.labels(host=target, outcome='opened').inc()
+
+def start(workflow: Dict[str, Any], skip: AbstractSet[int] = frozenset()) -> List[threading.Thread]:
+    """Open connections for the workflow's hosts in background threads
+
+    ``skip`` holds the indices of tasks that will not run.
+    """
+    if workflow.get('prewarm') is False or cassette.get_cassette() is not None:
+        return []
+    threads = []
+    for target, count in workflow_origins(workflow.get('tasks') or [], skip).most_common():
+        count = min(count, MAX_PER_HOST, MAX_CONNECTIONS - len(threads))
+        if count <= 0:
+            break
+        together = threading.Barrier(count)
+        for _ in range(count):
+            thread = threading.Thread(target=_warm, args=(target, together),
+                                      name='llms-os-prewarm', daemon=True)
+            thread.start()
+            threads.append(thread)
+    return threads
@@ -0,0 +1,242 @@
+"""Low-overhead sampling profiler with per-task attribution
+
+``llms-os --profile [PREFIX]`` runs the workflow under a :class:`Profiler`.
+A background thread samples every thread's Python stack at a fixed
+interval, so overhead does not grow with call count.  The engines open a
+:func:`span` around every task, which both times the task and labels the
+samples taken inside it.  Two files are written:
+
+* ``PREFIX.txt`` - per-task/action timings and a flat function report
+* ``PREFIX.folded`` - collapsed stacks for flamegraph.pl / speedscope
+
+Custom actions can mark regions of interest the same way::
+
+    from LLMs_OS.profiling import span, profiled
+
+    @profiled('tokenize')
+    def tokenize(text): ...
+
+    with span('post-process'):
+        ...
+
+Both are no-ops unless a profiler is running.
+
+The span stack is a context variable, so each asyncio task (and each
+worker thread running an action for it) has its own.  A sample taken on
+the event loop thread is labelled with the spans of the task that is
+running at that moment.
+"""
+import asyncio
+import contextvars
+import functools
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+IDLE_FILES = ('threading.py', 'selectors.py', 'queue.py')
+
+_active: Optional['Profiler'] = None
+
+_stack: contextvars.ContextVar[Tuple[str, ...]] = contextvars.ContextVar(
+    'llms_os_span_stack', default=()
+)
+
+def _owner() -> Tuple[Any, Optional[asyncio.AbstractEventLoop]]:
+    """The running asyncio task (and its loop), else the current thread id"""
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:  # no event loop in this thread
+        task = None
+    if task is None:
+        return threading.get_ident(), None
+    return task, task.get_loop()
+
+class Profiler:
+    """Sample all thread stacks and aggregate them with span labels"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        # span label -> [calls, total seconds, max seconds]
+        self.spans: Dict[str, List[float]] = defaultdict(lambda: [0, 0.0, 0.0])
+        # thread id or asyncio task -> its span stack, for the sampler
+        self._labels: Dict[Any, Tuple[str, ...]] = {}
+        self._loops: Dict[int, asyncio.AbstractEventLoop] = {}  # thread id -> loop
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.started = None
+        self.elapsed = 0.0
+
+    def start(self) -> 'Profiler':
+        global _active
+        _active = self
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='llms-os-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        global _active
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.elapsed = time.perf_counter() - self.started
+        if _active is self:
+            _active = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self._sample(own)
+
+    def _sample(self, own: int) -> None:
+        frames = sys._current_frames()
+        with self._lock:
+            labels = dict(self._labels)
+            loops = dict(self._loops)
+        for tid, frame in frames.items():
+            if tid == own:
+                continue
+            label = labels.get(tid, ())
+            if tid in loops:
+                # An event loop thread: the running task owns the sample
+                label = labels.get(asyncio.current_task(loops[tid]), label)
+            if not label and os.path.basename(frame.f_code.co_filename) in IDLE_FILES:
+                continue  # parked worker or idle event loop
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            stack.reverse()
+            self.samples[';'.join(list(label) + stack)] += 1
+
+    def _publish(self, stack: Tuple[str, ...]) -> None:
+        owner, loop = _owner()
+        with self._lock:
+            if stack:
+                self._labels[owner] = stack
+            else:
+                self._labels.pop(owner, None)
+            if loop is not None:
+                self._loops[threading.get_ident()] = loop
+
+    def push(self, label: str) -> contextvars.Token:
+        """Open a span in the current context; pass the token to :meth:`pop`"""
+        token = _stack.set(_stack.get() + (label,))
+        self._publish(_stack.get())
+        return token
+
+    def pop(self, token: contextvars.Token, label: str, seconds: float) -> None:
+        _stack.reset(token)
+        self._publish(_stack.get())
+        self.record(label, seconds)
+
+    def record(self, label: str, seconds: float) -> None:
+        """Add a timing to a span"""
+        with self._lock:
+            entry = self.spans[label]
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+    def collapsed(self) -> str:
+        """Samples in collapsed-stack format (one 'frame;frame count' per line)"""
+        return ''.join(f"{stack} {count}\n" for stack, count in sorted(self.samples.items()))
+
+    def report(self, limit: int = 40) -> str:
+        """Human-readable span timings and flat function profile"""
+        lines = [f"Wall time: {self.elapsed:.3f}s, {sum(self.samples.values())} samples "
+                 f"every {self.interval * 1000:.1f}ms", ""]
+
+        lines.append(f"{'span':<48} {'calls':>7} {'total s':>10} {'mean ms':>10} {'max ms':>10}")
+        for label, (calls, total, peak) in sorted(self.spans.items(), key=lambda kv: -kv[1][1]):
+            lines.append(f"{label[:48]:<48} {calls:>7} {total:>10.3f} "
+                         f"{total / calls * 1000:>10.2f} {peak * 1000:>10.2f}")
+        lines.append("")
+
+        own, total = Counter(), Counter()
+        for stack, count in self.samples.items():
+            frames = stack.split(';')
+            own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        lines.append(f"{'function':<70} {'self ms':>10} {'total ms':>10}")
+        ms = self.interval * 1000
+        for frame, count in own.most_common(limit):
+            lines.append(f"{frame[:70]:<70} {count * ms:>10.1f} {total[frame] * ms:>10.1f}")
+        return '\n'.join(lines) + '\n'
+
+    def write(self, prefix: str) -> List[str]:
+        """Write PREFIX.txt and PREFIX.folded; return the paths"""
+        paths = [f"{prefix}.txt", f"{prefix}.folded"]
+        with open(paths[0], 'w', encoding='utf-8') as f:
+            f.write(self.report())
+        with open(paths[1], 'w', encoding='utf-8') as f:
+            f.write(self.collapsed())
+        return paths
+
+def get_profiler() -> Optional[Profiler]:
+    """The running profiler, if any"""
+    return _active
+
+@contextmanager
+def span(label: str):
+    """Time a region and attribute samples taken inside it to ``label``"""
+    profiler = _active
+    if profiler is None:
+        yield
+        return
+    token = profiler.push(label)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profiler.pop(token, label, time.perf_counter() - start)
+
+def profiled(label: Optional[str] = None):
+    """Decorator form of :func:`span` for functions inside custom actions"""
+    def decorator(func):
+        name = label or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _active is None:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def task_label(task: Dict) -> str:
+    """Span label for a workflow task"""
+    action = task.get('action', '?')
+    name = task.get('save_as')
+    return f"task:{action}[{name}]" if name else f"task:{action}"
+
+def traced(func, label: str):
+    """Wrap a sync action so its span is opened in whichever thread runs it"""
+    if _active is None:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with span(label):
+            return func(*args, **kwargs)
+    return wrapper
+
+async def traced_coroutine(awaitable, label: str):
+    """Await ``awaitable`` inside a span owned by the current asyncio task"""
+    with span(label):
+        return await awaitable
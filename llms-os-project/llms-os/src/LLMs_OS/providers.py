@@ -0,0 +1,293 @@
+"""LLM provider pool: multi-endpoint routing with circuit breakers
+
+Pools are built from the environment by default.  ``OPENROUTER_API_URL``
+and ``OPENROUTER_API_KEY`` may each hold a comma-separated list.
+Equal-length lists are paired; otherwise every URL is combined with every
+key. A workflow can declare its own pool instead::
+
+    providers:
+      strategy: least_latency     # or least_outstanding
+      failure_threshold: 5        # consecutive failures before ejecting
+      reset_timeout: 30           # seconds before probing an ejected endpoint
+      endpoints:
+        - url: https://openrouter.ai/api/v1
+          key_env: OPENROUTER_API_KEY
+        - url: https://eu.example.com/api/v1
+          key: sk-...
+          models: ["openai/*"]    # fnmatch patterns; default: any model
+
+Pools are kept for the life of the process, one per endpoint
+configuration (or environment).  Runs with the same configuration share a
+pool, so an endpoint ejected by one run stays ejected for the next, and
+latency statistics carry over.  Each run selects its pool through a
+context variable, so concurrent runs with different configurations do
+not see each other's pool.  Routing state is exported as the
+``llms_os_endpoint_*`` metrics.
+"""
+import contextvars
+import fnmatch
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+from . import transport
+from .exceptions import APIError, CassetteMissError
+from .monitoring import api_calls, endpoint_latency, endpoint_outstanding, endpoint_circuit_open
+
+DEFAULT_API_URL = 'https://openrouter.ai/api/v1'
+STRATEGIES = ('least_latency', 'least_outstanding')
+
+ENDPOINT_SCHEMA = {
+    'type': 'object',
+    'required': ['url'],
+    'properties': {
+        'url': {'type': 'string', 'minLength': 1},
+        'key': {'type': 'string'},
+        'key_env': {'type': 'string'},
+        'models': {'type': 'array', 'items': {'type': 'string'}}
+    }
+}
+
+PROVIDERS_SCHEMA = {
+    'type': 'object',
+    'required': ['endpoints'],
+    'properties': {
+        'strategy': {'enum': list(STRATEGIES)},
+        'failure_threshold': {'type': 'integer', 'minimum': 1},
+        'reset_timeout': {'type': 'number', 'minimum': 0},
+        'endpoints': {'type': 'array', 'minItems': 1, 'items': ENDPOINT_SCHEMA}
+    }
+}
+
+class CircuitBreaker:
+    """Closed -> open after N consecutive failures -> half-open probe"""
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def available(self) -> bool:
+        """Whether a request may be sent now (claims the probe slot)"""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def record_skip(self) -> None:
+        """Give back the probe slot of a request that was never sent"""
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probing = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+class Endpoint:
+    """One base URL + API key, with live routing statistics"""
+
+    EWMA_ALPHA = 0.2
+
+    def __init__(self, url: str, key: str = '', models: Optional[List[str]] = None,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.url = url.rstrip('/')
+        self.key = key
+        self.models = models or ['*']
+        self.breaker = breaker or CircuitBreaker()
+        self.outstanding = 0
+        self.latency = None  # EWMA seconds
+        self.successes = 0
+        self.failures = 0
+
+    @property
+    def label(self) -> str:
+        # Never expose the key itself in metrics, only a short suffix
+        return f"{self.url}#{self.key[-4:]}" if len(self.key) >= 16 else self.url
+
+    def serves(self, model: str) -> bool:
+        return any(fnmatch.fnmatchcase(model, pattern) for pattern in self.models)
+
+class ProviderPool:
+    """Route requests to the best healthy endpoint for a model"""
+
+    def __init__(self, endpoints: List[Endpoint], strategy: str = 'least_latency'):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown routing strategy: {strategy}")
+        self.endpoints = endpoints
+        self.strategy = strategy
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> 'ProviderPool':
+        threshold = config.get('failure_threshold', 5)
+        reset = config.get('reset_timeout', 30.0)
+        endpoints = []
+        for item in config['endpoints']:
+            endpoints.append(Endpoint(
+                item['url'], _endpoint_key(item), item.get('models'),
+                CircuitBreaker(threshold, reset)
+            ))
+        return cls(endpoints, config.get('strategy', 'least_latency'))
+
+    @classmethod
+    def from_env(cls) -> 'ProviderPool':
+        urls = _split(os.getenv('OPENROUTER_API_URL', DEFAULT_API_URL)) or [DEFAULT_API_URL]
+        keys = _split(os.getenv('OPENROUTER_API_KEY', '')) or ['']
+        if len(urls) == len(keys):
+            pairs = list(zip(urls, keys))
+        else:
+            pairs = [(url, key) for url in urls for key in keys]
+        return cls([Endpoint(url, key) for url, key in pairs])
+
+    def _score(self, endpoint: Endpoint):
+        if self.strategy == 'least_outstanding':
+            return (endpoint.outstanding, endpoint.latency or 0.0)
+        # Unmeasured endpoints score 0 so they get tried early
+        return ((endpoint.latency or 0.0) * (endpoint.outstanding + 1), endpoint.outstanding)
+
+    def acquire(self, model: str) -> Endpoint:
+        """Pick an endpoint for a request and mark it outstanding"""
+        with self._lock:
+            candidates = [e for e in self.endpoints if e.serves(model)]
+            if not candidates:
+                raise APIError(f"No endpoint configured for model: {model}")
+
+            for endpoint in sorted(candidates, key=self._score):
+                if endpoint.breaker.available():
+                    endpoint.outstanding += 1
+                    endpoint_outstanding.labels(endpoint=endpoint.label).set(endpoint.outstanding)
+                    return endpoint
+        raise APIError(f"All endpoints for model {model} are unavailable (circuit open)")
+
+    def release(self, endpoint: Endpoint, latency: float, ok: Optional[bool], status: str) -> None:
+        """Record the outcome of a request sent to ``endpoint``
+
+        ``ok=None`` means the request never reached the endpoint, so its
+        health and latency statistics are left alone.
+        """
+        with self._lock:
+            endpoint.outstanding -= 1
+            if ok is None:
+                endpoint.breaker.record_skip()
+                endpoint_outstanding.labels(endpoint=endpoint.label).set(endpoint.outstanding)
+                return
+            if ok:
+                endpoint.successes += 1
+                endpoint.breaker.record_success()
+                if endpoint.latency is None:
+                    endpoint.latency = latency
+                else:
+                    endpoint.latency += Endpoint.EWMA_ALPHA * (latency - endpoint.latency)
+            else:
+                endpoint.failures += 1
+                endpoint.breaker.record_failure()
+
+            label = endpoint.label
+            endpoint_outstanding.labels(endpoint=label).set(endpoint.outstanding)
+            endpoint_circuit_open.labels(endpoint=label).set(
+                0 if endpoint.breaker.state == CircuitBreaker.CLOSED else 1
+            )
+            if endpoint.latency is not None:
+                endpoint_latency.labels(endpoint=label).set(endpoint.latency)
+        api_calls.labels(endpoint=label, status=status).inc()
+
+    def post(self, model: str, path: str, body: bytes, timeout: float, stream: bool = False,
+             compress=None):
+        """POST a JSON body to ``path`` on the best endpoint for ``model``
+
+        Each call is routed separately, so retries fail over.  With
+        ``stream`` the body is left unread for the caller to iterate;
+        ``compress`` is passed on to :func:`LLMs_OS.transport.request`.
+        """
+        endpoint = self.acquire(model)
+        headers = {
+            'Authorization': f'Bearer {endpoint.key}',
+            'Content-Type': 'application/json'
+        }
+        start = time.monotonic()
+        try:
+            response = transport.request('POST', f"{endpoint.url}{path}", data=body,
+                                         headers=headers, timeout=timeout, stream=stream,
+                                         compress=compress)
+        except CassetteMissError:
+            self.release(endpoint, time.monotonic() - start, None, 'CassetteMissError')
+            raise
+        except Exception as e:
+            self.release(endpoint, time.monotonic() - start, False, type(e).__name__)
+            raise
+        ok = response.status_code < 500 and response.status_code != 429
+        self.release(endpoint, time.monotonic() - start, ok, str(response.status_code))
+        return response
+
+def _split(value: str) -> List[str]:
+    return [part.strip() for part in value.split(',') if part.strip()]
+
+def _endpoint_key(item: Dict[str, Any]) -> str:
+    key = item.get('key')
+    if key is None:
+        key = os.getenv(item.get('key_env', 'OPENROUTER_API_KEY'), '')
+    return key
+
+def _pool_id(config: Optional[Dict[str, Any]]) -> tuple:
+    """What makes two pools interchangeable: the resolved endpoints and settings"""
+    if not config:
+        return ('env', os.getenv('OPENROUTER_API_URL'), os.getenv('OPENROUTER_API_KEY'))
+    endpoints = tuple(
+        (item['url'], _endpoint_key(item), tuple(item.get('models') or ()))
+        for item in config['endpoints']
+    )
+    return (config.get('strategy', 'least_latency'), config.get('failure_threshold', 5),
+            config.get('reset_timeout', 30.0), endpoints)
+
+_pools: Dict[tuple, ProviderPool] = {}
+_pool_lock = threading.Lock()
+
+current_pool: contextvars.ContextVar[Optional[ProviderPool]] = contextvars.ContextVar(
+    'llms_os_providers', default=None
+)
+
+def shared_pool(config: Optional[Dict[str, Any]]) -> ProviderPool:
+    """The process-wide pool for ``config`` (or the environment), built once"""
+    pool_id = _pool_id(config)
+    with _pool_lock:
+        pool = _pools.get(pool_id)
+        if pool is None:
+            pool = ProviderPool.from_config(config) if config else ProviderPool.from_env()
+            _pools[pool_id] = pool
+        return pool
+
+@contextmanager
+def use_providers(config: Optional[Dict[str, Any]]) -> Iterator[ProviderPool]:
+    """Route the current run through the shared pool for ``config``"""
+    pool = shared_pool(config)
+    token = current_pool.set(pool)
+    try:
+        yield pool
+    finally:
+        current_pool.reset(token)
+
+def endpoint_urls(model: str) -> List[str]:
+    """Base URLs of the active pool's endpoints that serve ``model``"""
+    return [e.url for e in get_pool().endpoints if e.serves(model)]
+
+def get_pool() -> ProviderPool:
+    """The current run's pool, else the one for the environment"""
+    pool = current_pool.get()
+    return pool if pool is not None else shared_pool(None)
@@ -0,0 +1,93 @@
+"""Dead-task elimination
+
+With ``prune: true``, both engines drop tasks whose work nobody could
+observe before a loaded workflow runs.  A task is *unused* when its action is pure (no side
+effects: ``chat_completion``, ``file_read``, ``http_request`` GET, ...; see
+``@register(..., pure=...)``) and no later task reads its result, either
+because it has no ``save_as`` or because the name is never referenced
+before it is saved again.  A task whose only readers are unused is unused
+as well, so whole dead branches disappear.
+
+``keep: true`` does two things: the task always runs, and its result is
+pinned in the context for the whole run (see :mod:`LLMs_OS.context`).
+Both serve a result read by something pruning cannot see.
+
+References are the same ``{{ ... }}`` paths that drive scheduling
+(including ``when:`` conditions) plus ``stream_from``.  Streamed runs
+cannot see later readers and are not pruned.  Pruning is off unless the
+workflow sets ``prune: true``; either way the CLI's ``--dry-run`` lists
+the unused tasks.
+"""
+from typing import Any, Dict, List, Set
+from . import output
+from .monitoring import tasks_skipped
+from .registry import direct_reads, is_pure
+from .templates import find_references
+
+def unused_tasks(tasks: List[Dict[str, Any]]) -> Set[int]:
+    """Indices of pure tasks whose results are never read"""
+    readers: Dict[int, Set[int]] = {}  # defining task index -> reader indices
+    current: Dict[str, int] = {}
+    for index, task in enumerate(tasks):
+        names = find_references(task)
+        if task.get('stream_from'):
+            names.add(task['stream_from'])
+        reads = direct_reads(task)
+        names |= set(current) if reads is None else reads
+        for name in names:
+            definition = current.get(name)
+            if definition is not None:
+                readers[definition].add(index)
+        name = task.get('save_as')
+        if name:
+            current[name] = index
+            readers[index] = set()
+
+    # Readers come later, so one backward pass settles chains of dead tasks
+    unused: Set[int] = set()
+    for index in range(len(tasks) - 1, -1, -1):
+        task = tasks[index]
+        if task.get('keep') or not is_pure(task):
+            continue
+        if not readers.get(index, set()) - unused:
+            unused.add(index)
+    return unused
+
+def prunable(workflow: Dict[str, Any], tasks: Any) -> Set[int]:
+    """Tasks the engines may skip: empty for streamed runs and without ``prune: true``"""
+    if workflow.get('prune') is not True or not isinstance(tasks, list):
+        return set()
+    return unused_tasks(tasks)
+
+def record_skip(task: Dict[str, Any], reason: str) -> None:
+    """Count a task that did not run ('unused' or 'condition')"""
+    action = task.get('action')
+    tasks_skipped.labels(action=action, reason=reason).inc()
+    if reason == 'condition':
+        output.emit('debug', f"Skipped '{action}': condition {task.get('when')} is false",
+                    action=action)
+
+def report(tasks: List[Dict[str, Any]], unused: Set[int], pruned: bool) -> List[str]:
+    """Lines describing which of ``tasks`` a run would execute or skip
+
+    ``unused`` tasks are skipped if ``pruned``, otherwise only flagged.
+    """
+    skipped = unused if pruned else set()
+    lines = []
+    for index, task in enumerate(tasks):
+        label = f"{index + 1}. {task.get('action')}"
+        if task.get('save_as'):
+            label += f" -> {task['save_as']}"
+        if index in skipped:
+            lines.append(f"{label}: skip (result is never used)")
+        elif index in unused:
+            lines.append(f"{label}: run (result is never used; skipped with prune: true)")
+        elif task.get('when') is not None:
+            lines.append(f"{label}: run when {task['when']}")
+        else:
+            lines.append(f"{label}: run")
+    conditional = sum(1 for index, task in enumerate(tasks)
+                      if index not in skipped and task.get('when') is not None)
+    lines.append(f"{len(tasks) - len(skipped)} of {len(tasks)} task(s) would run "
+                 f"({len(unused)} unused, {conditional} conditional)")
+    return lines
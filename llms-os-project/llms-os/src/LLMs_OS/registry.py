@@ -1,11 +1,43 @@
 """Action registry for LLMs_OS"""
 
 _ACTIONS = {}
+_SCHEMAS = {}
+_TRAITS = {}
+_version = 0  # bumped on every registration
 
-def register(name):
-    """Decorator to register an action"""
+def register(name, schema=None, pure=False, cache_key=None, stream=None, sink=None,
+             bulkhead=None, hosts=None, reads=None):
+    """Decorator to register an action
+
+    ``schema`` is an optional JSON Schema describing the task fields the
+    action accepts; it is compiled and checked by the workflow validator.
+    ``pure`` marks actions without side effects (a bool, or a callable
+    taking the task for actions whose purity depends on it).  ``cache_key``
+    is an optional callable returning extra state that the action's result
+    depends on beyond the task itself (e.g. a file's mtime).  ``stream``
+    and ``sink`` are optional functions that let the action produce or
+    consume chunks for ``stream: true`` / ``stream_from`` tasks (see
+    :mod:`LLMs_OS.streams`).  ``bulkhead`` names the worker pool the
+    async engine runs the action on (see :mod:`LLMs_OS.bulkheads`).
+    ``hosts`` is an optional callable returning the URLs a task will
+    connect to, so connections can be opened early (see
+    :mod:`LLMs_OS.prewarm`).  ``reads`` lists the saved results the action
+    reads from ``context`` directly rather than through ``{{ ... }}``
+    templates (names, or a callable taking the task); ``()`` means it only
+    uses templates.  Left as None, the action may read anything, so
+    context eviction keeps every earlier result for it (see
+    :mod:`LLMs_OS.context`).
+    """
     def decorator(func):
+        global _version
+        _version += 1
         _ACTIONS[name] = func
+        if schema is not None:
+            _SCHEMAS[name] = schema
+        else:
+            _SCHEMAS.pop(name, None)
+        _TRAITS[name] = {'pure': pure, 'cache_key': cache_key, 'stream': stream, 'sink': sink,
+                         'bulkhead': bulkhead, 'hosts': hosts, 'reads': reads}
         return func
     return decorator
 
@@ -15,6 +47,46 @@ def get_action(name):
         raise KeyError(f"Action not found: {name}")
     return _ACTIONS[name]
 
+def get_schema(name):
+    """Get the task schema declared for an action (or None)"""
+    return _SCHEMAS.get(name)
+
+def is_pure(task):
+    """Whether running a task has no side effects besides its result"""
+    pure = _TRAITS.get(task.get('action'), {}).get('pure', False)
+    return bool(pure(task)) if callable(pure) else pure
+
+def direct_reads(task):
+    """Names a task reads from the context without templates (None: any)"""
+    reads = _TRAITS.get(task.get('action'), {}).get('reads')
+    if reads is None:
+        return None
+    return set(reads(task)) if callable(reads) else set(reads)
+
+def get_cache_key(name):
+    """Get the extra cache-key function declared for an action (or None)"""
+    return _TRAITS.get(name, {}).get('cache_key')
+
+def get_stream(name):
+    """Get the chunk generator function declared for an action (or None)"""
+    return _TRAITS.get(name, {}).get('stream')
+
+def get_sink(name):
+    """Get the chunk consumer function declared for an action (or None)"""
+    return _TRAITS.get(name, {}).get('sink')
+
+def get_bulkhead(name):
+    """Get the bulkhead pool declared for an action (or None)"""
+    return _TRAITS.get(name, {}).get('bulkhead')
+
+def get_hosts(name):
+    """Get the function listing the URLs a task connects to (or None)"""
+    return _TRAITS.get(name, {}).get('hosts')
+
+def registry_version():
+    """Counter that changes whenever an action (or its schema) is registered"""
+    return _version
+
 def list_actions():
     """List all registered actions"""
     return list(_ACTIONS.keys())
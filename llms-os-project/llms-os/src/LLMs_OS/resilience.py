@@ -0,0 +1,221 @@
+"""Retry and request-hedging policies for network actions
+
+Tasks opt in with::
+
+    retry:
+      attempts: 4          # total tries, including the first
+      backoff: 0.5         # base delay in seconds, doubled per attempt
+      max_backoff: 10
+      jitter: true         # "full jitter": sleep uniform(0, delay)
+      retry_on: [429, 500, 502, 503, 504]
+    hedge: true            # or {quantile: 0.95, after: 2.0, min_samples: 20}
+
+Hedging fires a duplicate request once the first one has been outstanding
+for longer than the observed latency quantile of its endpoint, returns
+whichever finishes first and discards the other.
+"""
+import contextvars
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlsplit
+import requests
+from . import deadlines
+from .monitoring import hedged_requests, request_retries
+
+DEFAULT_RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+RETRY_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'attempts': {'type': 'integer', 'minimum': 1},
+        'backoff': {'type': 'number', 'minimum': 0},
+        'max_backoff': {'type': 'number', 'minimum': 0},
+        'jitter': {'type': 'boolean'},
+        'retry_on': {'type': 'array', 'items': {'type': 'integer'}}
+    }
+}
+
+HEDGE_SCHEMA = {
+    'anyOf': [
+        {'type': 'boolean'},
+        {
+            'type': 'object',
+            'properties': {
+                'quantile': {'type': 'number', 'exclusiveMinimum': 0, 'maximum': 1},
+                'after': {'type': 'number', 'minimum': 0},
+                'min_samples': {'type': 'integer', 'minimum': 1}
+            }
+        }
+    ]
+}
+
+def endpoint_key(url: str) -> str:
+    """Normalise a URL to the endpoint used for latency statistics"""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}{parts.path}"
+
+class LatencyTracker:
+    """Sliding window of observed latencies per endpoint"""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, endpoint: str, seconds: float) -> None:
+        with self._lock:
+            samples = self._samples.get(endpoint)
+            if samples is None:
+                samples = self._samples[endpoint] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def count(self, endpoint: str) -> int:
+        with self._lock:
+            return len(self._samples.get(endpoint, ()))
+
+    def quantile(self, endpoint: str, q: float) -> Optional[float]:
+        """Latency quantile for an endpoint, or None without samples"""
+        with self._lock:
+            samples = sorted(self._samples.get(endpoint, ()))
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+latency_tracker = LatencyTracker()
+
+class RetryPolicy:
+    """How often and how patiently to retry a request"""
+
+    RETRYABLE_EXCEPTIONS = (requests.ConnectionError, requests.Timeout)
+
+    def __init__(self, attempts: int = 1, backoff: float = 0.5, max_backoff: float = 10.0,
+                 jitter: bool = True, retry_on=DEFAULT_RETRY_STATUSES):
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.retry_on = frozenset(retry_on)
+
+    @classmethod
+    def from_task(cls, task: Dict[str, Any]) -> 'RetryPolicy':
+        return cls(**(task.get('retry') or {}))
+
+    def delay(self, attempt: int, response=None) -> float:
+        """Seconds to wait before the attempt following ``attempt``"""
+        delay = min(self.max_backoff, self.backoff * (2 ** (attempt - 1)))
+        if self.jitter:
+            delay = random.uniform(0, delay)
+
+        # Respect an explicit Retry-After from the server (seconds form)
+        if response is not None:
+            retry_after = response.headers.get('Retry-After', '')
+            if retry_after.isdigit():
+                delay = max(delay, min(self.max_backoff, float(retry_after)))
+        return delay
+
+class HedgePolicy:
+    """When to fire a duplicate request"""
+
+    def __init__(self, quantile: float = 0.95, after: Optional[float] = None,
+                 min_samples: int = 20):
+        self.quantile = quantile
+        self.after = after
+        self.min_samples = min_samples
+
+    @classmethod
+    def from_task(cls, task: Dict[str, Any]) -> Optional['HedgePolicy']:
+        hedge = task.get('hedge')
+        if not hedge:
+            return None
+        return cls(**hedge) if isinstance(hedge, dict) else cls()
+
+    def threshold(self, endpoint: str) -> Optional[float]:
+        """Seconds to wait before hedging, or None to not hedge yet"""
+        if latency_tracker.count(endpoint) >= self.min_samples:
+            return latency_tracker.quantile(endpoint, self.quantile)
+        return self.after
+
+_hedge_pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix='llms-os-hedge')
+
+def _timed(send: Callable, endpoint: str):
+    start = time.monotonic()
+    response = send()
+    latency_tracker.observe(endpoint, time.monotonic() - start)
+    return response
+
+def _discard(future) -> None:
+    """Cancel a losing attempt, or close its response once it arrives"""
+    if future.cancel():
+        return
+
+    def close(done):
+        if not done.cancelled() and done.exception() is None:
+            done.result().close()
+    future.add_done_callback(close)
+
+def _hedged(send: Callable, endpoint: str, hedge: HedgePolicy):
+    threshold = hedge.threshold(endpoint)
+    time_left = deadlines.remaining()
+    if time_left is not None and threshold is not None and threshold >= time_left:
+        threshold = None
+    if threshold is None:
+        return _timed(send, endpoint)
+
+    # Worker threads run in a copy of our context so deadlines still apply
+    primary = _hedge_pool.submit(contextvars.copy_context().run, _timed, send, endpoint)
+    done, _ = wait([primary], timeout=threshold)
+    if done:
+        return primary.result()
+
+    backup = _hedge_pool.submit(contextvars.copy_context().run, _timed, send, endpoint)
+    pending = {primary, backup}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                for other in pending:
+                    _discard(other)
+                hedged_requests.labels(
+                    endpoint=endpoint,
+                    winner='backup' if future is backup else 'primary'
+                ).inc()
+                return future.result()
+            error = future.exception()
+    raise error
+
+def send_with_policy(task: Dict[str, Any], url: str, send: Callable[[], Any]):
+    """Run ``send()`` (returning a requests.Response) under the task's
+    retry and hedging policies and return the final response
+    """
+    policy = RetryPolicy.from_task(task)
+    hedge = HedgePolicy.from_task(task)
+    endpoint = endpoint_key(url)
+    attempt = 0
+
+    while True:
+        attempt += 1
+        deadlines.check()
+        try:
+            if hedge is not None:
+                response = _hedged(send, endpoint, hedge)
+            else:
+                response = _timed(send, endpoint)
+        except policy.RETRYABLE_EXCEPTIONS as e:
+            if attempt >= policy.attempts:
+                raise
+            reason = type(e).__name__
+            delay = policy.delay(attempt)
+        else:
+            if response.status_code not in policy.retry_on or attempt >= policy.attempts:
+                return response
+            reason = str(response.status_code)
+            delay = policy.delay(attempt, response)
+            response.close()
+
+        request_retries.labels(endpoint=endpoint, reason=reason).inc()
+        deadlines.sleep(delay)
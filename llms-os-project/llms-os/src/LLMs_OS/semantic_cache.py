@@ -0,0 +1,123 @@
+"""Semantic cache for chat completions
+
+With ``semantic_cache`` set on a ``chat_completion`` task, the prompt is
+embedded first.  If a stored prompt for the same chat model is at least
+``threshold`` cosine-similar, its answer is returned without calling the
+LLM.  Otherwise the completion runs and its text is added to the cache::
+
+    - action: chat_completion
+      messages: [...]
+      semantic_cache:
+        threshold: 0.95                          # default
+        model: openai/text-embedding-3-small     # embedding model
+        dir: .llms_os_cache/semantic             # default, next to the workflow
+
+``semantic_cache: true`` uses the defaults.  Like the incremental cache,
+the default directory sits beside the workflow file rather than in the
+working directory (a run selects it with :func:`use_workflow`).  Vectors live in a
+:class:`~LLMs_OS.vectors.VectorStore` per chat model, with only the prompt
+and the answer text as payload; a cached result is ``{content: ...}``
+without ``full_response``.  If the embedding call fails, the completion
+simply runs uncached.
+"""
+import contextvars
+import hashlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from . import output
+from .deadlines import check
+from .embedding import DEFAULT_MODEL, embed
+from .exceptions import ENGINE_ERRORS
+from .monitoring import semantic_cache_lookups
+from .vectors import open_store
+
+DEFAULT_DIR = '.llms_os_cache/semantic'
+DEFAULT_THRESHOLD = 0.95
+
+SEMANTIC_CACHE_SCHEMA = {
+    'anyOf': [
+        {'type': 'boolean'},
+        {
+            'type': 'object',
+            'properties': {
+                'threshold': {'type': 'number', 'minimum': 0, 'maximum': 1},
+                'model': {'type': 'string'},
+                'dir': {'type': 'string'}
+            },
+            'additionalProperties': False
+        }
+    ]
+}
+
+current_root: contextvars.ContextVar[Optional[Path]] = contextvars.ContextVar(
+    'llms_os_semantic_cache_dir', default=None
+)
+
+@contextmanager
+def use_workflow(file_path: str) -> Iterator[Path]:
+    """Keep the current run's default semantic cache next to ``file_path``"""
+    root = Path(file_path).resolve().parent / DEFAULT_DIR
+    token = current_root.set(root)
+    try:
+        yield root
+    finally:
+        current_root.reset(token)
+
+def prompt_text(messages: List[Dict[str, str]]) -> str:
+    """The text that gets embedded for a conversation"""
+    return '\n'.join(f"{m.get('role')}: {m.get('content', '')}" for m in messages)
+
+class SemanticCache:
+    """Near-duplicate prompt lookup backed by an embedding index"""
+
+    def __init__(self, root: Optional[str] = None, threshold: float = DEFAULT_THRESHOLD,
+                 model: Optional[str] = None):
+        if root is None:
+            root = current_root.get() or DEFAULT_DIR
+        self.root = Path(root)
+        self.threshold = threshold
+        self.model = model or DEFAULT_MODEL
+
+    @classmethod
+    def from_task(cls, task: Dict[str, Any]) -> Optional['SemanticCache']:
+        setting = task.get('semantic_cache')
+        if not setting:
+            return None
+        if setting is True:
+            return cls()
+        return cls(setting.get('dir'), setting.get('threshold', DEFAULT_THRESHOLD),
+                   setting.get('model'))
+
+    def _store(self, chat_model: str, dim: int):
+        name = hashlib.sha256(f"{chat_model}\0{self.model}".encode('utf-8')).hexdigest()[:16]
+        return open_store(self.root / name, dim)
+
+    def lookup(self, chat_model: str, messages: List[Dict[str, str]],
+               task: Dict[str, Any] = None) -> Tuple[Optional[List[float]], Any]:
+        """Return (prompt vector, cached result or None)
+
+        The vector is None when the prompt could not be embedded.
+        """
+        try:
+            vector = embed([prompt_text(messages)], self.model, task)[0]
+            matches = self._store(chat_model, len(vector)).search(vector, k=1)
+        except ENGINE_ERRORS:
+            raise
+        except Exception as e:
+            check()  # an I/O timeout at the deadline is a deadline error
+            output.warning(f"Semantic cache unavailable: {e}")
+            semantic_cache_lookups.labels(outcome='error').inc()
+            return None, None
+        if matches and matches[0][0] >= self.threshold:
+            semantic_cache_lookups.labels(outcome='hit').inc()
+            return vector, {'content': matches[0][2]['content']}
+        semantic_cache_lookups.labels(outcome='miss').inc()
+        return vector, None
+
+    def add(self, chat_model: str, messages: List[Dict[str, str]],
+            vector: List[float], content: str) -> None:
+        """Remember the answer text for a prompt"""
+        self._store(chat_model, len(vector)).add(
+            [vector], [{'prompt': prompt_text(messages), 'content': content}]
+        )
@@ -0,0 +1,230 @@
+"""Streaming dataflow between tasks
+
+A task with ``stream: true`` produces its result as a sequence of chunks
+(lines of a file, lines of an HTTP body, tokens of a chat completion)
+instead of one value.  A later task names it in ``stream_from`` and
+consumes the chunks while they are being produced::
+
+    - action: chat_completion
+      messages: [...]
+      stream: true
+      save_as: answer
+    - action: file_write
+      path: out/answer.md
+      stream_from: answer
+
+On the async engine, producer and consumer run concurrently in worker
+threads, connected by a :class:`Channel` of ``stream_buffer`` chunks
+(default 64).  A full channel blocks the producer, so a slow consumer
+applies backpressure and memory stays bounded.  The sync engine runs the producer lazily inside the
+consumer, which is a zero-buffer pipeline.  Either way a streaming task
+runs at its consumer's position in the workflow, and each stream has
+exactly one consumer.  Once the stream is finished, the producer's ``save_as`` holds a
+summary (``chunks``, ``size``).
+
+Actions opt in through ``@register(..., stream=func)``, where ``func(task,
+context)`` yields chunks, and ``@register(..., sink=func)``, where
+``func(task, context, chunks)`` consumes an iterator of chunks.  Streamed
+runs (JSONL workflows) do not support stream dataflow.
+"""
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional
+from . import deadlines
+from .exceptions import StreamClosed, StreamError
+from .registry import get_sink, get_stream
+
+DEFAULT_BUFFER = 64
+
+_EOS = object()
+
+def stream_errors(tasks: List[Dict[str, Any]]) -> List[str]:
+    """Problems with stream/stream_from wiring in a task list"""
+    errors = []
+    producers: Dict[str, int] = {}
+    consumed = set()
+    for idx, task in enumerate(tasks):
+        if not isinstance(task, dict):
+            continue
+        label = f"Task {idx + 1} ({task.get('action')})"
+        if 'when' in task and (task.get('stream') or task.get('stream_from')):
+            errors.append(f"{label}: a task stream cannot have a when condition")
+        source = task.get('stream_from')
+        if source is not None:
+            if get_sink(task.get('action')) is None:
+                errors.append(f"{label}: action cannot consume a stream")
+            elif source not in producers:
+                errors.append(f"{label}: stream_from '{source}' does not name an earlier streaming task")
+            elif source in consumed:
+                errors.append(f"{label}: stream '{source}' already has a consumer")
+            consumed.add(source)
+        if task.get('stream'):
+            name = task.get('save_as')
+            if get_stream(task.get('action')) is None:
+                errors.append(f"{label}: action cannot produce a stream")
+            elif not name:
+                errors.append(f"{label}: a streaming task needs save_as")
+            else:
+                if name in producers and name not in consumed:
+                    earlier = producers[name]
+                    errors.append(f"Task {earlier + 1} ({tasks[earlier].get('action')}): stream '{name}' has no consumer")
+                producers[name] = idx
+                consumed.discard(name)
+    for name, idx in producers.items():
+        if name not in consumed:
+            errors.append(f"Task {idx + 1} ({tasks[idx].get('action')}): stream '{name}' has no consumer")
+    return errors
+
+def execution_order(tasks: List[Dict[str, Any]]) -> List[int]:
+    """Task indices with each streaming task moved to just before its consumer"""
+    order = []
+    deferred: Dict[str, int] = {}
+    for idx, task in enumerate(tasks):
+        if task.get('stream') and task.get('save_as'):
+            deferred[task['save_as']] = idx
+            continue
+        source = task.get('stream_from')
+        if source in deferred:
+            order.append(deferred.pop(source))
+        order.append(idx)
+    order.extend(sorted(deferred.values()))
+    return order
+
+class ChunkCounter:
+    """Iterate over chunks while counting them
+
+    An error raised by the underlying iterator is kept in ``error`` so the
+    producer's failure can be reported even if the consumer swallows it.
+    """
+
+    def __init__(self, chunks: Iterable):
+        self._chunks = iter(chunks)
+        self.chunks = 0
+        self.size = 0
+        self.error: Optional[BaseException] = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            chunk = next(self._chunks)
+        except StopIteration:
+            raise
+        except BaseException as e:
+            self.error = e
+            raise
+        self.chunks += 1
+        self.size += len(chunk)
+        return chunk
+
+    def summary(self) -> Dict[str, int]:
+        return {'chunks': self.chunks, 'size': self.size}
+
+class Channel:
+    """Bounded buffer between one producing and one consuming thread
+
+    Both ends of a task stream run in worker threads, so chunks never pass
+    through the event loop.  A full buffer blocks the producer and an empty
+    one blocks the consumer.  The consumer takes everything buffered at
+    once, and each side only wakes the other when it may be waiting, so a
+    fast stream costs one lock round trip per batch rather than per chunk.
+    Closing the channel or cancelling the waiting task's deadline wakes
+    both sides.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_BUFFER):
+        self.maxsize = maxsize
+        self.items: Deque[Any] = deque()
+        self.closed = False  # consumer has stopped reading
+        self._cond = threading.Condition()
+
+    def _wake(self) -> None:
+        with self._cond:
+            self._cond.notify_all()
+
+    def _wait(self, ready: Callable[[], bool]) -> None:
+        """Block until ``ready()`` (called with the lock held)
+
+        Raises StreamClosed once the consumer has stopped reading and
+        DeadlineExceededError once the current task's deadline ends.
+        """
+        if ready():
+            return
+        deadline = deadlines.current_deadline.get()
+        if deadline is not None:
+            deadline.add_callback(self._wake)
+        try:
+            while not ready():
+                if self.closed:
+                    raise StreamClosed("Stream consumer stopped reading")
+                if deadline is None:
+                    self._cond.wait()
+                else:
+                    deadline.check()
+                    self._cond.wait(deadline.time_left())
+        finally:
+            if deadline is not None:
+                deadline.remove_callback(self._wake)
+
+    def put(self, chunk: Any) -> None:
+        """Send a chunk, waiting while the buffer is full"""
+        with self._cond:
+            self._wait(lambda: self.closed or len(self.items) < self.maxsize)
+            if self.closed:
+                raise StreamClosed("Stream consumer stopped reading")
+            self.items.append(chunk)
+            if len(self.items) == 1:
+                self._cond.notify()  # the consumer may be waiting for data
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        """Mark the end of the stream (never blocks)"""
+        with self._cond:
+            if not self.closed:
+                self.items.append(error if error is not None else _EOS)
+                self._cond.notify()
+
+    def close(self) -> None:
+        """The consumer is done; unblock and stop the producer"""
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def __iter__(self) -> Iterator[Any]:
+        """Chunks for the consumer"""
+        while True:
+            with self._cond:
+                self._wait(lambda: bool(self.items))
+                batch, self.items = self.items, deque()
+                if len(batch) >= self.maxsize:
+                    self._cond.notify()  # the producer may be waiting for room
+            for item in batch:
+                if item is _EOS:
+                    return
+                if isinstance(item, BaseException):
+                    raise StreamError(f"Stream producer failed: {item}") from item
+                yield item
+
+def produce(task: Dict[str, Any], context: Dict[str, Any], channel: Channel) -> Dict[str, int]:
+    """Run a task's stream function into a channel (worker thread)"""
+    chunks = counter = None
+    try:
+        chunks = get_stream(task['action'])(task, context)
+        counter = ChunkCounter(chunks)
+        for chunk in counter:
+            channel.put(chunk)
+    except StreamClosed:
+        return counter.summary()
+    except BaseException as e:
+        channel.finish(e)
+        raise
+    finally:
+        close = getattr(chunks, 'close', None)  # release files and connections
+        if close is not None:
+            close()
+    channel.finish()
+    return counter.summary()
+
+def consume(task: Dict[str, Any], context: Dict[str, Any], chunks: Iterable) -> Any:
+    """Run a task's sink function over a chunk iterator"""
+    return get_sink(task['action'])(task, context, chunks)
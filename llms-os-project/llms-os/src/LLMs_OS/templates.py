@@ -0,0 +1,113 @@
+"""Template parsing and rendering for {{ var.path | default('x') }} expressions"""
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+TEMPLATE_RE = re.compile(r'\{\{\s*(.+?)\s*\}\}')
+DEFAULT_RE = re.compile(r"default\(['\"](.+?)['\"]\)")
+
+@lru_cache(maxsize=4096)
+def parse_expression(expr: str) -> Tuple[Tuple[str, ...], str]:
+    """Split 'var.attr | default('x')' into (('var', 'attr'), 'x')"""
+    expr = expr.strip()
+
+    # Handle default values: {{ var | default('value') }}
+    if '|' in expr:
+        var_part, default_part = expr.split('|', 1)
+        expr = var_part.strip()
+        default_match = DEFAULT_RE.search(default_part)
+        default_val = default_match.group(1) if default_match else ''
+    else:
+        default_val = ''
+
+    return tuple(expr.split('.')), default_val
+
+@lru_cache(maxsize=4096)
+def compile_template(text: str) -> Tuple[Tuple[str, Optional[Tuple]], ...]:
+    """Pre-parse a template into (literal, expression) segments
+
+    Each expression is (path, default, original_text) or None for the
+    trailing literal.
+    """
+    segments = []
+    pos = 0
+    for match in TEMPLATE_RE.finditer(text):
+        path, default_val = parse_expression(match.group(1))
+        segments.append((text[pos:match.start()], (path, default_val, match.group(0))))
+        pos = match.end()
+    segments.append((text[pos:], None))
+    return tuple(segments)
+
+def resolve_path(context: Dict[str, Any], path) -> Any:
+    """Navigate a dotted path (e.g. health_check.status_code); None if missing"""
+    value = context
+    for part in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+        if value is None:
+            return None
+    return value
+
+def render(text: str, context: Dict[str, Any]) -> str:
+    """Replace {{ ... }} expressions in text with values from context
+
+    Unresolved expressions without a default are left untouched.
+    """
+    if '{{' not in text:
+        return text
+
+    out = []
+    for literal, expr in compile_template(text):
+        out.append(literal)
+        if expr is None:
+            continue
+        path, default_val, original = expr
+        value = resolve_path(context, path)
+        if value is None:
+            out.append(default_val if default_val else original)
+        else:
+            out.append(str(value))
+    return ''.join(out)
+
+def find_paths(value: Any) -> Set[Tuple[str, ...]]:
+    """Collect every context path referenced by templates inside value"""
+    paths = set()
+    if isinstance(value, str):
+        if '{{' in value:
+            for _, expr in compile_template(value):
+                if expr is not None:
+                    paths.add(expr[0])
+    elif isinstance(value, dict):
+        for item in value.values():
+            paths |= find_paths(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            paths |= find_paths(item)
+    return paths
+
+def find_references(task: Dict[str, Any]) -> Set[str]:
+    """Names of context entries a task's templates refer to"""
+    return {path[0] for path in find_paths(task)}
+
+def project(value: Any, paths: List[Tuple[str, ...]]) -> Any:
+    """Keep only the given (relative) paths of a nested dict result
+
+    Values with a ``project_paths`` method (e.g. lazily decoded HTTP
+    responses) trim themselves.
+    """
+    if not isinstance(value, dict) or any(len(p) == 0 for p in paths):
+        return value
+    trim = getattr(value, 'project_paths', None)
+    if trim is not None:
+        return trim(paths)
+
+    grouped: Dict[str, List[Tuple[str, ...]]] = {}
+    for path in paths:
+        grouped.setdefault(path[0], []).append(path[1:])
+
+    return {
+        head: project(value[head], rests)
+        for head, rests in grouped.items()
+        if head in value
+    }
@@ -0,0 +1,64 @@
+"""Single entry point for outbound HTTP
+
+Actions send requests through :func:`request` rather than calling
+``requests`` directly, so that record/replay (:mod:`LLMs_OS.cassette`) and
+other transport-level features apply to every action in one place.
+
+Requests share one session, so connections to a host are pooled and reused
+across tasks (and can be opened ahead of time, see :mod:`LLMs_OS.prewarm`).
+The session keeps no cookies, like separate ``requests.request`` calls.
+"""
+import threading
+from collections.abc import Iterator
+from http.cookiejar import DefaultCookiePolicy
+from typing import Optional
+import requests
+from requests.adapters import HTTPAdapter
+from . import cassette, compression
+
+POOL_SIZE = 32  # kept-alive connections per host
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+def get_session() -> requests.Session:
+    """The process-wide session whose connection pools all requests share"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+                _session = session
+    return _session
+
+def request(method: str, url: str, compress=None, **kwargs) -> requests.Response:
+    """Send an HTTP request (same arguments as :func:`requests.request`)
+
+    ``compress`` is a task's ``compress`` setting for the request body (see
+    :mod:`LLMs_OS.compression`).  Body sizes are counted either way; a
+    streamed response is counted by whoever reads it.
+    """
+    encoding = compression.encoding_for(compress)
+    data = kwargs.get('data')
+    extra = {}
+    if isinstance(data, (bytes, str)):
+        body = data.encode('utf-8') if isinstance(data, str) else data
+        kwargs['data'], extra = compression.compress_body(body, encoding)
+    elif isinstance(data, Iterator):
+        kwargs['data'] = compression.compress_stream(data, encoding)
+        extra = {'Content-Encoding': encoding} if encoding else {}
+    if extra:
+        kwargs['headers'] = {**(kwargs.get('headers') or {}), **extra}
+
+    active = cassette.get_cassette()
+    if active is not None:
+        response = active.request(method, url, **kwargs)
+    else:
+        response = get_session().request(method, url, **kwargs)
+    if not kwargs.get('stream'):
+        compression.record_received(response, len(response.content))
+    return response
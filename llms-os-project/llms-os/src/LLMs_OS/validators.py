@@ -1,59 +1,269 @@
 """Input validation and sanitization"""
-import re
-from typing import Any, Dict, List
+from typing import Any, Dict, Hashable, List, Optional
+from jsonschema.validators import validator_for
+from .bulkheads import BULKHEADS_SCHEMA
+from .compression import compression_error
+from .conditions import condition_error
 from .exceptions import ValidationError
+from .loop_monitor import LOOP_MONITOR_SCHEMA
+from .output import OUTPUT_SCHEMA
+from .providers import PROVIDERS_SCHEMA
+from .registry import get_schema, list_actions, registry_version
+from .streams import stream_errors
+
+# Fields understood by the engine itself, valid on every task
+BASE_TASK_SCHEMA = {
+    'type': 'object',
+    'required': ['action'],
+    'properties': {
+        'action': {'type': 'string'},
+        'save_as': {'type': 'string'},
+        'parallel': {'type': 'boolean'},
+        'keep': {'type': 'boolean'},
+        'timeout': {'type': 'number', 'exclusiveMinimum': 0},
+        'continue_on_error': {'type': 'boolean'},
+        'cache': {'type': 'boolean'},
+        'stream': {'type': 'boolean'},
+        'stream_from': {'type': 'string', 'minLength': 1},
+        'stream_buffer': {'type': 'integer', 'minimum': 1},
+        'when': {'type': 'string'},
+        'select': {
+            'anyOf': [
+                {'type': 'string'},
+                {'type': 'array', 'items': {'type': 'string'}}
+            ]
+        },
+    }
+}
+
+# Workflow-level settings
+WORKFLOW_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'timeout': {'type': 'number', 'exclusiveMinimum': 0},
+        'fail_fast': {'type': 'boolean'},
+        'schedule': {'enum': ['auto', 'manual']},
+        'window': {'type': 'integer', 'minimum': 1},
+        'providers': PROVIDERS_SCHEMA,
+        'loop_monitor': LOOP_MONITOR_SCHEMA,
+        'bulkheads': BULKHEADS_SCHEMA,
+        'output': OUTPUT_SCHEMA,
+        'prewarm': {'type': 'boolean'},
+        'prune': {'type': 'boolean'},
+        'incremental': {
+            'anyOf': [
+                {'type': 'boolean'},
+                {'type': 'object', 'properties': {
+                    'dir': {'type': 'string'},
+                    'ttl': {'type': 'number', 'exclusiveMinimum': 0}
+                }}
+            ]
+        },
+        'context': {
+            'type': 'object',
+            'properties': {
+                'evict': {'type': 'boolean'},
+                'spill_threshold': {'type': ['integer', 'null'], 'minimum': 0},
+                'spill_dir': {'type': 'string'}
+            }
+        }
+    }
+}
+
+MAX_STRING_LENGTH = 10000
+MAX_CACHED_WORKFLOWS = 256
+
+def _compile(schema: Dict[str, Any]):
+    """Build a reusable validator object for a schema"""
+    cls = validator_for(schema)
+    cls.check_schema(schema)
+    return cls(schema)
+
+def _format_error(error) -> str:
+    """Render a jsonschema error as 'field.path: message'"""
+    path = '.'.join(str(part) for part in error.absolute_path)
+    return f"{path}: {error.message}" if path else error.message
 
 class TaskValidator:
     """Validate task configurations"""
-    
+
     REQUIRED_FIELDS = ['action']
     VALID_ACTIONS = None  # Populated from registry
-    
+
+    _base_validator = None
+    _compiled = {}  # action -> (schema, compiled validator)
+
     @classmethod
-    def validate(cls, task: Dict[str, Any]) -> bool:
-        """Validate a task dictionary"""
-        # Check required fields
-        for field in cls.REQUIRED_FIELDS:
-            if field not in task:
-                raise ValidationError(f"Missing required field: {field}")
-        
+    def refresh_actions(cls) -> None:
+        """Populate VALID_ACTIONS from the action registry"""
+        cls.VALID_ACTIONS = set(list_actions())
+
+    @classmethod
+    def get_validator(cls, action: str):
+        """Return the compiled validator for an action's schema (or None)"""
+        schema = get_schema(action)
+        if schema is None:
+            return None
+        cached = cls._compiled.get(action)
+        if cached is None or cached[0] is not schema:
+            cached = (schema, _compile(schema))
+            cls._compiled[action] = cached
+        return cached[1]
+
+    @classmethod
+    def collect_errors(cls, task: Any) -> List[str]:
+        """Return every problem found in a task (empty list if valid)"""
+        if cls._base_validator is None:
+            cls._base_validator = _compile(BASE_TASK_SCHEMA)
+
+        errors = [_format_error(e) for e in cls._base_validator.iter_errors(task)]
+        if errors or not isinstance(task, dict):
+            return errors
+
         # Validate action exists
         action = task.get('action')
         if cls.VALID_ACTIONS and action not in cls.VALID_ACTIONS:
-            raise ValidationError(f"Unknown action: {action}")
-        
-        # Sanitize string inputs
-        for key, value in task.items():
-            if isinstance(value, str):
-                task[key] = cls.sanitize_string(value)
-        
+            return [f"Unknown action: {action}"]
+
+        validator = cls.get_validator(action)
+        if validator is not None:
+            errors.extend(_format_error(e) for e in validator.iter_errors(task))
+        if 'when' in task:
+            error = condition_error(task['when'])
+            if error is not None:
+                errors.append(f"when: {error}")
+        if 'compress' in task:
+            error = compression_error(task['compress'])
+            if error is not None:
+                errors.append(f"compress: {error}")
+        return errors
+
+    @classmethod
+    def validate(cls, task: Dict[str, Any]) -> bool:
+        """Validate a task dictionary"""
+        errors = cls.collect_errors(task)
+        if errors:
+            raise ValidationError('; '.join(errors), errors=errors)
+
+        cls.sanitize(task)
         return True
-    
+
+    @classmethod
+    def sanitize(cls, value: Any) -> bool:
+        """Sanitize all strings in a (nested) task in place
+
+        Returns True if anything had to be changed.
+        """
+        changed = False
+        if isinstance(value, dict):
+            items = value.items()
+        elif isinstance(value, list):
+            items = enumerate(value)
+        else:
+            return False
+
+        for key, item in list(items):
+            if isinstance(item, str):
+                clean = cls.sanitize_string(item)
+                if clean != item:
+                    value[key] = clean
+                    changed = True
+            elif cls.sanitize(item):
+                changed = True
+        return changed
+
     @staticmethod
     def sanitize_string(value: str) -> str:
         """Remove potentially dangerous characters"""
         # Remove null bytes
         value = value.replace('\0', '')
         # Limit length
-        return value[:10000]
+        return value[:MAX_STRING_LENGTH]
 
 class WorkflowValidator:
     """Validate entire workflow"""
-    
+
+    # (source, registry version) -> whether its strings needed sanitizing
+    _validated: Dict[Hashable, bool] = {}
+    _workflow_validator = None
+
+    @classmethod
+    def settings_errors(cls, workflow: Dict[str, Any]) -> List[str]:
+        """Problems with the workflow-level settings (everything but tasks)"""
+        if cls._workflow_validator is None:
+            cls._workflow_validator = _compile(WORKFLOW_SCHEMA)
+        return [
+            f"Workflow: {_format_error(e)}"
+            for e in cls._workflow_validator.iter_errors(
+                {k: v for k, v in workflow.items() if k != 'tasks'}
+            )
+        ]
+
     @staticmethod
-    def validate(workflow: Dict[str, Any]) -> bool:
-        """Validate workflow structure"""
-        if 'tasks' not in workflow:
+    def task_errors(idx: int, task: Any) -> List[str]:
+        """Problems with one task, labelled with its 1-based position"""
+        action = task.get('action') if isinstance(task, dict) else None
+        label = f"Task {idx + 1} ({action})" if action else f"Task {idx + 1}"
+        return [f"{label}: {error}" for error in TaskValidator.collect_errors(task)]
+
+    @classmethod
+    def validate_settings(cls, workflow: Dict[str, Any]) -> bool:
+        """Validate only workflow-level settings (used for streamed runs)"""
+        TaskValidator.refresh_actions()
+        errors = cls.settings_errors(workflow)
+        if errors:
+            raise ValidationError('\n'.join(errors), errors=errors)
+        return True
+
+    @classmethod
+    def validate_task(cls, idx: int, task: Any) -> bool:
+        """Validate and sanitize a single streamed task"""
+        errors = cls.task_errors(idx, task)
+        if errors:
+            raise ValidationError('\n'.join(errors), errors=errors)
+        TaskValidator.sanitize(task)
+        return True
+
+    @classmethod
+    def validate(cls, workflow: Dict[str, Any], source: Optional[Hashable] = None) -> bool:
+        """Validate workflow structure
+
+        All task errors are collected and reported in a single
+        ValidationError.  ``source`` identifies where the workflow was
+        loaded from (see :func:`LLMs_OS.loader.load_workflow`: path, mtime
+        and size); a source that validated before, with the same actions
+        registered, skips schema validation entirely.
+        """
+        if not isinstance(workflow, dict) or 'tasks' not in workflow:
             raise ValidationError("Workflow must contain 'tasks' field")
-        
+
         tasks = workflow.get('tasks', [])
         if not isinstance(tasks, list):
             raise ValidationError("Tasks must be a list")
-        
+
+        key = (source, registry_version()) if source is not None else None
+        needs_sanitize = cls._validated.get(key) if key is not None else None
+        if needs_sanitize is not None:
+            if needs_sanitize:
+                TaskValidator.sanitize(tasks)
+            return True
+
+        TaskValidator.refresh_actions()
+        errors = cls.settings_errors(workflow)
         for idx, task in enumerate(tasks):
-            try:
-                TaskValidator.validate(task)
-            except ValidationError as e:
-                raise ValidationError(f"Task {idx + 1}: {e}")
-        
+            errors.extend(cls.task_errors(idx, task))
+        if not errors:
+            errors.extend(stream_errors(tasks))
+
+        if errors:
+            raise ValidationError(
+                f"Workflow has {len(errors)} error(s):\n  " + '\n  '.join(errors),
+                errors=errors
+            )
+
+        needs_sanitize = TaskValidator.sanitize(tasks)
+        if key is not None:
+            if len(cls._validated) >= MAX_CACHED_WORKFLOWS:
+                cls._validated.pop(next(iter(cls._validated)))
+            cls._validated[key] = needs_sanitize
         return True
@@ -0,0 +1,173 @@
+"""Memory-mapped vector store with a vectorised cosine-similarity index
+
+Vectors are L2-normalised and kept as rows of a float32 matrix in
+``<dir>/vectors.f32``.  The file is memory-mapped, so a large store costs
+page cache rather than heap.  It grows by doubling.  A search is one
+matrix-vector product over all rows.  Payloads (whatever the caller wants
+back for a row) are appended to ``<dir>/payloads.jsonl``, and
+``<dir>/meta.json`` records how many rows and payload bytes are complete.
+
+Several processes may share a store.  Writers hold an exclusive
+``flock`` on ``<dir>/lock`` and readers a shared one; under the lock each
+re-reads ``meta.json`` and picks up rows the others appended.  Without
+``fcntl`` (Windows) there is no cross-process locking, so a store must
+then have a single writing process.
+
+NumPy is needed only when a store is actually opened.
+"""
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+from . import codec
+
+try:
+    import numpy as np
+except ImportError:  # only needed once a store is opened
+    np = None
+
+try:
+    import fcntl
+except ImportError:  # no cross-process locking; one writer per store
+    fcntl = None
+
+INITIAL_CAPACITY = 1024
+
+class VectorStore:
+    """Append-only cosine index over float32 vectors stored on disk"""
+
+    def __init__(self, root: str, dim: int):
+        if np is None:
+            raise ImportError("NumPy is required for vector stores (pip install numpy)")
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._vectors_path = self.root / 'vectors.f32'
+        self._payloads_path = self.root / 'payloads.jsonl'
+        self._meta_path = self.root / 'meta.json'
+        self._lock_path = self.root / 'lock'
+        self._lock = threading.Lock()
+        self.dim = dim
+        self.count = 0
+        self.payloads: List[Any] = []
+        self._payload_bytes = 0
+
+        with self._locked(exclusive=True):
+            meta = self._read_meta()
+            if meta['dim'] != dim:
+                raise ValueError(f"Vector store {root} has dimension {meta['dim']}, not {dim}")
+            self._map(max(INITIAL_CAPACITY, meta['count'], self._file_capacity()))
+            self._catch_up(meta)
+
+    @contextmanager
+    def _locked(self, exclusive: bool) -> Iterator[None]:
+        """Hold the store's file lock (shared for readers)"""
+        if fcntl is None:
+            yield
+            return
+        with open(self._lock_path, 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _read_meta(self) -> Dict[str, Any]:
+        if not self._meta_path.exists():
+            return {'dim': self.dim, 'count': 0, 'payload_bytes': 0}
+        return json.loads(self._meta_path.read_text())
+
+    def _write_meta(self) -> None:
+        partial = self._meta_path.with_name('meta.json.part')
+        partial.write_text(json.dumps({'dim': self.dim, 'count': self.count,
+                                       'payload_bytes': self._payload_bytes}))
+        os.replace(partial, self._meta_path)
+
+    def _file_capacity(self) -> int:
+        if not self._vectors_path.exists():
+            return 0
+        return os.path.getsize(self._vectors_path) // (4 * self.dim)
+
+    def _catch_up(self, meta: Dict[str, Any]) -> None:
+        """Pick up rows appended (by any process) since this one last looked"""
+        count, size = meta['count'], meta['payload_bytes']
+        if count == self.count:
+            return
+        if count > self.capacity:
+            self._map(max(count, self._file_capacity()))
+        with open(self._payloads_path, 'rb') as f:
+            f.seek(self._payload_bytes)
+            data = f.read(size - self._payload_bytes)
+        self.payloads.extend(codec.loads(line) for line in data.splitlines() if line.strip())
+        self.count, self._payload_bytes = count, size
+
+    def _map(self, capacity: int) -> None:
+        size = capacity * self.dim * 4
+        with open(self._vectors_path, 'ab') as f:
+            if f.tell() < size:
+                f.truncate(size)
+        self.capacity = capacity
+        self.matrix = np.memmap(self._vectors_path, dtype=np.float32, mode='r+',
+                                shape=(capacity, self.dim))
+
+    def __len__(self) -> int:
+        return self.count
+
+    @staticmethod
+    def normalise(vectors) -> 'np.ndarray':
+        matrix = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def add(self, vectors: Sequence[Sequence[float]], payloads: Sequence[Any]) -> None:
+        """Append vectors with one payload each"""
+        matrix = self.normalise(vectors)
+        if matrix.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-dimensional vectors, got {matrix.shape[1]}")
+        with self._lock, self._locked(exclusive=True):
+            self._catch_up(self._read_meta())
+            end = self.count + len(matrix)
+            if end > self.capacity:
+                self.matrix.flush()
+                capacity = self.capacity
+                while capacity < end:
+                    capacity *= 2
+                self._map(capacity)
+            self.matrix[self.count:end] = matrix
+            self.matrix.flush()
+            with open(self._payloads_path, 'ab') as f:
+                f.truncate(self._payload_bytes)  # drop a write that never reached meta.json
+                for payload in payloads:
+                    f.write(codec.dumps(payload) + b'\n')
+                self._payload_bytes = f.tell()
+            self.payloads.extend(payloads)
+            self.count = end
+            self._write_meta()
+
+    def search(self, vector: Sequence[float], k: int = 1) -> List[Tuple[float, int, Any]]:
+        """The ``k`` most similar rows as (cosine similarity, row, payload)"""
+        query = self.normalise(vector)[0]
+        with self._lock, self._locked(exclusive=False):
+            self._catch_up(self._read_meta())
+            count = self.count
+            if not count:
+                return []
+            scores = self.matrix[:count] @ query
+        k = min(k, count)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), int(i), self.payloads[i]) for i in top]
+
+_stores: Dict[Tuple[str, int], VectorStore] = {}
+_stores_lock = threading.Lock()
+
+def open_store(root: str, dim: int) -> VectorStore:
+    """Open (once per process) the vector store at ``root``"""
+    key = (str(Path(root).resolve()), dim)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = VectorStore(root, dim)
+        return store
@@ -1 +1,352 @@
+"""Tests for the built-in actions against a local HTTP server"""
+import gzip
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from prometheus_client import REGISTRY
+import LLMs_OS.actions
+from LLMs_OS import prewarm
+from LLMs_OS.actions.http_request import LazyResponse
+from LLMs_OS.cassette import use_cassette
+from LLMs_OS.deadlines import Deadline, current_deadline
+from LLMs_OS.exceptions import CassetteMissError, DeadlineExceededError
+from LLMs_OS.providers import CircuitBreaker, Endpoint, ProviderPool, use_providers
+from LLMs_OS.pruning import unused_tasks
+from LLMs_OS.registry import get_action, is_pure
+from LLMs_OS.semantic_cache import use_workflow
+from LLMs_OS.vectors import VectorStore
 
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _serve(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        self.server.requests.append((self.command, self.path, dict(self.headers), body))
+        route = self.server.routes.get((self.command, self.path.split('?')[0]))
+        if route is None:
+            status, headers, payload = 404, {}, b'not found'
+        else:
+            status, headers, payload = route(self, body) if callable(route) else route
+        if isinstance(payload, (dict, list)):
+            payload = json.dumps(payload).encode()
+            headers = {'Content-Type': 'application/json', **headers}
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(payload)
+
+    do_GET = do_POST = do_PUT = do_DELETE = do_HEAD = _serve
+
+@pytest.fixture
+def server():
+    """Local HTTP server; set ``server.routes[(method, path)]`` per test"""
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    httpd.routes = {}
+    httpd.requests = []
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    thread = threading.Thread(target=httpd.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+def run(action, task, context=None):
+    return get_action(action)(task, context if context is not None else {})
+
+def metric(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+# HTTP bodies
+
+def test_http_request_keeps_raw_body_and_decodes_lazily(server):
+    server.routes[('GET', '/data')] = (200, {}, {'items': [1, 2]})
+    result = run('http_request', {'url': server.url + '/data'})
+    assert isinstance(result, LazyResponse)
+    assert result['status_code'] == 200
+    assert result['body'] == b'{"items": [1, 2]}'
+    assert not dict.__contains__(result, 'json')
+    assert result['json'] == {'items': [1, 2]}
+    assert result['content'] == '{"items": [1, 2]}'
+
+def test_http_request_streams_downloads_to_disk(server, tmp_path):
+    payload = b'x' * 300000
+    server.routes[('GET', '/file')] = (200, {}, payload)
+    target = tmp_path / 'out' / 'file.bin'
+    result = run('http_request', {'url': server.url + '/file', 'stream_to': str(target),
+                                  'checksum': 'sha256', 'chunk_size': 4096})
+    assert target.read_bytes() == payload
+    assert result['bytes'] == len(payload)
+    assert result['checksum'] == hashlib.sha256(payload).hexdigest()
+
+def test_http_request_enforces_max_bytes_without_leaving_partial_files(server, tmp_path):
+    server.routes[('GET', '/file')] = (200, {}, b'x' * 10000)
+    target = tmp_path / 'file.bin'
+    result = run('http_request', {'url': server.url + '/file', 'stream_to': str(target),
+                                  'max_bytes': 1000})
+    assert result is None
+    assert list(tmp_path.iterdir()) == []
+
+# Retries and hedging
+
+def sequence(*responses):
+    """Route answering with each response in turn (the last one repeats)"""
+    calls = []
+
+    def route(handler, body):
+        calls.append(time.monotonic())
+        response = responses[min(len(calls), len(responses)) - 1]
+        return response(handler) if callable(response) else response
+    return route
+
+def test_retry_recovers_from_server_errors(server):
+    server.routes[('GET', '/flaky')] = sequence((503, {}, b'busy'), (503, {}, b'busy'), (200, {}, b'ok'))
+    url = server.url + '/flaky'
+    before = metric('llms_os_request_retries_total', endpoint=url, reason='503')
+    result = run('http_request', {'url': url, 'retry': {'attempts': 3, 'backoff': 0}})
+    assert result['status_code'] == 200
+    assert len(server.requests) == 3
+    assert metric('llms_os_request_retries_total', endpoint=url, reason='503') == before + 2
+
+def test_retry_gives_up_after_the_last_attempt(server):
+    server.routes[('GET', '/down')] = (500, {}, b'error')
+    result = run('http_request', {'url': server.url + '/down', 'retry': {'attempts': 2, 'backoff': 0}})
+    assert result['status_code'] == 500
+    assert len(server.requests) == 2
+
+def test_hedged_request_returns_the_faster_attempt(server):
+    release, answered = threading.Event(), []
+
+    def slow(handler):
+        release.wait(10)
+        answered.append('slow')
+        return 200, {}, b'slow'
+    server.routes[('GET', '/hedge')] = sequence(slow, (200, {}, b'fast'))
+    url = server.url + '/hedge'
+    before = metric('llms_os_hedged_requests_total', endpoint=url, winner='backup')
+    try:
+        result = run('http_request', {'url': url, 'hedge': {'after': 0.05}})
+        assert answered == []  # returned while the first attempt was still held
+    finally:
+        release.set()
+    assert result['content'] == 'fast'
+    assert metric('llms_os_hedged_requests_total', endpoint=url, winner='backup') == before + 1
+
+# Deadlines
+
+def test_http_request_fails_when_its_deadline_expires(server):
+    def slow(handler, body):
+        time.sleep(1)
+        return 200, {}, b'late'
+    server.routes[('GET', '/slow')] = slow
+    token = current_deadline.set(Deadline(0.2))
+    try:
+        with pytest.raises(DeadlineExceededError):
+            run('http_request', {'url': server.url + '/slow'})
+    finally:
+        current_deadline.reset(token)
+
+# Provider routing
+
+def test_circuit_breaker_ejects_probes_and_recovers():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.available()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.available()
+    breaker.opened_at -= 30  # the reset timeout has passed
+    assert breaker.available() and breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.available()  # one probe at a time
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.available()
+    breaker.opened_at -= 30
+    assert breaker.available()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.available()
+
+def test_pool_prefers_fast_endpoints_until_they_queue_up():
+    slow, fast = Endpoint('http://slow.invalid'), Endpoint('http://fast.invalid')
+    slow.latency, fast.latency = 1.0, 0.1
+    pool = ProviderPool([slow, fast])
+    assert pool.acquire('m') is fast
+    fast.outstanding = 20
+    assert pool.acquire('m') is slow
+
+def test_pool_can_route_by_outstanding_requests_and_skips_open_circuits():
+    a, b, c = (Endpoint(f'http://{name}.invalid') for name in 'abc')
+    a.latency, b.latency, c.latency = 0.1, 1.0, 1.0
+    pool = ProviderPool([a, b, c], strategy='least_outstanding')
+    a.outstanding, b.outstanding = 2, 1
+    c.breaker = CircuitBreaker(failure_threshold=1)
+    c.breaker.record_failure()
+    assert pool.acquire('m') is b
+    assert [e.outstanding for e in (a, b, c)] == [2, 2, 0]
+
+# Record and replay
+
+def test_cassette_replays_recorded_responses_without_the_network(server, tmp_path):
+    server.routes[('GET', '/data')] = (200, {'X-Id': '1'}, {'n': 1})
+    path = str(tmp_path / 'run.cassette')
+    with use_cassette(path, 'record'):
+        recorded = run('http_request', {'url': server.url + '/data'})
+    server.routes[('GET', '/data')] = (500, {}, b'changed')
+    with use_cassette(path, 'replay', 'zero'):
+        replayed = run('http_request', {'url': server.url + '/data'})
+    assert replayed['status_code'] == 200
+    assert replayed['json'] == recorded['json'] == {'n': 1}
+    assert replayed['headers']['x-id'] == '1'
+    assert len(server.requests) == 1
+
+def test_cassette_miss_fails_the_task(server, tmp_path):
+    path = str(tmp_path / 'run.cassette')
+    with use_cassette(path, 'record'):
+        pass
+    with use_cassette(path, 'replay', 'zero'):
+        with pytest.raises(CassetteMissError):
+            run('http_request', {'url': server.url + '/unrecorded'})
+    assert server.requests == []
+
+def test_cassette_miss_does_not_count_against_the_endpoint(tmp_path):
+    path = str(tmp_path / 'run.cassette')
+    with use_cassette(path, 'record'):
+        pass
+    endpoint = Endpoint('http://llm.invalid/v1', 'key', breaker=CircuitBreaker(failure_threshold=1))
+    pool = ProviderPool([endpoint])
+    with use_cassette(path, 'replay', 'zero'):
+        for _ in range(3):
+            with pytest.raises(CassetteMissError):
+                pool.post('model', '/chat/completions', b'{}', timeout=1)
+    assert endpoint.failures == 0 and endpoint.outstanding == 0
+    assert endpoint.breaker.state == CircuitBreaker.CLOSED
+
+# Embeddings, vector stores and the semantic cache
+
+def test_embeddings_are_sent_in_batches_and_kept_in_input_order(server, tmp_path):
+    def embeddings(handler, body):
+        inputs = json.loads(body)['input']
+        data = [{'index': i, 'embedding': [1.0, float(text[1:])]} for i, text in enumerate(inputs)]
+        return 200, {}, {'data': data[::-1]}
+    server.routes[('POST', '/v1/embeddings')] = embeddings
+    texts = [f't{n}' for n in range(5)]
+    task = {'action': 'embeddings', 'input': texts, 'batch_size': 2, 'store': str(tmp_path)}
+    with use_providers({'endpoints': [{'url': server.url + '/v1', 'key': 'k'}]}):
+        result = run('embeddings', task)
+    batches = [json.loads(r[3])['input'] for r in server.requests]
+    assert batches == [['t0', 't1'], ['t2', 't3'], ['t4']]
+    assert result['count'] == 5 and result['dimensions'] == 2
+    assert [vector[1] for vector in result['embeddings']] == [0.0, 1.0, 2.0, 3.0, 4.0]
+    assert VectorStore(str(tmp_path), 2).payloads == [{'text': text} for text in texts]
+
+def test_semantic_cache_answers_similar_prompts_with_the_stored_text(server, tmp_path):
+    def embeddings(handler, body):
+        inputs = json.loads(body)['input']
+        return 200, {}, {'data': [{'index': i, 'embedding': [1.0, 0.0, 0.1]} for i in range(len(inputs))]}
+    server.routes[('POST', '/v1/embeddings')] = embeddings
+    server.routes[('POST', '/v1/chat/completions')] = (200, {}, {
+        'id': 'cmpl-1', 'choices': [{'message': {'role': 'assistant', 'content': 'Paris'}}]
+    })
+    task = {'action': 'chat_completion', 'messages': [{'role': 'user', 'content': 'Capital of France?'}],
+            'semantic_cache': {'dir': str(tmp_path)}}
+    with use_providers({'endpoints': [{'url': server.url + '/v1', 'key': 'k'}]}):
+        first = run('chat_completion', task)
+        second = run('chat_completion', task)
+    assert first['full_response']['id'] == 'cmpl-1'
+    assert second == {'content': 'Paris'}
+    chats = [r for r in server.requests if r[1] == '/v1/chat/completions']
+    assert len(chats) == 1
+    payloads = b''.join(p.read_bytes() for p in tmp_path.rglob('payloads.jsonl'))
+    assert b'Paris' in payloads and b'full_response' not in payloads
+
+def test_semantic_cache_defaults_to_a_directory_beside_the_workflow(server, tmp_path, monkeypatch):
+    server.routes[('POST', '/v1/embeddings')] = (200, {}, {'data': [{'index': 0, 'embedding': [1.0, 0.0]}]})
+    server.routes[('POST', '/v1/chat/completions')] = (200, {}, {
+        'choices': [{'message': {'role': 'assistant', 'content': 'hello'}}]
+    })
+    elsewhere = tmp_path / 'cwd'
+    elsewhere.mkdir()
+    monkeypatch.chdir(elsewhere)
+    task = {'action': 'chat_completion', 'messages': [{'role': 'user', 'content': 'hi'}],
+            'semantic_cache': True}
+    with use_workflow(str(tmp_path / 'flows' / 'chat.yaml')), \
+            use_providers({'endpoints': [{'url': server.url + '/v1', 'key': 'k'}]}):
+        run('chat_completion', task)
+    assert list((tmp_path / 'flows' / '.llms_os_cache' / 'semantic').rglob('payloads.jsonl'))
+    assert list(elsewhere.iterdir()) == []
+
+def test_semantic_cache_writes_keep_chat_completions_from_being_pruned():
+    messages = [{'role': 'user', 'content': 'hi'}]
+    plain = {'action': 'chat_completion', 'messages': messages, 'save_as': 'a'}
+    cached = {**plain, 'semantic_cache': {'dir': 'cache'}}
+    assert is_pure(plain) and not is_pure(cached)
+    assert unused_tasks([plain, cached]) == {0}
+
+def test_vector_store_writers_sharing_a_directory_keep_rows_and_payloads_aligned(tmp_path):
+    stores = [VectorStore(str(tmp_path), 2) for _ in range(2)]
+
+    def write(store, first):
+        for n in range(first, first + 40):
+            store.add([[1.0, float(n)]], [n])
+    threads = [threading.Thread(target=write, args=(store, 100 * i)) for i, store in enumerate(stores)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    reopened = VectorStore(str(tmp_path), 2)
+    assert len(reopened) == 80
+    assert sorted(reopened.payloads) == list(range(40)) + list(range(100, 140))
+    for row, n in enumerate(reopened.payloads):
+        assert reopened.matrix[row][1] / reopened.matrix[row][0] == pytest.approx(n)
+    assert stores[1].search([1.0, 0.0])[0][2] == 0
+
+# Compression
+
+def test_http_request_compresses_bodies_and_decodes_compressed_responses(server):
+    answer = json.dumps({'echo': 'y' * 5000}).encode()
+    packed = gzip.compress(answer)
+    gzipped_json = {'Content-Encoding': 'gzip', 'Content-Type': 'application/json'}
+    server.routes[('POST', '/gzip')] = (200, gzipped_json, packed)
+    data = {'text': 'x' * 5000}
+    counters = [('llms_os_http_body_bytes_total', 'sent'), ('llms_os_http_wire_bytes_total', 'sent'),
+                ('llms_os_http_body_bytes_total', 'received'), ('llms_os_http_wire_bytes_total', 'received')]
+    before = [metric(name, direction=direction, encoding='gzip') for name, direction in counters]
+
+    result = run('http_request', {'url': server.url + '/gzip', 'method': 'POST', 'data': data,
+                                  'compress': 'gzip'})
+    _, _, headers, wire = server.requests[-1]
+    assert headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(wire)) == data
+    assert len(wire) < 1000
+    assert result['json'] == {'echo': 'y' * 5000}
+
+    after = [metric(name, direction=direction, encoding='gzip') for name, direction in counters]
+    assert [a - b for a, b in zip(after, before)] == [len(gzip.decompress(wire)), len(wire),
+                                                      len(answer), len(packed)]
+
+# Connection pre-warming
+
+def test_prewarm_opens_connections_that_later_requests_reuse(server):
+    peers = {}
+
+    def route(handler, body):
+        peers.setdefault(handler.command, []).append(handler.client_address)
+        return 200, {}, b'ok'
+    server.routes[('HEAD', '/')] = server.routes[('GET', '/data')] = route
+    url = server.url + '/data'
+    before = metric('llms_os_connection_prewarm_total', host=server.url, outcome='opened')
+    workflow = {'tasks': [{'action': 'http_request', 'url': url}] * 2}
+    for thread in prewarm.start(workflow):
+        thread.join()
+    assert len(set(peers['HEAD'])) == 2
+    assert metric('llms_os_connection_prewarm_total', host=server.url, outcome='opened') == before + 2
+    run('http_request', {'url': url})
+    assert peers['GET'][0] in peers['HEAD']
@@ -1 +1,707 @@
+"""Tests for the workflow engines and their supporting modules"""
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+import pytest
+import yaml
+from prometheus_client import REGISTRY
+import LLMs_OS.actions
+from LLMs_OS import codec, compression, loader, output, prewarm
+from LLMs_OS.actions.http_request import LazyResponse
+from LLMs_OS.async_core import AsyncExecutor, execute_yaml_async, run_async
+from LLMs_OS.cli import main
+from LLMs_OS.conditions import condition_error
+from LLMs_OS.context import ContextPlan, WorkflowContext
+from LLMs_OS.core import execute_yaml
+from LLMs_OS.deadlines import Deadline, current_deadline, sleep
+from LLMs_OS.exceptions import DeadlineExceededError, StreamClosed, ValidationError
+from LLMs_OS.graph import TaskGraph
+from LLMs_OS.incremental import IncrementalCache, ResultStore
+from LLMs_OS.loader import load_workflow
+from LLMs_OS.profiling import Profiler
+from LLMs_OS.providers import get_pool
+from LLMs_OS.pruning import report, unused_tasks
+from LLMs_OS.registry import register
+from LLMs_OS.streams import Channel
+from LLMs_OS.templates import project, render
+from LLMs_OS.validators import WorkflowValidator
 
+def write_workflow(path, tasks, **settings):
+    path.write_text(yaml.safe_dump({**settings, 'tasks': tasks}))
+    return str(path)
+
+# Validation
+
+def test_validation_reports_every_error_at_once():
+    workflow = {'tasks': [
+        {'action': 'chat_completion', 'messages': 'not a list'},
+        {'action': 'no_such_action'},
+        {'action': 'print_message', 'timeout': -1},
+    ]}
+    with pytest.raises(ValidationError) as raised:
+        WorkflowValidator.validate(workflow)
+    assert len(raised.value.errors) == 3
+
+def test_validation_cache_skips_unchanged_files(tmp_path, monkeypatch):
+    path = write_workflow(tmp_path / 'wf.yaml', [{'action': 'print_message', 'message': 'hi'}])
+    calls = []
+    original = WorkflowValidator.task_errors
+    monkeypatch.setattr(WorkflowValidator, 'task_errors',
+                        staticmethod(lambda idx, task: calls.append(idx) or original(idx, task)))
+
+    load_workflow(path)
+    load_workflow(path)
+    assert calls == [0]  # second load was a cache hit
+
+    write_workflow(tmp_path / 'wf.yaml', [{'action': 'print_message', 'message': 'changed'}])
+    load_workflow(path)
+    assert calls == [0, 0]
+
+    register('test_noop')(lambda task, context: None)  # schemas may have changed
+    load_workflow(path)
+    assert calls == [0, 0, 0]
+
+def test_validation_cache_still_sanitizes(tmp_path):
+    path = write_workflow(tmp_path / 'wf.yaml', [{'action': 'print_message', 'message': 'a\0b'}])
+    for _ in range(2):
+        assert load_workflow(path)['tasks'][0]['message'] == 'ab'
+
+# Context eviction and spilling
+
+def run_plan(plan, tasks, results):
+    """Save and release tasks in order, recording what the context holds"""
+    context = plan.new_context()
+    seen = []
+    for index, task in enumerate(tasks):
+        plan.save(index, task, results.get(index), context)
+        plan.release(index, context)
+        seen.append(set(context))
+    return context, seen
+
+def test_context_evicts_results_after_their_last_reader():
+    tasks = [
+        {'action': 'file_read', 'path': 'a', 'save_as': 'a'},
+        {'action': 'print_message', 'message': '{{ a.content }}'},
+        {'action': 'print_message', 'message': 'done'},
+    ]
+    _, seen = run_plan(ContextPlan(tasks), tasks, {0: {'content': 'x', 'other': 'y'}})
+    assert seen == [{'a'}, set(), set()]
+
+def test_context_projects_results_to_used_fields():
+    tasks = [
+        {'action': 'file_read', 'path': 'a', 'save_as': 'a'},
+        {'action': 'print_message', 'message': '{{ a.content }}'},
+    ]
+    plan = ContextPlan(tasks)
+    context = plan.new_context()
+    plan.save(0, tasks[0], {'content': 'x', 'other': 'y'}, context)
+    assert context['a'] == {'content': 'x'}
+
+@pytest.mark.parametrize('select, kept', [
+    ('content', {'content': 'x'}),
+    (['content', 'full_response.id'], {'content': 'x', 'full_response': {'id': 'c1'}}),
+])
+def test_select_projects_results_to_the_listed_paths(select, kept):
+    task = {'action': 'chat_completion', 'messages': [], 'save_as': 'a', 'select': select}
+    plan = ContextPlan([task])
+    context = plan.new_context()
+    plan.save(0, task, {'content': 'x', 'full_response': {'id': 'c1', 'choices': []}}, context)
+    assert context['a'] == kept
+
+def test_context_keeps_everything_for_undeclared_direct_readers():
+    register('test_reads_context')(lambda task, context: context['a'])
+    tasks = [
+        {'action': 'file_read', 'path': 'a', 'save_as': 'a'},
+        {'action': 'print_message', 'message': 'between'},
+        {'action': 'test_reads_context'},
+    ]
+    plan = ContextPlan(tasks)
+    context, seen = run_plan(plan, tasks[:2], {0: {'content': 'x', 'other': 'y'}})
+    assert seen == [{'a'}, {'a'}]
+    assert context['a'] == {'content': 'x', 'other': 'y'}  # not trimmed
+    plan.release(2, context)
+    assert 'a' not in context
+
+def test_context_spills_large_values_to_disk(tmp_path):
+    context = WorkflowContext(spill_threshold=100, spill_dir=str(tmp_path))
+    context['big'] = {'content': 'x' * 1000}
+    context['small'] = {'content': 'x'}
+    assert context.is_spilled('big') and not context.is_spilled('small')
+    assert context['big'] == {'content': 'x' * 1000}
+    context.close()
+    assert not list(tmp_path.rglob('*.pkl'))
+
+def test_projection_keeps_http_bodies_undecoded():
+    response = LazyResponse(200, {'content-type': 'application/json'}, b'{"x": 1}')
+    trimmed = project(response, [('json', 'x')])
+    assert not dict.__contains__(trimmed, 'json')  # still lazy
+    assert trimmed['json'] == {'x': 1}
+    assert project(response, [('status_code',)]) == {'status_code': 200}
+
+# Deadlines
+
+@register('test_sleep')
+def _test_sleep(task, context):
+    sleep(task.get('seconds', 5))
+    return {'slept': True}
+
+@pytest.mark.parametrize('engine', ['sync', 'async'])
+def test_workflow_timeout_stops_a_running_task(tmp_path, engine):
+    path = write_workflow(tmp_path / 'wf.yaml', [{'action': 'test_sleep', 'seconds': 60}], timeout=0.2)
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceededError):
+        if engine == 'sync':
+            execute_yaml(path)
+        else:
+            run_async(execute_yaml_async(path))
+    assert time.monotonic() - started < 30  # interrupted, not slept out
+
+def test_task_timeout_with_continue_on_error_lets_the_run_go_on(tmp_path):
+    out = tmp_path / 'out.txt'
+    path = write_workflow(tmp_path / 'wf.yaml', [
+        {'action': 'test_sleep', 'timeout': 0.1, 'continue_on_error': True},
+        {'action': 'file_write', 'path': str(out), 'content': 'after'},
+    ])
+    run_async(execute_yaml_async(path))
+    assert out.read_text() == 'after'
+
+# Provider pools
+
+def test_runs_with_the_same_providers_share_a_pool(tmp_path):
+    seen = []
+    register('test_record_pool')(lambda task, context: seen.append(get_pool()))
+    for url in ('http://a.invalid', 'http://a.invalid', 'http://b.invalid'):
+        path = write_workflow(tmp_path / 'wf.yaml', [{'action': 'test_record_pool'}],
+                              providers={'endpoints': [{'url': url, 'key': 'k'}]}, prewarm=False)
+        run_async(execute_yaml_async(path))
+    assert seen[0] is seen[1]  # breakers and latency carry over between runs
+    assert [e.url for e in seen[2].endpoints] == ['http://b.invalid']
+    assert get_pool() not in seen  # outside a run the environment's pool applies
+
+def test_concurrent_runs_keep_their_own_output_settings(tmp_path, capsys):
+    meet = threading.Barrier(2)
+    register('test_meet')(lambda task, context: meet.wait(5) and None)
+    runs = []
+    for name, settings in (('a', {'output': {'level': 'error'}}), ('b', {})):
+        path = write_workflow(tmp_path / f'{name}.yaml', [
+            {'action': 'print_message', 'message': f'{name}-before'},
+            {'action': 'test_meet'},
+            {'action': 'print_message', 'message': f'{name}-after'},
+        ], **settings)
+        runs.append(in_thread(lambda path=path: execute_yaml(path)))
+    for run in runs:
+        run['thread'].join(10)
+        assert 'error' not in run
+    out = capsys.readouterr().out
+    assert 'b-before' in out and 'b-after' in out
+    assert 'a-before' not in out and 'a-after' not in out
+
+# Incremental re-execution
+
+def test_incremental_rerun_reuses_unchanged_results(tmp_path):
+    calls = []
+    register('test_count', pure=True, reads=())(
+        lambda task, context: calls.append(task['value']) or {'value': task['value']})
+    seen = []
+    register('test_collect', reads=())(lambda task, context: seen.append(render(task['text'], context)))
+
+    def run_with(value):
+        path = write_workflow(tmp_path / 'wf.yaml', [
+            {'action': 'test_count', 'value': value, 'save_as': 'n'},
+            {'action': 'test_collect', 'text': '{{ n.value }}'},
+        ], incremental={'dir': str(tmp_path / 'cache')})
+        execute_yaml(path)
+        return seen[-1]
+
+    assert run_with(1) == '1'
+    assert run_with(1) == '1'
+    assert calls == [1]  # second run reused the stored result
+    assert run_with(2) == '2'
+    assert calls == [1, 2]
+
+def test_incremental_memoises_network_actions_only_on_request(tmp_path):
+    memo = IncrementalCache(ResultStore(str(tmp_path)))
+    get = {'action': 'http_request', 'url': 'http://example.invalid/'}
+    assert memo.should_cache({'action': 'file_read', 'path': 'x'})
+    assert not memo.should_cache(get)
+    assert not memo.should_cache({'action': 'chat_completion', 'messages': []})
+    assert memo.should_cache({**get, 'cache': True})
+
+def test_incremental_results_expire_after_ttl(tmp_path):
+    memo = IncrementalCache(ResultStore(str(tmp_path), ttl=60))
+    task = {'action': 'file_read', 'path': str(tmp_path / 'missing.txt')}
+    memo.store_result(memo.fingerprint(task), {'content': 'x'})
+    assert memo.lookup(task)[1] == {'content': 'x'}
+    old = time.time() - 120
+    os.utime(memo.store._path(memo.fingerprint(task)), (old, old))
+    assert memo.lookup(task)[1] is None
+
+# Dependency scheduling
+
+_overlap = {'active': 0, 'peak': 0, 'all_in': threading.Event(), 'lock': threading.Lock()}
+
+@register('test_overlap', pure=True, reads=())
+def _test_overlap(task, context):
+    """Wait (briefly) until ``task['of']`` of these tasks are running at once"""
+    with _overlap['lock']:
+        _overlap['active'] += 1
+        _overlap['peak'] = max(_overlap['peak'], _overlap['active'])
+        if _overlap['active'] == task['of']:
+            _overlap['all_in'].set()
+    _overlap['all_in'].wait(0.5)
+    with _overlap['lock']:
+        _overlap['active'] -= 1
+    return {'done': True}
+
+@pytest.mark.parametrize('flags, concurrent', [([], True), (['--async'], True), (['--sync'], False)])
+def test_cli_schedules_independent_tasks_concurrently_by_default(tmp_path, monkeypatch, flags, concurrent):
+    _overlap.update(active=0, peak=0, all_in=threading.Event())
+    path = write_workflow(tmp_path / 'wf.yaml', [{'action': 'test_overlap', 'of': 3}] * 3,
+                          prune=False)
+    monkeypatch.setattr('sys.argv', ['llms-os', *flags, path])
+    assert main() == 0
+    assert (_overlap['peak'] > 1) == concurrent
+
+# Streamed runs
+
+def write_jsonl(path, tasks, **settings):
+    path.write_text('\n'.join(json.dumps(line) for line in [settings, *tasks]))
+    return str(path)
+
+@pytest.mark.parametrize('engine', ['sync', 'async'])
+def test_streamed_run_keeps_only_recent_results(tmp_path, engine):
+    held, values = [], {}
+
+    @register('test_chain', reads=())
+    def chain(task, context):
+        held.append(len(context))
+        previous = render(task['previous'], context)
+        values[task['save_as']] = int(previous) + 1 if previous.isdigit() else 1
+        return {'value': values[task['save_as']]}
+
+    tasks = [{'action': 'test_chain', 'previous': f'{{{{ r{i - 1}.value }}}}', 'save_as': f'r{i}'}
+             for i in range(300)]
+    tasks.append({'action': 'test_chain', 'previous': '{{ r299.value }}', 'save_as': 'last', 'keep': True})
+    tasks.append({'action': 'test_chain', 'previous': '{{ r0.value }}', 'save_as': 'stale'})
+    path = write_jsonl(tmp_path / 'wf.jsonl', tasks, window=8, prune=False)
+    if engine == 'sync':
+        execute_yaml(path)
+    else:
+        run_async(execute_yaml_async(path))
+    assert values['last'] == 301  # every link of the chain saw its predecessor
+    assert values['stale'] == 1  # r0 had left the window
+    assert max(held) <= 10
+
+def test_streamed_plan_drops_results_that_left_the_window():
+    plan = ContextPlan([], window=2)
+    evicted = []
+    plan.on_evict = evicted.append
+    context = plan.new_context()
+    tasks = [
+        {'action': 'file_read', 'path': 'a', 'save_as': 'a'},
+        {'action': 'print_message', 'message': '{{ a.content }}'},  # slow reader
+        {'action': 'file_read', 'path': 'b', 'save_as': 'b'},
+        {'action': 'file_read', 'path': 'c', 'save_as': 'c'},
+        {'action': 'file_read', 'path': 'd', 'save_as': 'd'},
+    ]
+    for index, task in enumerate(tasks):
+        plan.admit(index, task, context)
+        if index != 1:
+            plan.save(index, task, {'content': task.get('path')}, context)
+            plan.release(index, context)
+    assert set(context) == {'a', 'c', 'd'}  # 'a' is out of the window but still read
+    plan.release(1, context)
+    assert set(context) == {'c', 'd'}
+    assert evicted == ['b', 'a']
+    assert len(plan.outstanding) == 2 and not plan.read_by
+
+def test_streamed_graph_forgets_finished_tasks():
+    graph = TaskGraph(record=False)
+    for index in range(1000):
+        graph.add({'action': 'file_read', 'path': '{{ r%d.x }}' % index, 'save_as': f'r{index + 1}'})
+        graph.discard(index)
+    assert not graph._readers and not graph._producer and not graph._refs
+
+def test_stream_reader_is_joined_before_the_run_returns():
+    state = {'reading': False}
+
+    def tasks():
+        yield {'action': 'test_sleep', 'seconds': 0}
+        yield {'action': 'no_such_action'}
+        while True:
+            state['reading'] = True
+            time.sleep(0.01)
+            state['reading'] = False
+            yield {'action': 'print_message', 'message': 'x'}
+
+    async def main():
+        plan = ContextPlan([], window=64)
+        async with AsyncExecutor() as executor:
+            with pytest.raises(Exception):
+                await executor.execute_stream(tasks(), plan.new_context(), plan, window=64)
+            assert not state['reading']
+
+    run_async(main())
+
+def test_stream_closes_its_file_when_the_first_task_is_unreadable(tmp_path, monkeypatch):
+    opened = []
+
+    def recording_open(*args, **kwargs):
+        opened.append(open(*args, **kwargs))
+        return opened[-1]
+    monkeypatch.setattr(loader, 'open', recording_open, raising=False)
+    path = tmp_path / 'wf.jsonl'
+    path.write_text('{"action": \n')
+    with pytest.raises(ValidationError):
+        loader.open_workflow_stream(str(path))
+    assert len(opened) == 1 and opened[0].closed
+
+# Profiling
+
+def _spin_a(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+def _spin_b(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+@register('test_spin', pure=True, reads=())
+async def _test_spin(task, context, session=None):
+    spin = _spin_a if task['save_as'] == 'a' else _spin_b
+    for _ in range(20):
+        spin(0.005)
+        await asyncio.sleep(0)
+    return {'done': True}
+
+def test_profiler_attributes_interleaved_coroutines_to_their_own_task(tmp_path):
+    path = write_workflow(tmp_path / 'wf.yaml', [
+        {'action': 'test_spin', 'save_as': 'a'},
+        {'action': 'test_spin', 'save_as': 'b'},
+    ], prune=False)
+    with Profiler(0.001) as profiler:
+        run_async(execute_yaml_async(path))
+    spinning = {stack: count for stack, count in profiler.samples.items() if '_spin_' in stack}
+    assert spinning
+    for stack in spinning:
+        expected = 'task:test_spin[a]' if '_spin_a' in stack else 'task:test_spin[b]'
+        other = 'task:test_spin[b]' if '_spin_a' in stack else 'task:test_spin[a]'
+        assert stack.startswith(expected) and other not in stack
+    assert profiler.spans['task:test_spin[a]'][0] == 1
+
+# Event-loop monitoring
+
+def test_loop_monitor_offloads_actions_that_block_the_loop(tmp_path):
+    threads = []
+
+    @register('test_block')
+    async def block(task, context, session=None):
+        threads.append(threading.get_ident())
+        time.sleep(0.06)
+        return {'done': True}
+
+    path = write_workflow(tmp_path / 'wf.yaml', [{'action': 'test_block'}] * 4,
+                          loop_monitor={'threshold': 0.03, 'offload_after': 2})
+    stalls = REGISTRY.get_sample_value('llms_os_event_loop_stalls_total', {'action': 'test_block'}) or 0
+    run_async(execute_yaml_async(path))
+    loop_thread = threads[0]
+    assert threads[1] == loop_thread
+    assert loop_thread not in threads[2:]  # moved off the loop after two stalls
+    assert REGISTRY.get_sample_value('llms_os_event_loop_stalls_total',
+                                     {'action': 'test_block'}) == stalls + 2
+
+# JSON codec and uvloop
+
+@pytest.mark.parametrize('backend', ['json', 'orjson'])
+def test_codec_backends_agree(monkeypatch, backend):
+    if backend == 'orjson':
+        pytest.importorskip('orjson')
+    else:
+        monkeypatch.setattr(codec, '_loads', codec._std_loads)
+        monkeypatch.setattr(codec, '_dumps', codec._std_dumps)
+    value = {'b': [1, 2.5, None, True], 'a': 'ü', 'big': 2 ** 70}
+    encoded = codec.dumps(value, sort_keys=True)
+    assert isinstance(encoded, bytes)
+    assert encoded == b'{"a":"\xc3\xbc","b":[1,2.5,null,true],"big":1180591620717411303424}'
+    assert codec.loads(encoded) == value
+
+def test_run_async_falls_back_without_uvloop(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'uvloop', None)  # import fails
+    async def answer():
+        return 42
+    assert run_async(answer(), use_uvloop=True) == 42
+
+@pytest.mark.parametrize('version', [(3, 10), (3, 11)])
+def test_run_async_leaves_the_event_loop_policy_alone(monkeypatch, version):
+    loops = []
+
+    def new_event_loop():
+        loops.append(asyncio.SelectorEventLoop())
+        return loops[-1]
+
+    class Policy(asyncio.DefaultEventLoopPolicy):
+        def new_event_loop(self):
+            return new_event_loop()
+    fake = type(sys)('uvloop')
+    fake.EventLoopPolicy, fake.new_event_loop = Policy, new_event_loop
+    monkeypatch.setitem(sys.modules, 'uvloop', fake)
+    monkeypatch.setattr(sys, 'version_info', version)
+    before = asyncio.get_event_loop_policy()
+
+    async def running_loop():
+        return asyncio.get_running_loop()
+    loop = run_async(running_loop(), use_uvloop=True)
+    monkeypatch.undo()
+    assert asyncio.get_event_loop_policy() is before
+    assert loop in loops
+
+# Project generation
+
+GENERATOR = Path(__file__).resolve().parents[4] / 'build_project.py'
+needs_generator = pytest.mark.skipif(not GENERATOR.exists(), reason='build_project.py is not in this checkout')
+
+def build_project(output_dir, *args):
+    config = GENERATOR.parent / 'llms-os-docker-project-enhanced.yaml'
+    return subprocess.run([sys.executable, str(GENERATOR), '--config', str(config),
+                           '--output', str(output_dir), *args],
+                          capture_output=True, text=True, check=True).stdout
+
+@needs_generator
+def test_generator_reproduces_the_checked_in_project(tmp_path):
+    build_project(tmp_path)
+    project = GENERATOR.parent / 'llms-os-project'
+    generated = json.loads((tmp_path / '.build-manifest.json').read_text())
+    assert 'llms-os/src/LLMs_OS/core.py' in generated
+    for relative in generated:
+        assert (tmp_path / relative).read_bytes() == (project / relative).read_bytes(), relative
+
+@needs_generator
+def test_generator_rewrites_only_changed_files(tmp_path):
+    build_project(tmp_path)
+    untouched = (tmp_path / 'Makefile').stat().st_mtime_ns
+    (tmp_path / 'README.md').write_text('edited\n')
+    assert '1 file(s) would change: 0 added, 1 updated' in build_project(tmp_path, '--dry-run')
+    assert (tmp_path / 'README.md').read_text() == 'edited\n'
+    build_project(tmp_path)
+    assert (tmp_path / 'README.md').read_text() != 'edited\n'
+    assert (tmp_path / 'Makefile').stat().st_mtime_ns == untouched
+
+# Task streams
+
+def in_thread(func):
+    """Start ``func`` in a thread; the returned dict gets 'result' or 'error'"""
+    outcome = {}
+
+    def run():
+        try:
+            outcome['result'] = func()
+        except BaseException as e:
+            outcome['error'] = e
+    outcome['thread'] = threading.Thread(target=run, daemon=True)
+    outcome['thread'].start()
+    return outcome
+
+def test_channel_blocks_a_producer_that_runs_ahead():
+    channel = Channel(maxsize=2)
+
+    def produce():
+        for i in range(10):
+            channel.put(i)
+        channel.finish()
+    producer = in_thread(produce)
+    for _ in range(500):
+        if len(channel.items) == 2:
+            break
+        time.sleep(0.01)
+    time.sleep(0.05)  # room to overrun the buffer, were it not enforced
+    assert len(channel.items) == 2 and producer['thread'].is_alive()
+    assert list(channel) == list(range(10))
+    producer['thread'].join(1)
+    assert 'error' not in producer
+
+def test_channel_close_and_cancel_wake_a_blocked_producer():
+    closed = Channel(maxsize=1)
+    producer = in_thread(lambda: [closed.put(i) for i in range(3)])
+    time.sleep(0.05)
+    closed.close()
+    producer['thread'].join(1)
+    assert isinstance(producer['error'], StreamClosed)
+
+    cancelled = Channel(maxsize=1)
+    deadline = Deadline()
+
+    def produce():
+        current_deadline.set(deadline)
+        for i in range(3):
+            cancelled.put(i)
+    producer = in_thread(produce)
+    time.sleep(0.05)
+    deadline.cancel()
+    # The deadline has no expiry, so only the cancel's wake-up ends the wait
+    producer['thread'].join(10)
+    assert isinstance(producer['error'], DeadlineExceededError)
+
+def test_async_engine_streams_chunks_without_going_through_the_loop(tmp_path, monkeypatch):
+    source, target = tmp_path / 'in.txt', tmp_path / 'out.txt'
+    source.write_text(''.join(f'line {i}\n' for i in range(100000)))
+    path = write_workflow(tmp_path / 'wf.yaml', [
+        {'action': 'file_read', 'path': str(source), 'stream': True, 'save_as': 'lines'},
+        {'action': 'file_write', 'path': str(target), 'stream_from': 'lines'},
+    ])
+    hops = []
+    call_soon_threadsafe = asyncio.BaseEventLoop.call_soon_threadsafe
+    monkeypatch.setattr(asyncio.BaseEventLoop, 'call_soon_threadsafe',
+                        lambda loop, *args, **kwargs: hops.append(args[0]) or
+                        call_soon_threadsafe(loop, *args, **kwargs))
+    run_async(execute_yaml_async(path))
+    assert target.read_text() == source.read_text()
+    assert len(hops) < 10  # per task, not per chunk
+
+# Compression
+
+def test_validation_rejects_unavailable_compression(monkeypatch):
+    monkeypatch.setattr(compression, 'brotli', None)
+    task = {'action': 'http_request', 'url': 'http://example.invalid/', 'method': 'POST',
+            'data': 'x', 'compress': 'br'}
+    errors = WorkflowValidator.task_errors(0, task)
+    assert len(errors) == 1 and 'brotli' in errors[0]
+    assert WorkflowValidator.task_errors(0, {**task, 'compress': 'gzip'}) == []
+    monkeypatch.setattr(compression, 'brotli', object())
+    assert WorkflowValidator.task_errors(0, task) == []
+
+# Bulkheads
+
+def test_bulkheads_isolate_slow_actions(tmp_path):
+    fast_done = threading.Event()
+    slow_calls = {'active': 0, 'peak': 0, 'saw_fast': []}
+    lock = threading.Lock()
+
+    @register('test_slow_io', pure=True, reads=(), bulkhead='slow')
+    def slow(task, context):
+        with lock:
+            slow_calls['active'] += 1
+            slow_calls['peak'] = max(slow_calls['peak'], slow_calls['active'])
+        slow_calls['saw_fast'].append(fast_done.wait(10))
+        time.sleep(0.05)  # long enough for a second worker to show up, if there were one
+        with lock:
+            slow_calls['active'] -= 1
+        return {'done': True}
+
+    @register('test_fast_io', pure=True, reads=(), bulkhead='fast')
+    def fast(task, context):
+        fast_done.set()
+        return {'done': True}
+
+    path = write_workflow(tmp_path / 'wf.yaml', [
+        {'action': 'test_slow_io', 'save_as': 'slow1'},
+        {'action': 'test_slow_io', 'save_as': 'slow2'},
+        {'action': 'test_fast_io', 'save_as': 'fast'},
+    ], bulkheads={'slow': 1}, prune=False)
+    run_async(execute_yaml_async(path))
+    assert slow_calls['saw_fast'] == [True, True]  # fast ran while the slow pool was busy
+    assert slow_calls['peak'] == 1  # one at a time
+
+def test_stream_through_a_single_worker_pool_does_not_deadlock(tmp_path):
+    source, target = tmp_path / 'in.txt', tmp_path / 'out.txt'
+    source.write_text('x\n' * 1000)
+    path = write_workflow(tmp_path / 'wf.yaml', [
+        {'action': 'file_read', 'path': str(source), 'stream': True, 'stream_buffer': 4,
+         'save_as': 'lines'},
+        {'action': 'file_write', 'path': str(target), 'stream_from': 'lines'},
+    ], bulkheads={'files': 1}, timeout=5)
+    run_async(execute_yaml_async(path))
+    assert target.read_text() == source.read_text()
+
+# Output
+
+@pytest.mark.parametrize('settings, shown', [({}, True), ({'output': {'level': 'info'}}, False)])
+def test_print_message_is_filtered_only_once_a_level_is_set(tmp_path, capsys, settings, shown):
+    path = write_workflow(tmp_path / 'wf.yaml', [
+        {'action': 'print_message', 'message': 'details', 'style': 'debug'},
+        {'action': 'print_message', 'message': 'summary'},
+    ], **settings)
+    execute_yaml(path)
+    output.flush()
+    out = capsys.readouterr().out
+    assert 'summary' in out
+    assert ('details' in out) is shown
+
+def test_engine_debug_records_stay_hidden_by_default(capsys):
+    output.configure()
+    output.emit('debug', 'engine internals')
+    output.emit('debug', 'printed', printed=True)
+    output.flush()
+    out = capsys.readouterr().out
+    assert 'engine internals' not in out and 'printed' in out
+
+def test_json_sink_writes_one_object_per_record_at_or_above_its_level(capsys):
+    sink = output.OutputSink(format='json', level='warning', color='always')
+    sink.emit('info', 'progress')
+    sink.emit('info', 'printed', printed=True)
+    sink.emit('warning', 'two\nlines', icon='⚠️ ', action='http_request')
+    sink.emit('error', 'failed')
+    sink.close()
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [(r['level'], r['message']) for r in records] == [('warning', 'two\nlines'), ('error', 'failed')]
+    assert records[0]['action'] == 'http_request' and isinstance(records[0]['time'], float)
+
+# Pruning and conditions
+
+@pytest.mark.parametrize('engine', ['sync', 'async'])
+@pytest.mark.parametrize('prune', [None, True])
+def test_unused_pure_tasks_are_pruned_only_on_request(tmp_path, engine, prune):
+    calls = []
+    register('test_mark', pure=True, reads=())(lambda task, context: calls.append(task['save_as']) or {})
+    settings = {} if prune is None else {'prune': prune}
+    path = write_workflow(tmp_path / 'wf.yaml', [
+        {'action': 'test_mark', 'save_as': 'ignored'},
+        {'action': 'test_mark', 'save_as': 'pinned', 'keep': True},
+        {'action': 'file_write', 'path': str(tmp_path / 'out.txt'), 'content': 'done'},
+    ], **settings)
+    if engine == 'sync':
+        execute_yaml(path)
+    else:
+        run_async(execute_yaml_async(path))
+    assert calls == (['pinned'] if prune else ['ignored', 'pinned'])
+
+def test_dry_run_report_flags_unused_tasks_either_way():
+    tasks = [{'action': 'file_read', 'path': 'a', 'save_as': 'a'}, {'action': 'print_message'}]
+    assert unused_tasks(tasks) == {0}
+    assert report(tasks, {0}, pruned=False)[0] == \
+        "1. file_read -> a: run (result is never used; skipped with prune: true)"
+    assert report(tasks, {0}, pruned=True)[0] == "1. file_read -> a: skip (result is never used)"
+
+@pytest.mark.parametrize('engine', ['sync', 'async'])
+def test_when_conditions_skip_tasks_and_apply_defaults(tmp_path, engine):
+    path = write_workflow(tmp_path / 'wf.yaml', [
+        {'action': 'file_write', 'path': str(tmp_path / 'default.txt'), 'content': 'x',
+         'when': '{{ retries | default(5) }} > 2'},
+        {'action': 'file_write', 'path': str(tmp_path / 'missing.txt'), 'content': 'x',
+         'when': '{{ retries }}'},
+        {'action': 'file_write', 'path': str(tmp_path / 'negated.txt'), 'content': 'x',
+         'when': "not {{ mode | default('fast') }} == 'slow'"},
+    ])
+    if engine == 'sync':
+        execute_yaml(path)
+    else:
+        run_async(execute_yaml_async(path))
+    assert sorted(p.name for p in tmp_path.glob('*.txt')) == ['default.txt', 'negated.txt']
+
+def test_conditions_reject_filters_they_cannot_apply():
+    assert condition_error("{{ x | default('a') }} == 'a'") is None
+    assert 'unsupported filter' in condition_error('{{ x | upper }}')
+    with pytest.raises(ValidationError):
+        WorkflowValidator.validate({'tasks': [{'action': 'print_message', 'when': '{{ x | int }} > 1'}]})
+
+def test_prewarm_skips_hosts_used_only_by_pruned_tasks():
+    tasks = [{'action': 'http_request', 'url': 'http://a.invalid/x', 'save_as': 'a'},
+             {'action': 'http_request', 'url': 'http://b.invalid/y'}]
+    assert set(prewarm.workflow_origins(tasks)) == {'http://a.invalid', 'http://b.invalid'}
+    assert set(prewarm.workflow_origins(tasks, skip={0})) == {'http://b.invalid'}
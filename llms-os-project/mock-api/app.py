@@ -5,13 +5,31 @@ import os
 import time
 import random
 import hashlib
-import json
 from datetime import datetime
 from prometheus_client import Counter, Histogram, generate_latest
 
+try:
+    import orjson
+except ImportError:  # optional speedup, stdlib JSON otherwise
+    orjson = None
+
 app = Flask(__name__)
 CORS(app)
 
+if orjson is not None:
+    from flask.json.provider import JSONProvider
+
+    class OrjsonProvider(JSONProvider):
+        """Flask JSON provider backed by orjson"""
+
+        def dumps(self, obj, **kwargs):
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+
+    app.json = OrjsonProvider(app)
+
 # Configuration
 SIMULATED_API_KEY = os.getenv("SIMULATED_API_KEY", "sk-simulated-key")
 ENABLE_METRICS = os.getenv("ENABLE_METRICS", "true").lower() == "true"
@@ -128,13 +146,13 @@ def chat_completions():
                         "finish_reason": None
                     }]
                 }
-                yield f"data: {json.dumps(data)}\n\n"
+                yield f"data: {app.json.dumps(data)}\n\n"
                 time.sleep(0.05)
             
             # Final chunk
             data["choices"][0]["delta"] = {}
             data["choices"][0]["finish_reason"] = "stop"
-            yield f"data: {json.dumps(data)}\n\n"
+            yield f"data: {app.json.dumps(data)}\n\n"
             yield "data: [DONE]\n\n"
         
         return Response(generate(), mimetype='text/event-stream')
@@ -160,6 +178,52 @@ def chat_completions():
         }
     })
 
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", 256))
+
+def embed_text(text: str, dimensions: int) -> list:
+    """Deterministic embedding: hashed character trigrams, L2-normalised
+
+    Similar texts share most trigrams, so near-duplicates get a high cosine
+    similarity - good enough to exercise semantic caching.
+    """
+    vector = [0.0] * dimensions
+    padded = f"  {text.lower()}  "
+    for i in range(len(padded) - 2):
+        digest = hashlib.md5(padded[i:i + 3].encode("utf-8")).digest()
+        bucket = int.from_bytes(digest[:4], "little") % dimensions
+        vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+    norm = sum(v * v for v in vector) ** 0.5 or 1.0
+    return [round(v / norm, 6) for v in vector]
+
+@app.route("/api/v1/embeddings", methods=["POST"])
+@track_request("embeddings")
+def embeddings():
+    """Mock OpenAI-style embeddings endpoint (accepts a string or a batch)"""
+    auth_header = request.headers.get("Authorization", "")
+    if not auth_header.startswith(f"Bearer {SIMULATED_API_KEY}"):
+        return jsonify({"error": "Invalid API key"}), 401
+    
+    data = request.json
+    model = data.get("model", "openai/text-embedding-3-small")
+    inputs = data.get("input", [])
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    dimensions = int(data.get("dimensions", EMBEDDING_DIMENSIONS))
+    
+    # One round trip per batch, not per input
+    time.sleep(random.uniform(0.02, 0.05))
+    
+    tokens = sum(len(text.split()) for text in inputs)
+    return jsonify({
+        "object": "list",
+        "model": model,
+        "data": [
+            {"object": "embedding", "index": i, "embedding": embed_text(text, dimensions)}
+            for i, text in enumerate(inputs)
+        ],
+        "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
+    })
+
 def generate_response(prompt: str, model: str, temperature: float) -> str:
     """Generate mock response based on prompt"""
     prompt_lower = prompt.lower()